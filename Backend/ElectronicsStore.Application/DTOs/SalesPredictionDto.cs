@@ -15,6 +15,26 @@ public class SalesPredictionDto
     /// </summary>
     public double Confidence { get; set; }
 
+    /// <summary>
+    /// الحد الأدنى لفترة التنبؤ (أصغر مئين من أشجار النموذج)
+    /// </summary>
+    public decimal? LowerBound { get; set; }
+
+    /// <summary>
+    /// الحد الأعلى لفترة التنبؤ (أكبر مئين من أشجار النموذج)
+    /// </summary>
+    public decimal? UpperBound { get; set; }
+
+    /// <summary>
+    /// الانحراف المعياري لتنبؤات أشجار النموذج
+    /// </summary>
+    public decimal? StandardDeviation { get; set; }
+
+    /// <summary>
+    /// مئينات التنبؤ (المفتاح: المئين بين 0 و 1)
+    /// </summary>
+    public Dictionary<string, decimal> Quantiles { get; set; } = new();
+
     /// <summary>
     /// تاريخ التنبؤ
     /// </summary>
@@ -1,5 +1,6 @@
 using ElectronicsStore.Application.DTOs;
 using ElectronicsStore.Application.Interfaces;
+using System.Globalization;
 using System.Text.Json;
 using System.Text.Json.Serialization;
 using Microsoft.Extensions.Logging;
@@ -35,8 +36,8 @@ public class SalesPredictionService : ISalesPredictionService
     {
         try
         {
-            // استخدام GET request بدلاً من POST
-            var response = await _httpClient.GetAsync("/api/predict/next");
+            // طلب واحد يعيد التنبؤ مع المتوسطات الحديثة بدلاً من أربعة طلبات منفصلة
+            var response = await _httpClient.GetAsync("/api/predict/bundle");
             
             if (!response.IsSuccessStatusCode)
             {
@@ -45,7 +46,7 @@ public class SalesPredictionService : ISalesPredictionService
             }
 
             var responseContent = await response.Content.ReadAsStringAsync();
-            var mlResponse = JsonSerializer.Deserialize<MLPredictionResponse>(responseContent, new JsonSerializerOptions
+            var mlResponse = JsonSerializer.Deserialize<MLPredictionBundleResponse>(responseContent, new JsonSerializerOptions
             {
                 PropertyNameCaseInsensitive = true
             });
@@ -55,23 +56,41 @@ public class SalesPredictionService : ISalesPredictionService
                 throw new Exception(mlResponse?.Error ?? "استجابة غير صحيحة من خدمة التنبؤ");
             }
 
+            var prediction = mlResponse.Data?.Prediction;
+            var averages = mlResponse.Data?.RecentAverages;
+            var predictionDate = DateTime.Parse(prediction?.Date ?? DateTime.Now.ToString());
+
+            // فترة التنبؤ من مئينات أشجار النموذج (إن توفرت)
+            var quantiles = (prediction?.PredictionQuantiles ?? new Dictionary<string, double>())
+                .Select(q => (Level: double.Parse(q.Key, CultureInfo.InvariantCulture), Value: q.Value))
+                .OrderBy(q => q.Level)
+                .ToList();
+            var hasInterval = quantiles.Count >= 2;
+
             // تحويل الاستجابة إلى DTO
             return new SalesPredictionDto
             {
-                PredictedSales = (decimal)(mlResponse.Data?.PredictedSales ?? 0),
-                Confidence = 0.95, // النموذج لا يعطي confidence، نستخدم قيمة افتراضية
-                PredictionDate = DateTime.Parse(mlResponse.Data?.Date ?? DateTime.Now.ToString()),
+                PredictedSales = (decimal)(prediction?.PredictedSales ?? 0),
+                // نسبة التغطية بين أصغر وأكبر مئين، وإلا قيمة افتراضية
+                Confidence = hasInterval ? quantiles[^1].Level - quantiles[0].Level : 0.95,
+                LowerBound = hasInterval ? (decimal)quantiles[0].Value : null,
+                UpperBound = hasInterval ? (decimal)quantiles[^1].Value : null,
+                StandardDeviation = (decimal?)prediction?.PredictionStd,
+                Quantiles = quantiles.ToDictionary(
+                    q => q.Level.ToString(CultureInfo.InvariantCulture), q => (decimal)q.Value),
+                PredictionDate = predictionDate,
                 ModelName = "Random Forest", // النموذج المستخدم
                 Features = new PredictionFeaturesDto
                 {
-                    DayOfWeek = GetDayOfWeekInArabic(DateTime.Parse(mlResponse.Data?.Date ?? DateTime.Now.ToString()).DayOfWeek),
-                    Month = GetMonthInArabic(DateTime.Parse(mlResponse.Data?.Date ?? DateTime.Now.ToString()).Month),
-                    Year = DateTime.Parse(mlResponse.Data?.Date ?? DateTime.Now.ToString()).Year,
-                    LastWeekAverage = await GetLastWeekAverage(),
-                    LastMonthAverage = await GetLastMonthAverage(),
-                    LastYearAverage = await GetLastYearAverage()
+                    DayOfWeek = GetDayOfWeekInArabic(predictionDate.DayOfWeek),
+                    Month = GetMonthInArabic(predictionDate.Month),
+                    Year = predictionDate.Year,
+                    LastWeekAverage = (decimal)(averages?.LastWeekAverage ?? 15000), // قيمة افتراضية
+                    LastMonthAverage = (decimal)(averages?.LastMonthAverage ?? 16000), // قيمة افتراضية
+                    LastYearAverage = (decimal)(averages?.LastYearAverage ?? 17000), // قيمة افتراضية
+                    YesterdaySales = (decimal)(mlResponse.Data?.LastDaySales ?? 0)
                 },
-                Recommendations = GenerateRecommendations(mlResponse.Data?.PredictedSales ?? 0)
+                Recommendations = GenerateRecommendations(prediction?.PredictedSales ?? 0)
             };
         }
         catch (Exception ex)
@@ -157,87 +176,6 @@ public class SalesPredictionService : ISalesPredictionService
             _ => "غير محدد"
         };
     }
-
-    private async Task<decimal> GetLastWeekAverage()
-    {
-        try
-        {
-            var response = await _httpClient.GetAsync("/api/data/summary");
-            if (response.IsSuccessStatusCode)
-            {
-                var content = await response.Content.ReadAsStringAsync();
-                var summary = JsonSerializer.Deserialize<DataSummaryResponse>(content, new JsonSerializerOptions
-                {
-                    PropertyNameCaseInsensitive = true
-                });
-                
-                if (summary?.Success == true)
-                {
-                    return (decimal)(summary.Data?.SalesStats?.AverageDailySales ?? 0);
-                }
-            }
-        }
-        catch (Exception ex)
-        {
-            _logger.LogWarning(ex, "فشل في جلب متوسط الأسبوع الماضي");
-        }
-        
-        return 15000; // قيمة افتراضية
-    }
-
-    private async Task<decimal> GetLastMonthAverage()
-    {
-        try
-        {
-            var response = await _httpClient.GetAsync("/api/data/summary");
-            if (response.IsSuccessStatusCode)
-            {
-                var content = await response.Content.ReadAsStringAsync();
-                var summary = JsonSerializer.Deserialize<DataSummaryResponse>(content, new JsonSerializerOptions
-                {
-                    PropertyNameCaseInsensitive = true
-                });
-                
-                if (summary?.Success == true)
-                {
-                    return (decimal)(summary.Data?.SalesStats?.AverageDailySales ?? 0);
-                }
-            }
-        }
-        catch (Exception ex)
-        {
-            _logger.LogWarning(ex, "فشل في جلب متوسط الشهر الماضي");
-        }
-        
-        return 16000; // قيمة افتراضية
-    }
-
-    private async Task<decimal> GetLastYearAverage()
-    {
-        try
-        {
-            var response = await _httpClient.GetAsync("/api/data/summary");
-            if (response.IsSuccessStatusCode)
-            {
-                var content = await response.Content.ReadAsStringAsync();
-                var summary = JsonSerializer.Deserialize<DataSummaryResponse>(content, new JsonSerializerOptions
-                {
-                    PropertyNameCaseInsensitive = true
-                });
-                
-                if (summary?.Success == true)
-                {
-                    return (decimal)(summary.Data?.SalesStats?.AverageDailySales ?? 0);
-                }
-            }
-        }
-        catch (Exception ex)
-        {
-            _logger.LogWarning(ex, "فشل في جلب متوسط السنة الماضية");
-        }
-        
-        return 17000; // قيمة افتراضية
-    }
 }
 
 // نماذج استجابة خدمة ML
@@ -258,10 +196,51 @@ public class MLPredictionData
     
     [JsonPropertyName("predicted_sales")]
     public double PredictedSales { get; set; }
+
+    [JsonPropertyName("prediction_std")]
+    public double? PredictionStd { get; set; }
+
+    [JsonPropertyName("prediction_quantiles")]
+    public Dictionary<string, double>? PredictionQuantiles { get; set; }
     
     public string Message { get; set; } = string.Empty;
 }
 
+public class MLPredictionBundleResponse
+{
+    public bool Success { get; set; }
+    public MLPredictionBundleData? Data { get; set; }
+    public string? Error { get; set; }
+}
+
+public class MLPredictionBundleData
+{
+    [JsonPropertyName("data_version")]
+    public int DataVersion { get; set; }
+
+    public MLPredictionData? Prediction { get; set; }
+
+    [JsonPropertyName("recent_averages")]
+    public RecentAverages? RecentAverages { get; set; }
+
+    [JsonPropertyName("last_day_sales")]
+    public double LastDaySales { get; set; }
+
+    public DataSummaryData? Summary { get; set; }
+}
+
+public class RecentAverages
+{
+    [JsonPropertyName("last_week_average")]
+    public double? LastWeekAverage { get; set; }
+
+    [JsonPropertyName("last_month_average")]
+    public double? LastMonthAverage { get; set; }
+
+    [JsonPropertyName("last_year_average")]
+    public double? LastYearAverage { get; set; }
+}
+
 public class DataSummaryResponse
 {
     public bool Success { get; set; }
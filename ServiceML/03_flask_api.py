@@ -13,16 +13,19 @@ from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
+from feature_state import FEATURE_NAMES, FeatureLayout, calendar_values
+
 app = Flask(__name__)
 
 # متغيرات عامة لتخزين النموذج والـ Scaler
 model = None
 scaler = None
 feature_columns = None
+feature_layout = None
 
 def load_model_and_scaler():
     """تحميل النموذج والـ Scaler"""
-    global model, scaler, feature_columns
+    global model, scaler, feature_columns, feature_layout
     
     try:
         # محاولة تحميل النموذج (سنحاول جميع الأنواع)
@@ -49,6 +52,8 @@ def load_model_and_scaler():
         # تحميل قائمة الميزات
         with open('feature_columns.txt', 'r', encoding='utf-8') as f:
             feature_columns = [line.strip() for line in f.readlines()]
+        # مواقع الميزات في متجه التنبؤ تُحسب مرة واحدة هنا
+        feature_layout = FeatureLayout(feature_columns)
         print(f"✓ تم تحميل قائمة الميزات: {len(feature_columns)} ميزة")
         
         return True
@@ -58,81 +63,18 @@ def load_model_and_scaler():
         return False
 
 def create_features_for_prediction(input_data):
-    """إنشاء الميزات للتنبؤ بناءً على المدخلات"""
+    """إنشاء متجه الميزات للتنبؤ بناءً على المدخلات (صف واحد بترتيب feature_columns)"""
     try:
-        # إنشاء DataFrame فارغ مع التاريخ المطلوب
-        target_date = pd.to_datetime(input_data['sale_date'])
-        
-        # إنشاء DataFrame مع التاريخ المستهدف
-        df = pd.DataFrame({'sale_date': [target_date]})
-        df.set_index('sale_date', inplace=True)
-        
-        # إنشاء ميزات التقويم
-        df['year'] = df.index.year
-        df['month'] = df.index.month
-        df['day'] = df.index.day
-        df['day_of_week'] = df.index.dayofweek
-        df['day_of_year'] = df.index.dayofyear
-        df['week_of_year'] = df.index.isocalendar().week
-        
-        # ميزات منطقية
-        df['is_weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
-        df['is_month_start'] = df.index.is_month_start.astype(int)
-        df['is_month_end'] = df.index.is_month_end.astype(int)
-        
-        # الميزات المتأخرة (من المدخلات)
-        df['sales_lag_1'] = input_data.get('sales_lag_1', 0)
-        df['sales_lag_2'] = input_data.get('sales_lag_2', 0)
-        df['sales_lag_3'] = input_data.get('sales_lag_3', 0)
-        df['sales_lag_7'] = input_data.get('sales_lag_7', 0)
-        df['sales_lag_14'] = input_data.get('sales_lag_14', 0)
-        df['sales_lag_30'] = input_data.get('sales_lag_30', 0)
-        
-        df['quantity_lag_1'] = input_data.get('quantity_lag_1', 0)
-        df['quantity_lag_7'] = input_data.get('quantity_lag_7', 0)
-        
-        df['invoices_lag_1'] = input_data.get('invoices_lag_1', 0)
-        df['invoices_lag_7'] = input_data.get('invoices_lag_7', 0)
-        
-        df['discount_lag_1'] = input_data.get('discount_lag_1', 0)
-        df['discount_lag_7'] = input_data.get('discount_lag_7', 0)
-        
-        # الميزات المتحركة (من المدخلات)
-        df['rolling_mean_sales_7'] = input_data.get('rolling_mean_sales_7', 0)
-        df['rolling_std_sales_7'] = input_data.get('rolling_std_sales_7', 0)
-        df['rolling_max_sales_7'] = input_data.get('rolling_max_sales_7', 0)
-        df['rolling_min_sales_7'] = input_data.get('rolling_min_sales_7', 0)
-        
-        df['rolling_mean_sales_14'] = input_data.get('rolling_mean_sales_14', 0)
-        df['rolling_std_sales_14'] = input_data.get('rolling_std_sales_14', 0)
-        df['rolling_max_sales_14'] = input_data.get('rolling_max_sales_14', 0)
-        df['rolling_min_sales_14'] = input_data.get('rolling_min_sales_14', 0)
-        
-        df['rolling_mean_sales_30'] = input_data.get('rolling_mean_sales_30', 0)
-        df['rolling_std_sales_30'] = input_data.get('rolling_std_sales_30', 0)
-        df['rolling_max_sales_30'] = input_data.get('rolling_max_sales_30', 0)
-        df['rolling_min_sales_30'] = input_data.get('rolling_min_sales_30', 0)
-        
-        df['rolling_mean_quantity_7'] = input_data.get('rolling_mean_quantity_7', 0)
-        df['rolling_std_quantity_7'] = input_data.get('rolling_std_quantity_7', 0)
-        df['rolling_mean_quantity_14'] = input_data.get('rolling_mean_quantity_14', 0)
-        df['rolling_std_quantity_14'] = input_data.get('rolling_std_quantity_14', 0)
-        
-        df['rolling_mean_invoices_7'] = input_data.get('rolling_mean_invoices_7', 0)
-        df['rolling_std_invoices_7'] = input_data.get('rolling_std_invoices_7', 0)
-        df['rolling_mean_invoices_14'] = input_data.get('rolling_mean_invoices_14', 0)
-        df['rolling_std_invoices_14'] = input_data.get('rolling_std_invoices_14', 0)
-        
-        # الميزات المتقدمة
-        df['weekly_avg_sales'] = input_data.get('weekly_avg_sales', 0)
-        df['sales_change_pct'] = input_data.get('sales_change_pct', 0)
-        df['monthly_avg_sales'] = input_data.get('monthly_avg_sales', 0)
-        df['day_of_week_avg'] = input_data.get('day_of_week_avg', 0)
+        target_date = pd.Timestamp(input_data['sale_date'])
         
-        # إعادة ترتيب الأعمدة حسب ترتيب الميزات الأصلية
-        df = df.reindex(columns=feature_columns)
+        # ميزات التقويم تُحسب من التاريخ، وباقي الميزات من المدخلات (0 إذا لم تُرسل)
+        values = calendar_values(target_date)
+        values += [input_data.get(name, 0) for name in FEATURE_NAMES[len(values):]]
         
-        return df
+        # الكتابة مباشرة في متجه معد مسبقاً حسب ترتيب الميزات الأصلية
+        vector = feature_layout.new_vector()
+        vector[feature_layout.slots] = values
+        return vector[:feature_layout.size].reshape(1, -1)
         
     except Exception as e:
         print(f"❌ خطأ في إنشاء الميزات: {str(e)}")
@@ -177,16 +119,16 @@ def predict_sales():
             }), 400
         
         # إنشاء الميزات
-        features_df = create_features_for_prediction(input_data)
+        features = create_features_for_prediction(input_data)
         
-        if features_df is None:
+        if features is None:
             return jsonify({
                 'error': 'فشل في إنشاء الميزات',
                 'status': 'error'
             }), 500
         
         # توحيد قياس الميزات
-        features_scaled = scaler.transform(features_df)
+        features_scaled = scaler.transform(features)
         
         # التنبؤ
         prediction = model.predict(features_scaled)[0]
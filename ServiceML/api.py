@@ -5,20 +5,41 @@
 Sales Prediction API
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 # import flask_cors
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import json
+import os
 import warnings
 warnings.filterwarnings('ignore')
 
 # استيراد معالج النموذج
-from model_handler import sales_model
+from model_handler import sales_model, parse_quantiles, MAX_RANGE_PAGE_SIZE
+from serialization import records_json, ndjson_lines, object_json, dumps, success_response, stream_response
+import metrics
+from export import export_chunks, MIMETYPES
+
+# عدد الأيام الافتراضي في صفحة JSON من /api/data/range
+DEFAULT_RANGE_PAGE_SIZE = 1000
+
+# عدد الأيام في كل جزء من الاستجابات المتدفقة
+STREAM_CHUNK_ROWS = 2000
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """تحويل استجابات jsonify مع قياس زمن مرحلة serialize"""
+
+    def dumps(self, obj, **kwargs):
+        with metrics.stage('serialize'):
+            return super().dumps(obj, **kwargs)
+
 
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
 CORS(app, origins=[
     "http://localhost:5002", 
     "https://localhost:7001", 
@@ -39,6 +60,28 @@ def initialize_model():
 # تهيئة النموذج مرة واحدة
 initialize_model()
 
+# ===== قياس الطلبات =====
+
+@app.before_request
+def start_request_metrics():
+    metrics.begin_request()
+
+# فحوص الحالة والصفحة الرئيسية لا تنتظر إعادة تحميل البيانات (تُجاب على حلقة الأحداث في الوضع غير المتزامن)
+UNSYNCED_PATHS = frozenset({'/', '/health', '/api/health'})
+
+@app.before_request
+def sync_worker_state():
+    # مع عدة عمليات: تحميل ما غيّرته العمليات الأخرى في ملفات البيانات والنموذج قبل الرد
+    if request.path not in UNSYNCED_PATHS:
+        sales_model.sync_shared_state()
+
+@app.after_request
+def record_request_metrics(response):
+    # المسار المسجل (وليس الرابط الفعلي) حتى لا تتضخم التسميات؛ الروابط غير المعروفة تُجمع معاً
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.end_request(endpoint, request.method, response.status_code, sales_model.model_version)
+    return response
+
 # الصفحة الرئيسية - معلومات API
 @app.route('/')
 def home():
@@ -49,10 +92,23 @@ def home():
         "endpoints": {
             "health": "/api/health",
             "model_info": "/api/model/info",
+            "model_memory": "/api/model/memory",
+            "data_memory": "/api/data/memory",
+            "metrics": "/api/metrics",
+            "model_reload": "/api/admin/model/reload",
             "predict": "/api/predict/next",
+            "predict_batch": "/api/predict/batch",
+            "predict_scenarios": "/api/predict/scenarios",
+            "predict_horizon": "/api/predict/horizon?days=N",
+            "predict_bundle": "/api/predict/bundle",
+            "predict_series": "/api/predict/series?level=product&page=1",
             "data_summary": "/api/data/summary",
             "recent_data": "/api/data/recent",
-            "trends": "/api/data/trends"
+            "trends": "/api/data/trends",
+            "data_range": "/api/data/range?start=YYYY-MM-DD&end=YYYY-MM-DD&limit=N&cursor=...",
+            "data_export": "/api/data/export?dataset=history|features|predictions&format=csv|ndjson",
+            "append_data": "/api/data/append",
+            "series_data": "/api/data/series"
         },
         "documentation": "استخدم /api/health للتحقق من حالة الخدمة"
     })
@@ -92,12 +148,125 @@ def get_model_info():
             "error": f"خطأ في الحصول على معلومات النموذج: {str(e)}"
         }), 500
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """مقاييس الطلبات وزمن المراحل بصيغة Prometheus"""
+    artifacts = sales_model.artifacts
+    gauges = [
+        ("ml_data_version", "رقم نسخة البيانات في العملية الحالية", {}, sales_model.data_version),
+        ("ml_series_version", "رقم نسخة بيانات السلاسل في العملية الحالية", {}, sales_model.series_version),
+    ]
+    if artifacts is not None:
+        gauges.append((
+            "ml_model_info",
+            "نسخة النموذج المحمل ومحرك التنبؤ في العملية الحالية",
+            {
+                "model_version": artifacts.version,
+                "model_type": type(artifacts.model).__name__,
+                "inference_engine": sales_model._inference_engine(artifacts)
+            },
+            1
+        ))
+    return Response(metrics.render(gauges), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/api/model/memory', methods=['GET'])
+def get_model_memory():
+    """تقرير ذاكرة العامل الحالي (المقيمة والمشتركة والخاصة)"""
+    try:
+        return jsonify({
+            "success": True,
+            "data": sales_model.get_memory_report()
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"خطأ في الحصول على تقرير الذاكرة: {str(e)}"
+        }), 500
+
+@app.route('/api/data/memory', methods=['GET'])
+def get_data_memory():
+    """حجم جداول البيانات المحملة في الذاكرة لكل جدول وعمود"""
+    try:
+        result = sales_model.get_data_memory()
+
+        if "error" in result:
+            return jsonify({
+                "success": False,
+                "error": result["error"]
+            }), 500
+
+        return jsonify({
+            "success": True,
+            "data": result
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"خطأ في الحصول على تقرير ذاكرة البيانات: {str(e)}"
+        }), 500
+
+def is_admin_request():
+    """طلبات الإدارة: رمز ML_ADMIN_TOKEN في الترويسة X-Admin-Token، أو من الجهاز نفسه إن لم يُضبط الرمز"""
+    token = os.environ.get('ML_ADMIN_TOKEN')
+    if token:
+        return request.headers.get('X-Admin-Token') == token
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/api/admin/model/reload', methods=['GET', 'POST'])
+def reload_model():
+    """إعادة تحميل النموذج من مجلد modelAI دون إيقاف الخدمة (GET لحالة آخر عملية)"""
+    if not is_admin_request():
+        return jsonify({
+            "success": False,
+            "error": "غير مصرح بهذه العملية"
+        }), 403
+
+    try:
+        if request.method == 'GET':
+            return jsonify({
+                "success": True,
+                "data": dict(sales_model.reload_status, model_version=sales_model.model_version)
+            })
+
+        payload = request.get_json(silent=True) or {}
+        if payload.get('wait', False):
+            result = sales_model.reload_model()
+        else:
+            result = sales_model.reload_model_async()
+
+        if "error" in result:
+            return jsonify({
+                "success": False,
+                "error": result["error"]
+            }), 409 if sales_model.reload_status.get("state") == "loading" else 400
+
+        return jsonify({
+            "success": True,
+            "data": result
+        }), 200 if payload.get('wait', False) else 202
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"خطأ في إعادة تحميل النموذج: {str(e)}"
+        }), 500
+
+def requested_quantiles():
+    """مئينات فترة التنبؤ من معامل quantiles (None للافتراضية، ValueError للقيم غير الصالحة)"""
+    quantiles = request.args.get('quantiles')
+    return parse_quantiles(quantiles) if quantiles else None
+
 @app.route('/api/predict', methods=['POST'])
 def predict_next_day():
     """التنبؤ بمبيعات اليوم التالي"""
     try:
+        try:
+            quantiles = requested_quantiles()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
         # التنبؤ باليوم التالي فقط
-        result = sales_model.predict_next_day_sales()
+        result = sales_model.predict_next_day_sales(quantiles)
 
         if "error" in result:
             return jsonify({
@@ -120,7 +289,199 @@ def predict_next_day():
 def predict_next_day_get():
     """التنبؤ بمبيعات اليوم التالي عبر GET request"""
     try:
-        result = sales_model.predict_next_day_sales()
+        try:
+            quantiles = requested_quantiles()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        result = sales_model.predict_next_day_sales(quantiles)
+
+        if "error" in result:
+            return jsonify({
+                "success": False,
+                "error": result["error"]
+            }), 400
+
+        return jsonify({
+            "success": True,
+            "data": result
+        })
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"خطأ في التنبؤ: {str(e)}"
+        }), 500
+
+@app.route('/api/predict/bundle', methods=['GET'])
+def predict_bundle():
+    """تنبؤ اليوم التالي مع ملخص البيانات ومتوسطات آخر أسبوع/شهر/سنة في طلب واحد"""
+    try:
+        result = sales_model.get_prediction_bundle()
+
+        if "error" in result:
+            return jsonify({
+                "success": False,
+                "error": result["error"]
+            }), 400
+
+        return jsonify({
+            "success": True,
+            "data": result
+        })
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"خطأ في التنبؤ: {str(e)}"
+        }), 500
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """التنبؤ بالمبيعات لمجموعة تواريخ في طلب واحد"""
+    try:
+        payload = request.get_json(silent=True) or {}
+
+        # إما قائمة تواريخ صريحة أو نطاق من start إلى end
+        dates = payload.get('dates')
+        if dates is None and payload.get('start') and payload.get('end'):
+            try:
+                dates = pd.date_range(payload['start'], payload['end'], freq='D').strftime('%Y-%m-%d').tolist()
+            except (ValueError, TypeError):
+                return jsonify({
+                    "success": False,
+                    "error": "صيغة التاريخ غير صحيحة. يرجى استخدام YYYY-MM-DD"
+                }), 400
+
+        if not isinstance(dates, list):
+            return jsonify({
+                "success": False,
+                "error": "يجب توفير قائمة تواريخ (dates) أو نطاق (start, end)"
+            }), 400
+
+        try:
+            quantiles = parse_quantiles(payload['quantiles']) if payload.get('quantiles') else None
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        result = sales_model.predict_sales_batch(dates, quantiles)
+
+        if "error" in result:
+            return jsonify({
+                "success": False,
+                "error": result["error"]
+            }), 400
+
+        return jsonify({
+            "success": True,
+            "data": result
+        })
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"خطأ في التنبؤ: {str(e)}"
+        }), 500
+
+@app.route('/api/predict/scenarios', methods=['POST'])
+def predict_scenarios():
+    """تقييم سيناريوهات "ماذا لو" لليوم التالي: أعمدة ميزات جزئية تُكمل من الحالة الحالية"""
+    try:
+        payload = request.get_json(silent=True) or {}
+
+        columns = payload.get('columns')
+        if not isinstance(columns, dict):
+            return jsonify({
+                "success": False,
+                "error": "يجب توفير أعمدة الميزات (columns) ككائن: اسم الميزة -> قائمة قيم"
+            }), 400
+
+        count = payload.get('count')
+        if count is not None and (not isinstance(count, int) or isinstance(count, bool)):
+            return jsonify({
+                "success": False,
+                "error": "عدد السيناريوهات (count) يجب أن يكون عدداً صحيحاً"
+            }), 400
+
+        result = sales_model.predict_scenarios(columns, count)
+
+        if "error" in result:
+            return jsonify({
+                "success": False,
+                "error": result["error"]
+            }), 400
+
+        # مصفوفة التنبؤات تُرمَّز دفعة واحدة
+        with metrics.stage('serialize'):
+            data = object_json({key: dumps(value) for key, value in result.items() if key != "success"})
+        return success_response(data)
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"خطأ في التنبؤ: {str(e)}"
+        }), 500
+
+@app.route('/api/predict/horizon', methods=['GET'])
+def predict_horizon():
+    """التنبؤ المتسلسل لعدة أيام (days=N أو date=YYYY-MM-DD)"""
+    try:
+        days = request.args.get('days', type=int)
+        target_date = request.args.get('date')
+
+        # تحويل التاريخ المستهدف إلى عدد أيام بعد آخر تاريخ متاح
+        if days is None and target_date:
+            if sales_model.last_available_date is None:
+                return jsonify({
+                    "success": False,
+                    "error": "البيانات غير محملة"
+                }), 500
+            try:
+                days = (pd.to_datetime(target_date).normalize() - sales_model.last_available_date).days
+            except (ValueError, TypeError):
+                return jsonify({
+                    "success": False,
+                    "error": "صيغة التاريخ غير صحيحة. يرجى استخدام YYYY-MM-DD"
+                }), 400
+
+        if days is None:
+            return jsonify({
+                "success": False,
+                "error": "يجب توفير عدد الأيام (days) أو التاريخ المستهدف (date)"
+            }), 400
+
+        result = sales_model.predict_sales_horizon(days)
+
+        if "error" in result:
+            return jsonify({
+                "success": False,
+                "error": result["error"]
+            }), 400
+
+        return jsonify({
+            "success": True,
+            "data": result
+        })
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"خطأ في التنبؤ: {str(e)}"
+        }), 500
+
+@app.route('/api/predict/series', methods=['GET'])
+def predict_series():
+    """التنبؤ باليوم التالي لكل منتج أو فئة مع التقسيم إلى صفحات"""
+    try:
+        level = request.args.get('level')
+        if level is not None:
+            level = level.lower()
+        ids = request.args.get('ids')
+        series_ids = [i.strip() for i in ids.split(',') if i.strip()] if ids else None
+        page = request.args.get('page', 1, type=int)
+        page_size = request.args.get('page_size', 100, type=int)
+
+        result = sales_model.predict_series(level=level, series_ids=series_ids, page=page, page_size=page_size)
 
         if "error" in result:
             return jsonify({
@@ -149,29 +510,13 @@ def get_data_summary():
                 "error": "البيانات غير محملة"
             }), 500
         
-        df = sales_model.df_original
-        
-        summary = {
-            "total_records": len(df),
-            "date_range": {
-                "start": df['sale_date'].min().strftime('%Y-%m-%d'),
-                "end": df['sale_date'].max().strftime('%Y-%m-%d')
-            },
-            "sales_stats": {
-                "total_sales": float(df['total_amount'].sum()),
-                "average_daily_sales": float(df['total_amount'].mean()),
-                "max_daily_sales": float(df['total_amount'].max()),
-                "min_daily_sales": float(df['total_amount'].min())
-            },
-            "quantity_stats": {
-                "total_quantity": int(df['total_quantity'].sum()),
-                "average_daily_quantity": float(df['total_quantity'].mean())
-            },
-            "invoice_stats": {
-                "total_invoices": int(df['invoices_count'].sum()),
-                "average_daily_invoices": float(df['invoices_count'].mean())
-            }
-        }
+        # الملخص يُحسب مرة واحدة لكل نسخة من البيانات
+        summary = sales_model.get_data_summary()
+        if "error" in summary:
+            return jsonify({
+                "success": False,
+                "error": summary["error"]
+            }), 500
         
         return jsonify({
             "success": True,
@@ -184,6 +529,20 @@ def get_data_summary():
             "error": f"خطأ في الحصول على ملخص البيانات: {str(e)}"
         }), 500
 
+def history_fields(rows):
+    """أعمدة أيام السجل في استجابات البيانات"""
+    return [
+        ("date", "date", rows.index),
+        ("total_amount", "float", rows['total_amount']),
+        ("total_quantity", "int", rows['total_quantity']),
+        ("invoices_count", "int", rows['invoices_count']),
+        ("total_discount", "float", rows['total_discount'])
+    ]
+
+def accepts_gzip():
+    """هل يقبل العميل استجابة مضغوطة بـ gzip"""
+    return 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+
 @app.route('/api/data/recent', methods=['GET'])
 def get_recent_data():
     """الحصول على البيانات الحديثة"""
@@ -194,30 +553,99 @@ def get_recent_data():
                 "error": "البيانات غير محملة"
             }), 500
         
-        # الحصول على آخر 30 يوم
-        df = sales_model.df_original.copy()
-        df = df.sort_values('sale_date').tail(30)
-        
-        # تحويل البيانات لصيغة JSON
-        data = []
-        for _, row in df.iterrows():
-            data.append({
-                "date": row['sale_date'].strftime('%Y-%m-%d'),
-                "total_amount": float(row['total_amount']),
-                "total_quantity": int(row['total_quantity']),
-                "invoices_count": int(row['invoices_count']),
-                "total_discount": float(row['total_discount'])
-            })
+        # الحصول على آخر 30 يوم من السجل المرتب (دون نسخ البيانات كاملة)
+        with metrics.stage('data_slice'):
+            recent = sales_model.get_history().tail(30)
+
+        # تحويل البيانات لصيغة JSON عموداً عموداً
+        with metrics.stage('serialize'):
+            data = records_json(history_fields(recent), len(recent))
+
+        return success_response(data)
         
+    except Exception as e:
         return jsonify({
-            "success": True,
-            "data": data
+            "success": False,
+            "error": f"خطأ في الحصول على البيانات الحديثة: {str(e)}"
+        }), 500
+
+@app.route('/api/data/range', methods=['GET'])
+def get_data_range():
+    """أيام السجل بين تاريخين: صفحات JSON أو NDJSON متدفق (format=ndjson)"""
+    try:
+        stream = (request.args.get('format', '').lower() == 'ndjson'
+                  or 'application/x-ndjson' in request.headers.get('Accept', ''))
+        limit = request.args.get('limit', type=int)
+        if not stream:
+            limit = limit or DEFAULT_RANGE_PAGE_SIZE
+            if limit > MAX_RANGE_PAGE_SIZE:
+                return jsonify({
+                    "success": False,
+                    "error": f"limit يجب ألا يتجاوز {MAX_RANGE_PAGE_SIZE} (استخدم format=ndjson للنطاقات الكبيرة)"
+                }), 400
+
+        result = sales_model.get_date_range(
+            start=request.args.get('start'),
+            end=request.args.get('end'),
+            limit=limit,
+            cursor=request.args.get('cursor')
+        )
+
+        if "error" in result:
+            return jsonify({
+                "success": False,
+                "error": result["error"]
+            }), 400
+
+        rows = result.pop("rows")
+        if stream:
+            # الصفوف تُحوّل وتُضغط جزءاً جزءاً أثناء الإرسال
+            def chunks():
+                for offset in range(0, len(rows), STREAM_CHUNK_ROWS):
+                    chunk = rows.iloc[offset:offset + STREAM_CHUNK_ROWS]
+                    yield ndjson_lines(history_fields(chunk), len(chunk))
+
+            headers = {"X-Total-Count": str(result["total"])}
+            if result["next_cursor"] is not None:
+                headers["X-Next-Cursor"] = result["next_cursor"]
+            return stream_response(chunks(), 'application/x-ndjson', compress=accepts_gzip(), headers=headers)
+
+        with metrics.stage('serialize'):
+            members = {key: dumps(value) for key, value in result.items() if key != "success"}
+            members["records"] = records_json(history_fields(rows), len(rows))
+            data = object_json(members)
+        return success_response(data)
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"خطأ في الحصول على بيانات الفترة: {str(e)}"
+        }), 500
+
+@app.route('/api/data/export', methods=['GET'])
+def export_data():
+    """تصدير السجل أو الميزات أو التنبؤات التاريخية كملف CSV أو NDJSON متدفق"""
+    try:
+        dataset = request.args.get('dataset', 'history').lower()
+        fmt = request.args.get('format', 'csv').lower()
+        try:
+            chunks = export_chunks(sales_model, dataset, fmt,
+                                   start=request.args.get('start'), end=request.args.get('end'))
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+
+        filename = f"{dataset}.{fmt}"
+        return stream_response(chunks, MIMETYPES[fmt], compress=accepts_gzip(), headers={
+            "Content-Disposition": f'attachment; filename="{filename}"'
         })
-        
+
     except Exception as e:
         return jsonify({
             "success": False,
-            "error": f"خطأ في الحصول على البيانات الحديثة: {str(e)}"
+            "error": f"خطأ في تصدير البيانات: {str(e)}"
         }), 500
 
 @app.route('/api/data/trends', methods=['GET'])
@@ -230,54 +658,115 @@ def get_trends():
                 "error": "البيانات غير محملة"
             }), 500
         
-        df = sales_model.df_original.copy()
-        df['sale_date'] = pd.to_datetime(df['sale_date'])
-        
-        # اتجاهات شهرية
-        monthly_trends = df.groupby(df['sale_date'].dt.to_period('M')).agg({
-            'total_amount': 'sum',
-            'total_quantity': 'sum',
-            'invoices_count': 'sum'
-        }).reset_index()
-        
-        monthly_data = []
-        for _, row in monthly_trends.iterrows():
-            monthly_data.append({
-                "month": str(row['sale_date']),
-                "total_sales": float(row['total_amount']),
-                "total_quantity": int(row['total_quantity']),
-                "total_invoices": int(row['invoices_count'])
-            })
-        
-        # اتجاهات أسبوعية (آخر 12 أسبوع)
-        df['week'] = df['sale_date'].dt.to_period('W')
-        weekly_trends = df.groupby('week').agg({
-            'total_amount': 'sum',
-            'total_quantity': 'sum',
-            'invoices_count': 'sum'
-        }).tail(12).reset_index()
-        
-        weekly_data = []
-        for _, row in weekly_trends.iterrows():
-            weekly_data.append({
-                "week": str(row['week']),
-                "total_sales": float(row['total_amount']),
-                "total_quantity": int(row['total_quantity']),
-                "total_invoices": int(row['invoices_count'])
+        df = sales_model.df_original
+        with metrics.stage('data_slice'):
+            sale_date = pd.to_datetime(df['sale_date'])
+            totals = df[['total_amount', 'total_quantity', 'invoices_count']]
+
+            # اتجاهات شهرية
+            monthly_trends = totals.groupby(sale_date.dt.to_period('M')).sum()
+
+            # اتجاهات أسبوعية (آخر 12 أسبوع)
+            weekly_trends = totals.groupby(sale_date.dt.to_period('W')).sum().tail(12)
+
+        def trend_records(trends, label):
+            return records_json([
+                (label, "text", trends.index),
+                ("total_sales", "float", trends['total_amount']),
+                ("total_quantity", "int", trends['total_quantity']),
+                ("total_invoices", "int", trends['invoices_count'])
+            ], len(trends))
+
+        with metrics.stage('serialize'):
+            data = object_json({
+                "monthly": trend_records(monthly_trends, "month"),
+                "weekly": trend_records(weekly_trends, "week")
             })
+        return success_response(data)
         
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"خطأ في الحصول على الاتجاهات: {str(e)}"
+        }), 500
+
+@app.route('/api/data/append', methods=['POST'])
+def append_data():
+    """إضافة أيام مبيعات جديدة دون إعادة تشغيل الخدمة"""
+    try:
+        payload = request.get_json(silent=True)
+
+        # يقبل قائمة صفوف مباشرة أو كائناً يحتوي على rows و persist
+        if isinstance(payload, dict) and 'rows' in payload:
+            rows = payload['rows']
+            persist = bool(payload.get('persist', False))
+        else:
+            rows = payload
+            persist = False
+
+        if rows is None:
+            return jsonify({
+                "success": False,
+                "error": "لم يتم استلام أي بيانات"
+            }), 400
+
+        result = sales_model.append_daily_sales(rows, persist=persist)
+
+        if "error" in result:
+            return jsonify({
+                "success": False,
+                "error": result["error"]
+            }), 400
+
         return jsonify({
             "success": True,
-            "data": {
-                "monthly": monthly_data,
-                "weekly": weekly_data
-            }
+            "data": result
         })
-        
+
     except Exception as e:
         return jsonify({
             "success": False,
-            "error": f"خطأ في الحصول على الاتجاهات: {str(e)}"
+            "error": f"خطأ في إضافة البيانات: {str(e)}"
+        }), 500
+
+@app.route('/api/data/series', methods=['POST'])
+def update_series_data():
+    """إضافة أو استبدال مبيعات المنتجات والفئات اليومية"""
+    try:
+        payload = request.get_json(silent=True)
+
+        # يقبل قائمة صفوف، أو كائناً يحتوي على rows (صفوف) أو columns (أعمدة) مع replace و persist
+        if isinstance(payload, dict) and ('rows' in payload or 'columns' in payload):
+            rows = payload.get('rows', payload.get('columns'))
+            replace = bool(payload.get('replace', False))
+            persist = bool(payload.get('persist', False))
+        else:
+            rows = payload
+            replace = persist = False
+
+        if rows is None:
+            return jsonify({
+                "success": False,
+                "error": "لم يتم استلام أي بيانات"
+            }), 400
+
+        result = sales_model.update_series(rows, replace=replace, persist=persist)
+
+        if "error" in result:
+            return jsonify({
+                "success": False,
+                "error": result["error"]
+            }), 400
+
+        return jsonify({
+            "success": True,
+            "data": result
+        })
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"خطأ في تحديث بيانات السلاسل: {str(e)}"
         }), 500
 
 # معالج الأخطاء
@@ -308,5 +797,7 @@ if __name__ == '__main__':
     print("- التنبؤ: http://localhost:5000/api/predict/next")
     print("- ملخص البيانات: http://localhost:5000/api/data/summary")
     print("=" * 50)
-    
-    app.run(debug=True, host='0.0.0.0', port=5000)
+
+    # خادم الإنتاج متعدد العمليات (استخدم --dev لخادم التطوير)
+    from serve import main as serve_main
+    serve_main(app=app)
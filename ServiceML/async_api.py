@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تشغيل واجهة التنبؤ بشكل غير متزامن
+Async Serving (ASGI)
+
+يغلّف تطبيق Flask في api.py بتطبيق ASGI يعمل على حلقة asyncio في كل عامل (gunicorn --worker-class asgi):
+- فحوص الحالة (/health و /api/health) تُجاب مباشرة على الحلقة فلا تنتظر خلف الطلبات البطيئة
+- الطلبات المتزامنة المتطابقة للمسارات المكلفة (التنبؤ باليوم التالي، ملخص البيانات ...) تُدمج
+  لكل (المسار, ترويسة Origin, نسخ البيانات والنموذج) في حساب واحد يشترك الجميع في نتيجته (singleflight)
+  ويُسجَّل كل طلب مدموج في مقاييس الطلبات كأنه مر عبر Flask
+- باقي العمل يُنفَّذ على مجموعة خيوط محدودة مع حد لعدد المهام المنتظرة، وعند امتلائها يُعاد 503
+
+الاستجابات هي نفسها استجابات Flask (نفس المسارات ومعالجة الأخطاء والمقاييس).
+
+    python serve.py --async
+"""
+
+import asyncio
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import metrics
+
+# تُجاب على حلقة الأحداث مباشرة (لا تحتاج إلى حساب)
+INLINE_ROUTES = frozenset({
+    ('GET', '/'),
+    ('GET', '/health'),
+    ('GET', '/api/health'),
+})
+
+# نتيجتها تعتمد فقط على الرابط ونسخة البيانات والنموذج، فتُدمج الطلبات المتزامنة المتطابقة
+COALESCED_ROUTES = frozenset({
+    ('GET', '/api/predict/next'),
+    ('POST', '/api/predict'),
+    ('GET', '/api/predict/bundle'),
+    ('GET', '/api/predict/horizon'),
+    ('GET', '/api/predict/series'),
+    ('GET', '/api/model/info'),
+    ('GET', '/api/data/summary'),
+    ('GET', '/api/data/recent'),
+    ('GET', '/api/data/trends'),
+})
+
+# ترويسات الطلب التي تتغير بها الاستجابة (Vary)، فتكون جزءاً من مفتاح الدمج:
+# flask_cors يعيد Origin الطلب في Access-Control-Allow-Origin
+VARY_HEADERS = (b'origin',)
+
+BUSY_MESSAGE = "الخدمة مشغولة حالياً، يرجى المحاولة بعد قليل"
+
+
+class ServiceBusy(Exception):
+    """عدد المهام الجارية والمنتظرة وصل إلى الحد الأقصى"""
+
+
+class BoundedExecutor:
+    """
+    مجموعة خيوط لعمل المعالج مع حد لعدد المهام الجارية والمنتظرة
+
+    تُستخدم من خيط حلقة الأحداث فقط لذلك لا يحتاج العداد إلى قفل.
+    الخيوط تُنشأ عند أول مهمة (بعد fork في كل عامل).
+    """
+
+    def __init__(self, threads, queue_size):
+        self.threads = max(int(threads), 1)
+        self.limit = self.threads + max(int(queue_size), 0)
+        self.pending = 0
+        self._pool = None
+
+    def submit(self, fn, *args, admitted=False):
+        """
+        تنفيذ دالة على الخيوط
+
+        Args:
+            admitted: تكملة لطلب مقبول مسبقاً (لا يُرفض حتى لا ينقطع في منتصفه)
+        """
+        if not admitted and self.pending >= self.limit:
+            raise ServiceBusy()
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.threads, thread_name_prefix='ml-compute')
+        self.pending += 1
+        future = asyncio.get_running_loop().run_in_executor(self._pool, partial(fn, *args))
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        self.pending -= 1
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+class SingleFlight:
+    """دمج الحسابات المتزامنة لنفس المفتاح: أول طلب يحسب والباقي ينتظرون نفس النتيجة"""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, start):
+        """
+        Args:
+            key: مفتاح الحساب
+            start: دالة تبدأ الحساب وتعيد Future (تُستدعى فقط إذا لم يكن جارياً)
+
+        Returns:
+            tuple: (النتيجة, True إذا كانت من حساب طلب آخر)
+        """
+        future = self._calls.get(key)
+        shared = future is not None
+        if not shared:
+            future = start()
+            self._calls[key] = future
+            # الإزالة عند انتهاء الحساب وليس عند انتهاء الطلب الأول (قد يُلغى إذا انقطع اتصاله)
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(future), shared
+
+
+def wsgi_environ(scope, body):
+    """بيئة WSGI من طلب ASGI"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client')
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # WSGI يمرر المسار كبايتات UTF-8 مفسرة بـ latin-1
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0] if client else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name, value = name.decode('latin-1').lower(), value.decode('latin-1')
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'content-length':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def start_wsgi(wsgi_app, environ):
+    """
+    بدء طلب WSGI
+
+    Returns:
+        tuple: (الحالة, الترويسات, مكرر الجسم)
+    """
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+    body = wsgi_app(environ, start_response)
+    iterator = iter(body)
+    # بعض التطبيقات تستدعي start_response عند أول جزء من الجسم
+    first = next(iterator, None) if 'status' not in started else None
+    chunks = _prepend(first, iterator) if first is not None else iterator
+    return started['status'], started['headers'], _Body(chunks, body)
+
+
+def call_wsgi(wsgi_app, environ):
+    """تنفيذ طلب WSGI كاملاً وإعادة (الحالة, الترويسات, الجسم كبايتات)"""
+    status, headers, body = start_wsgi(wsgi_app, environ)
+    try:
+        return status, headers, b''.join(body)
+    finally:
+        body.close()
+
+
+def _prepend(first, iterator):
+    yield first
+    yield from iterator
+
+
+class _Body:
+    """مكرر جسم الاستجابة مع close() للتطبيق الأصلي"""
+
+    def __init__(self, chunks, source):
+        self._chunks = chunks
+        self._source = source
+
+    def __iter__(self):
+        return self._chunks
+
+    def next_chunk(self):
+        return next(self._chunks, None)
+
+    def close(self):
+        close = getattr(self._source, 'close', None)
+        if close is not None:
+            close()
+
+
+def _vary_values(scope):
+    """قيم ترويسات VARY_HEADERS في الطلب (بترتيبها، None للغائبة)"""
+    values = dict.fromkeys(VARY_HEADERS)
+    for name, value in scope.get('headers', []):
+        name = name.lower()
+        if name in values:
+            values[name] = value if values[name] is None else values[name] + b',' + value
+    return tuple(values.values())
+
+
+async def _read_body(receive):
+    parts = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        parts.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            break
+    return b''.join(parts)
+
+
+async def _send_response(send, status, headers, body):
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _busy_response():
+    body = json.dumps({"success": False, "error": BUSY_MESSAGE}, ensure_ascii=False).encode('utf-8')
+    headers = [
+        (b'content-type', b'application/json; charset=utf-8'),
+        (b'content-length', str(len(body)).encode()),
+        (b'retry-after', b'1'),
+    ]
+    return 503, headers, body
+
+
+class AsyncSalesApp:
+    """تطبيق ASGI يغلّف تطبيق Flask مع دمج الطلبات ومجموعة خيوط محدودة"""
+
+    def __init__(self, wsgi_app, handler, threads=4, queue_size=64):
+        """
+        Args:
+            wsgi_app: تطبيق Flask
+            handler: معالج النموذج (لنسختي البيانات والنموذج في مفتاح الدمج)
+            threads: عدد خيوط الحساب في كل عامل
+            queue_size: أقصى عدد مهام منتظرة فوق عدد الخيوط قبل رفض الطلبات بـ 503
+        """
+        self.wsgi_app = wsgi_app
+        self.handler = handler
+        self.executor = BoundedExecutor(threads, queue_size)
+        self.flight = SingleFlight()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        route = (scope['method'], scope['path'])
+        environ = wsgi_environ(scope, await _read_body(receive))
+
+        if route in INLINE_ROUTES:
+            await _send_response(send, *call_wsgi(self.wsgi_app, environ))
+            return
+
+        try:
+            if route in COALESCED_ROUTES:
+                start = time.perf_counter()
+                key = route + (scope.get('query_string', b''), _vary_values(scope), self.handler.data_version,
+                               self.handler.series_version, self.handler.model_version)
+                response, shared = await self.flight.do(
+                    key, lambda: self.executor.submit(call_wsgi, self.wsgi_app, environ)
+                )
+                if shared:
+                    # الطلب الأول فقط مر عبر Flask وسُجّل، فيُسجَّل هذا الطلب هنا بنفس التسميات
+                    metrics.registry.inc('ml_coalesced_requests_total', (scope['path'],))
+                    metrics.record_request(scope['path'], scope['method'], response[0],
+                                           self.handler.model_version, time.perf_counter() - start)
+                await _send_response(send, *response)
+            else:
+                await self._stream(environ, send)
+        except ServiceBusy:
+            endpoint = scope['path'] if route in COALESCED_ROUTES else 'other'
+            metrics.registry.inc('ml_rejected_requests_total', (endpoint,))
+            await _send_response(send, *_busy_response())
+
+    async def _stream(self, environ, send):
+        """تنفيذ الطلب على مجموعة الخيوط وإرسال الجسم جزءاً جزءاً (للاستجابات المتدفقة)"""
+        status, headers, body = await self.executor.submit(start_wsgi, self.wsgi_app, environ)
+        try:
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            while True:
+                # كل جزء يُحسب على الخيوط (قد يكون مولداً يقرأ البيانات)
+                chunk = await self.executor.submit(body.next_chunk, admitted=True)
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            body.close()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار دقة التنبؤ على السجل التاريخي (walk-forward)
+Walk-Forward Backtest
+
+لكل يوم في البيانات المعالجة يُعاد التنبؤ باليوم التالي كما لو كان آخر تاريخ متاح هو اليوم السابق له:
+الميزات تُبنى من البيانات السابقة للتاريخ فقط (build_feature_frame)، ثم تُقارن التنبؤات بالمبيعات الفعلية.
+تُقسم التواريخ على مجموعة عمليات عند كبر السجل، وتُحسب MAE و MAPE و RMSE إجمالاً ولكل يوم أسبوع ولكل شهر.
+
+    python backtest.py
+    python backtest.py --start 2023-06-01 --end 2024-03-30 --workers 4 --output backtest.json
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# مسارات البيانات والنموذج نسبية لمجلد الخدمة
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+os.chdir(SERVICE_DIR)
+sys.path.insert(0, SERVICE_DIR)
+
+import numpy as np
+import pandas as pd
+
+from feature_engine import build_feature_frame
+
+# أقل عدد تواريخ لكل عملية (أقل من ذلك يكون التنفيذ في عملية واحدة أسرع)
+MIN_CHUNK_SIZE = 2000
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# المعالج المستخدم في العملية الحالية (يُورث مع fork أو يُهيأ في كل عملية)
+_handler = None
+
+
+def _load_handler():
+    global _handler
+    if _handler is None:
+        from model_handler import SalesModelHandler
+        handler = SalesModelHandler()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            if not handler.initialize():
+                raise RuntimeError("فشل تهيئة معالج النموذج")
+        _handler = handler
+    return _handler
+
+
+def predict_origins(target_dates):
+    """
+    تنبؤ كل تاريخ مستهدف من البيانات السابقة له فقط
+
+    Returns:
+        ndarray: التنبؤ لكل تاريخ (NaN إذا لم تتوفر بيانات تاريخية كافية)
+    """
+    handler = _load_handler()
+    artifacts = handler.artifacts
+    dates = pd.DatetimeIndex(target_dates)
+    X = build_feature_frame(handler.get_history(), handler.df_clean, dates, artifacts.feature_columns).to_numpy()
+    valid = ~np.isnan(X).any(axis=1)
+    predictions = np.full(len(dates), np.nan)
+    if valid.any():
+        predictions[valid] = handler._score_rows(X[valid], artifacts)
+    return predictions
+
+
+def _error_metrics(actual, predicted):
+    errors = predicted - actual
+    nonzero = actual != 0
+    return {
+        "count": int(len(actual)),
+        "mae": float(np.mean(np.abs(errors))),
+        "rmse": float(np.sqrt(np.mean(errors ** 2))),
+        # الأيام ذات المبيعات الصفرية لا تدخل في النسبة المئوية
+        "mape": float(np.mean(np.abs(errors[nonzero] / actual[nonzero])) * 100) if nonzero.any() else None,
+    }
+
+
+def summarize(dates, actual, predicted):
+    """مقاييس الخطأ إجمالاً ولكل يوم أسبوع ولكل شهر"""
+    dates = pd.DatetimeIndex(dates)
+    valid = ~np.isnan(predicted)
+    dates, actual, predicted = dates[valid], actual[valid], predicted[valid]
+
+    by_weekday = {}
+    for day, name in enumerate(WEEKDAYS):
+        mask = dates.dayofweek == day
+        if mask.any():
+            by_weekday[name] = _error_metrics(actual[mask], predicted[mask])
+
+    by_month = {}
+    for month in range(1, 13):
+        mask = dates.month == month
+        if mask.any():
+            by_month[str(month)] = _error_metrics(actual[mask], predicted[mask])
+
+    return {
+        "overall": _error_metrics(actual, predicted) if len(actual) else None,
+        "skipped": int((~valid).sum()),
+        "by_weekday": by_weekday,
+        "by_month": by_month,
+    }
+
+
+def run_backtest(start=None, end=None, workers=None):
+    """
+    تشغيل الاختبار على تواريخ البيانات المعالجة بين start و end
+
+    Args:
+        start, end: حدود التواريخ المستهدفة (اختياري)
+        workers: عدد العمليات (الافتراضي: عدد الأنوية عند كبر السجل)
+
+    Returns:
+        dict: الفترة والمقاييس
+    """
+    handler = _load_handler()
+    targets = handler.df_clean.sort_index()
+    targets = targets[~targets.index.duplicated(keep='last')]
+    if start is not None:
+        targets = targets[targets.index >= pd.Timestamp(start)]
+    if end is not None:
+        targets = targets[targets.index <= pd.Timestamp(end)]
+    if targets.empty:
+        raise ValueError("لا توجد تواريخ في الفترة المحددة")
+
+    dates = targets.index
+    actual = targets['total_amount'].to_numpy(dtype=float)
+
+    workers = workers or multiprocessing.cpu_count()
+    workers = max(1, min(workers, len(dates) // MIN_CHUNK_SIZE))
+    if workers == 1:
+        predicted = predict_origins(dates)
+    else:
+        chunks = np.array_split(np.arange(len(dates)), workers)
+        # مع fork ترث العمليات المعالج المحمّل، وإلا يُحمّل في كل عملية عند أول مهمة
+        context = multiprocessing.get_context('fork' if hasattr(os, 'fork') else 'spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            parts = pool.map(predict_origins, [dates[chunk] for chunk in chunks])
+            predicted = np.concatenate(list(parts))
+
+    return {
+        "start": dates[0].strftime('%Y-%m-%d'),
+        "end": dates[-1].strftime('%Y-%m-%d'),
+        "origins": len(dates),
+        "workers": workers,
+        "model_version": handler.model_version,
+        "metrics": summarize(dates, actual, predicted),
+    }
+
+
+def print_summary(result):
+    metrics = result["metrics"]
+    print(f"الفترة: {result['start']} → {result['end']} ({result['origins']} يوم، {result['workers']} عملية)")
+    if metrics["skipped"]:
+        print(f"تم تجاوز {metrics['skipped']} يوم لعدم توفر بيانات تاريخية كافية")
+
+    def rows(title, groups):
+        print(f"\n{title:<12} {'count':>6} {'MAE':>12} {'MAPE %':>8} {'RMSE':>12}")
+        for name, m in groups.items():
+            mape = f"{m['mape']:.2f}" if m['mape'] is not None else '-'
+            print(f"{name:<12} {m['count']:>6} {m['mae']:>12.2f} {mape:>8} {m['rmse']:>12.2f}")
+
+    if metrics["overall"] is not None:
+        rows("", {"overall": metrics["overall"]})
+    rows("weekday", metrics["by_weekday"])
+    rows("month", metrics["by_month"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="اختبار دقة التنبؤ على السجل التاريخي")
+    parser.add_argument('--start', help="أول تاريخ مستهدف (YYYY-MM-DD)")
+    parser.add_argument('--end', help="آخر تاريخ مستهدف (YYYY-MM-DD)")
+    parser.add_argument('--workers', type=int, default=None, help="عدد العمليات (الافتراضي: عدد الأنوية)")
+    parser.add_argument('--output', help="حفظ النتائج في ملف JSON")
+    args = parser.parse_args(argv)
+
+    result = run_backtest(args.start, args.end, args.workers)
+    print_summary(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\n✓ النتائج: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
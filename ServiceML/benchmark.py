@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس أداء المسارات الساخنة لخدمة التنبؤ
+ServiceML Benchmarks
+
+يقيس بدء التشغيل (initialize) والتنبؤ باليوم التالي ونقاط /api/data/summary و/recent و/trends
+عبر Flask test client، على البيانات المرفقة وعلى سجلات مولدة بأطوال 10x و100x و1000x.
+تُكتب النتائج بصيغة JSON وتُقارن بخط أساس محفوظ، ويُعاد رمز خروج 1 عند وجود تراجع في الأداء.
+
+تُكرر جميع الحالات عدة جولات كاملة (--rounds) ويُحفظ لكل حالة قياس الجولة ذات الوسيط الأوسط،
+فلا تحدد النتيجة جولةٌ واحدة أسرع أو أبطأ من المعتاد (تهيئة العملية أو حمل الجهاز).
+الأزمنة مطلقة فلا تصح المقارنة إلا على نفس الجهاز: يُحفظ وصف الجهاز مع خط الأساس ويُنبَّه عند اختلافه
+(على جهاز آخر يُحفظ خط أساس جديد أولاً).
+
+    python benchmark.py                          # القياس والمقارنة مع benchmarks/baseline.json
+    python benchmark.py --scales 1,10            # مجموعات بيانات محددة
+    python benchmark.py --save-baseline          # حفظ النتائج الحالية كخط أساس جديد
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# مسارات البيانات والنموذج نسبية لمجلد الخدمة
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+os.chdir(SERVICE_DIR)
+sys.path.insert(0, SERVICE_DIR)
+
+import numpy as np
+import pandas as pd
+
+import model_handler
+from feature_engine import prepare_history, materialize_processed
+from snapshot import snapshot_path
+
+BENCHMARK_DIR = 'benchmarks'
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, 'baseline.json')
+RESULTS_PATH = os.path.join(BENCHMARK_DIR, 'results.json')
+
+DEFAULT_SCALES = [1, 10, 100, 1000]
+DEFAULT_ROUNDS = 3
+
+# التراجع = الوسيط أبطأ من خط الأساس بأكثر من هذه النسبة وبأكثر من الحد الأدنى المطلق.
+# بين تشغيلين متتاليين على نفس الجهاز (3 جولات) وصل الفرق إلى 1.3x، فالحد أعلى منه بهامش
+DEFAULT_TOLERANCE = 0.5
+# الحالات التي تستغرق نحو 0.1 مللي ثانية تتذبذب بين 0.08 و0.15 لنفس الشيفرة، فالفروق الأصغر ضجيج
+MIN_REGRESSION_MS = 0.1
+
+# أقدم تاريخ يمكن تمثيله في pandas (datetime64[ns])
+MIN_SYNTHETIC_DATE = pd.Timestamp('1678-01-01')
+
+
+def generate_history(source, scale, seed=42):
+    """
+    سجل يومي مولد بطول scale × طول البيانات المرفقة وينتهي بنفس آخر تاريخ
+
+    القيم تُسحب من توزيع البيانات الأصلية لكل يوم أسبوع مع اتجاه عام وتذبذب سنوي،
+    ويُقتطع السجل عند أقدم تاريخ تدعمه pandas إذا تجاوزه.
+    """
+    end = source['sale_date'].max()
+    periods = min(len(source) * scale, (end - MIN_SYNTHETIC_DATE).days + 1)
+    dates = pd.date_range(end=end, periods=periods, freq='D')
+
+    rng = np.random.default_rng(seed)
+    weekday = dates.dayofweek.to_numpy()
+    profile = source.groupby(source['sale_date'].dt.dayofweek)[
+        ['total_amount', 'total_quantity', 'invoices_count', 'total_discount']
+    ].agg(['mean', 'std']).reindex(range(7)).ffill().bfill()
+
+    season = 1.0 + 0.15 * np.sin(2 * np.pi * dates.dayofyear.to_numpy() / 365.25)
+    trend = np.linspace(0.8, 1.0, len(dates))
+
+    def draw(column, minimum=0.0):
+        mean = profile[(column, 'mean')].to_numpy()[weekday]
+        std = np.nan_to_num(profile[(column, 'std')].to_numpy()[weekday])
+        return np.maximum(rng.normal(mean, std) * season * trend, minimum)
+
+    return pd.DataFrame({
+        'sale_date': dates,
+        'day_of_week': dates.day_name(),
+        'invoices_count': np.rint(draw('invoices_count', 1)).astype(np.int64),
+        'total_quantity': np.rint(draw('total_quantity', 1)).astype(np.int64),
+        'total_discount': np.round(draw('total_discount'), 2),
+        'total_amount': np.round(draw('total_amount', 1.0), 2),
+    })
+
+
+def write_dataset(directory, scale):
+    """
+    كتابة ملفي Daily_sales.csv و processed_sales_data.csv لمجموعة بيانات في directory
+
+    في الجولات التالية تُستخدم الملفات المولدة نفسها وتُحذف نسخها الثنائية فقط حتى يبقى قياس startup_cold بارداً.
+    """
+    os.makedirs(directory, exist_ok=True)
+    daily_path = os.path.join(directory, 'Daily_sales.csv')
+    processed_path = os.path.join(directory, 'processed_sales_data.csv')
+
+    if os.path.exists(daily_path) and os.path.exists(processed_path):
+        for path in (daily_path, processed_path):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(snapshot_path(path))
+    elif scale == 1:
+        # البيانات المرفقة كما هي (نسخة حتى لا تتأثر نسخها الثنائية بالقياس)
+        shutil.copyfile(model_handler.DAILY_SALES_PATH, daily_path)
+        shutil.copyfile(model_handler.PROCESSED_DATA_PATH, processed_path)
+    else:
+        source = pd.read_csv(model_handler.DAILY_SALES_PATH, parse_dates=['sale_date'])
+        daily = generate_history(source, scale)
+        daily.to_csv(daily_path, index=False, date_format='%Y-%m-%d')
+        processed = materialize_processed(prepare_history(daily))
+        processed.to_csv(processed_path, date_format='%Y-%m-%d')
+
+    return daily_path, processed_path
+
+
+@contextlib.contextmanager
+def data_paths(daily_path, processed_path):
+    """توجيه معالج النموذج إلى ملفات مجموعة بيانات مؤقتاً"""
+    saved = model_handler.DAILY_SALES_PATH, model_handler.PROCESSED_DATA_PATH
+    model_handler.DAILY_SALES_PATH, model_handler.PROCESSED_DATA_PATH = daily_path, processed_path
+    try:
+        yield
+    finally:
+        model_handler.DAILY_SALES_PATH, model_handler.PROCESSED_DATA_PATH = saved
+
+
+@contextlib.contextmanager
+def quiet():
+    """إخفاء رسائل التهيئة أثناء القياس"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def measure(func, repeat, warmup=1):
+    """تنفيذ الدالة repeat مرة وإرجاع إحصاءات الزمن بالمللي ثانية"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples.sort()
+    return {
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[min(int(round(0.95 * (len(samples) - 1))), len(samples) - 1)],
+        "min_ms": samples[0],
+        "runs": len(samples)
+    }
+
+
+def benchmark_dataset(client, api, scale, directory, repeat, startup_repeat):
+    """قياس جميع الحالات لمجموعة بيانات واحدة"""
+    daily_path, processed_path = write_dataset(directory, scale)
+    results = {}
+
+    with data_paths(daily_path, processed_path):
+        def startup():
+            handler = model_handler.SalesModelHandler()
+            with quiet():
+                if not handler.initialize():
+                    raise RuntimeError("فشل تهيئة المعالج")
+            return handler
+
+        # أول تحميل يقرأ CSV ويبني النسخ الثنائية، وما بعده يقرأ النسخ الثنائية
+        start = time.perf_counter()
+        startup()
+        results["startup_cold"] = {"median_ms": (time.perf_counter() - start) * 1000.0, "runs": 1}
+        results["startup"] = measure(startup, startup_repeat, warmup=0)
+
+        handler = startup()
+        api.sales_model = handler
+        results["rows"] = {"daily": len(handler.df_original), "processed": len(handler.df_clean)}
+
+        results["predict_next_day"] = measure(handler.predict_next_day_sales, repeat)
+        results["predict_next_day_compute"] = measure(handler._compute_next_day_forecast, repeat)
+
+        def get(path):
+            def call():
+                response = client.get(path)
+                # الاستجابات المتدفقة تُقرأ كاملة حتى يشمل القياس توليد الجسم
+                response.get_data()
+                if response.status_code != 200:
+                    raise RuntimeError(f"{path}: {response.status_code} {response.get_data(as_text=True)[:200]}")
+            return call
+
+        results["api_data_summary"] = measure(get('/api/data/summary'), repeat)
+        results["data_summary_compute"] = measure(handler._compute_data_summary, repeat)
+        results["api_data_recent"] = measure(get('/api/data/recent'), repeat)
+        results["api_data_trends"] = measure(get('/api/data/trends'), repeat)
+        results["api_data_range_page"] = measure(get('/api/data/range?start=2023-06-01&limit=1000'), repeat)
+        results["api_data_range_ndjson"] = measure(get('/api/data/range?format=ndjson'), repeat)
+
+        # 10000 سيناريو "ماذا لو" بتغيير الخصم ومبيعات الأمس
+        rng = np.random.default_rng(0)
+        scenarios = json.dumps({"columns": {
+            "discount_lag_1": rng.uniform(0, 5000, 10000).round(2).tolist(),
+            "sales_lag_1": rng.uniform(5000, 60000, 10000).round(2).tolist()
+        }})
+
+        def post_scenarios():
+            response = client.post('/api/predict/scenarios', data=scenarios, content_type='application/json')
+            if response.status_code != 200:
+                raise RuntimeError(f"/api/predict/scenarios: {response.status_code} {response.get_data(as_text=True)[:200]}")
+
+        results["api_predict_scenarios_10k"] = measure(post_scenarios, repeat)
+
+    return results
+
+
+def machine_info():
+    """وصف الجهاز الذي تصح عليه مقارنة الأزمنة المطلقة"""
+    cpu = platform.processor()
+    with contextlib.suppress(OSError):
+        with open('/proc/cpuinfo', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    cpu = line.split(':', 1)[1].strip()
+                    break
+    return {"cpu": cpu or platform.machine(), "cpu_count": os.cpu_count(), "system": platform.system()}
+
+
+def combine_rounds(rounds):
+    """نتيجة كل حالة من الجولة ذات الوسيط الأوسط (وسيط الوسائط) مع وسائط جميع الجولات"""
+    combined = {"rows": rounds[0]["rows"]}
+    for case in rounds[0]:
+        if case == "rows":
+            continue
+        ordered = sorted((results[case] for results in rounds), key=lambda stats: stats["median_ms"])
+        combined[case] = dict(ordered[len(ordered) // 2])
+        combined[case]["round_medians_ms"] = [results[case]["median_ms"] for results in rounds]
+    return combined
+
+
+def run_benchmarks(scales, repeat, startup_repeat, rounds=DEFAULT_ROUNDS, tolerance=DEFAULT_TOLERANCE):
+    with quiet():
+        import api
+    client = api.app.test_client()
+    original_handler = api.sales_model
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": machine_info(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "repeat": repeat,
+            "startup_repeat": startup_repeat,
+            "rounds": rounds,
+            "tolerance": tolerance
+        },
+        "datasets": {}
+    }
+
+    workdir = tempfile.mkdtemp(prefix='ml-bench-')
+    measured = {f'x{scale}': [] for scale in scales}
+    try:
+        for round_index in range(rounds):
+            for scale in scales:
+                name = f'x{scale}'
+                print(f"⏱  {name} (جولة {round_index + 1}/{rounds}) ...", flush=True)
+                results = benchmark_dataset(
+                    client, api, scale, os.path.join(workdir, name), repeat, startup_repeat
+                )
+                measured[name].append(results)
+                if round_index == 0:
+                    print(f"   {results['rows']['daily']} يوم")
+        report["datasets"] = {name: combine_rounds(rounds_results) for name, rounds_results in measured.items()}
+    finally:
+        api.sales_model = original_handler
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return report
+
+
+def compare(report, baseline, tolerance):
+    """
+    مقارنة النتائج بخط الأساس
+
+    Returns:
+        list: (مجموعة البيانات, الحالة, الأساس, الحالي, النسبة, تراجع؟)
+    """
+    rows = []
+    for dataset, cases in report["datasets"].items():
+        base_cases = baseline.get("datasets", {}).get(dataset, {})
+        for case, stats in cases.items():
+            base = base_cases.get(case)
+            if case == "rows" or base is None:
+                continue
+            current_ms, base_ms = stats["median_ms"], base["median_ms"]
+            ratio = current_ms / base_ms if base_ms > 0 else float('inf')
+            regressed = ratio > 1.0 + tolerance and current_ms - base_ms > MIN_REGRESSION_MS
+            rows.append((dataset, case, base_ms, current_ms, ratio, regressed))
+    return rows
+
+
+def missing_cases(report, baseline):
+    """
+    الحالات المقاسة التي لا يوجد لها خط أساس في مجموعة بيانات موجودة فيه
+
+    حالة جديدة دون خط أساس لا تُقارن أبداً، لذلك تُعتبر فشلاً حتى يُحفظ خط الأساس معها.
+    """
+    missing = []
+    for dataset, cases in report["datasets"].items():
+        base_cases = baseline.get("datasets", {}).get(dataset)
+        if base_cases is None:
+            continue
+        missing += [(dataset, case) for case in cases if case != "rows" and case not in base_cases]
+    return missing
+
+
+def print_report(report, comparison):
+    compared = {(dataset, case): (base, ratio, regressed)
+                for dataset, case, base, _, ratio, regressed in comparison}
+    print(f"\n{'dataset':<8} {'case':<26} {'median ms':>11} {'p95 ms':>10} {'baseline':>10} {'ratio':>7}")
+    for dataset, cases in report["datasets"].items():
+        for case, stats in cases.items():
+            if case == "rows":
+                continue
+            base, ratio, regressed = compared.get((dataset, case), (None, None, False))
+            p95 = f"{stats['p95_ms']:.3f}" if "p95_ms" in stats else '-'
+            base_text = f"{base:.3f}" if base is not None else '-'
+            ratio_text = f"{ratio:.2f}" if ratio is not None else '-'
+            flag = '  ⚠ تراجع' if regressed else ''
+            print(f"{dataset:<8} {case:<26} {stats['median_ms']:>11.3f} {p95:>10} {base_text:>10} {ratio_text:>7}{flag}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="قياس أداء خدمة التنبؤ بالمبيعات")
+    parser.add_argument('--scales', default=','.join(str(s) for s in DEFAULT_SCALES),
+                        help="مضاعفات طول البيانات المرفقة مفصولة بفواصل (1 = البيانات المرفقة)")
+    parser.add_argument('--repeat', type=int, default=30, help="عدد التكرارات لكل حالة")
+    parser.add_argument('--startup-repeat', type=int, default=3, help="عدد تكرارات قياس بدء التشغيل")
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS,
+                        help="عدد جولات القياس الكاملة (تُحفظ الجولة ذات الوسيط الأوسط لكل حالة)")
+    parser.add_argument('--output', default=RESULTS_PATH, help="ملف النتائج (JSON)")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="ملف خط الأساس (JSON)")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="نسبة الإبطاء المسموحة قبل اعتبارها تراجعاً")
+    parser.add_argument('--save-baseline', action='store_true', help="حفظ النتائج كخط أساس جديد")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scales = [int(s) for s in args.scales.split(',') if s.strip()]
+
+    report = run_benchmarks(scales, args.repeat, args.startup_repeat, max(args.rounds, 1), args.tolerance)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"✓ النتائج: {args.output}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"✓ تم حفظ خط الأساس: {args.baseline}")
+        print_report(report, [])
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"⚠ لا يوجد خط أساس في {args.baseline} (استخدم --save-baseline)")
+        print_report(report, [])
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    baseline_machine = baseline.get("meta", {}).get("machine")
+    if baseline_machine != report["meta"]["machine"]:
+        print(f"⚠ خط الأساس مسجل على جهاز آخر ({baseline_machine}) فالأزمنة المطلقة غير قابلة للمقارنة: "
+              f"احفظ خط أساس على هذا الجهاز أولاً (--save-baseline)")
+    comparison = compare(report, baseline, args.tolerance)
+    print_report(report, comparison)
+
+    missing = missing_cases(report, baseline)
+    if missing:
+        names = ', '.join(f'{dataset}/{case}' for dataset, case in missing)
+        print(f"\n❌ حالات بلا خط أساس (استخدم --save-baseline): {names}")
+
+    regressions = [row for row in comparison if row[-1]]
+    if regressions:
+        print(f"\n❌ {len(regressions)} حالة أبطأ من خط الأساس بأكثر من {args.tolerance:.0%}")
+    if regressions or missing:
+        return 1
+    print("\n✅ لا يوجد تراجع في الأداء")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
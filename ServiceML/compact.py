@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+أنواع بيانات مضغوطة لجداول السجل في الذاكرة
+Compact In-Memory Frames
+
+يقرأ pandas الأعداد كـ int64/float64 والنصوص ككائنات Python، بينما تكفي معظم الأعمدة أنواع أصغر:
+- الأعداد الصحيحة (العدد والكمية وحقول التقويم): أصغر نوع يتسع لقيمها (int8/int16/int32)
+- الأعداد العشرية: float32 فقط إذا عادت جميع القيم كما هي تماماً بعد التحويل، فلا تتغير الميزات
+  ولا التنبؤات (المبالغ بالهللات عادةً لا تتسع في float32 فتبقى float64)
+- النصوص المتكررة (مثل يوم الأسبوع): categorical
+"""
+
+import numpy as np
+import pandas as pd
+
+# النصوص تُحوَّل إلى categorical إذا لم تتجاوز نسبة القيم المختلفة هذا الحد
+MAX_CATEGORY_RATIO = 0.5
+
+
+def compact_column(values):
+    """أصغر نوع يحفظ جميع قيم العمود دون تغيير"""
+    dtype = values.dtype
+    if pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+        return values
+    if pd.api.types.is_integer_dtype(dtype):
+        return pd.to_numeric(values, downcast='integer')
+    if pd.api.types.is_float_dtype(dtype):
+        if dtype == np.float32:
+            return values
+        array = values.to_numpy(dtype=np.float64)
+        with np.errstate(over='ignore', invalid='ignore'):
+            narrow = array.astype(np.float32)
+        if np.array_equal(narrow.astype(np.float64), array, equal_nan=True):
+            return pd.Series(narrow, index=values.index, name=values.name)
+        return values
+    if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+        if len(values) and values.nunique(dropna=True) <= len(values) * MAX_CATEGORY_RATIO:
+            return values.astype('category')
+    return values
+
+
+def compact_frame(frame, columns=None):
+    """
+    نسخة من الجدول بأنواع بيانات مضغوطة دون فقد أي قيمة
+
+    Args:
+        frame: الجدول
+        columns: الأعمدة المطلوب الاحتفاظ بها (None لجميع الأعمدة)
+
+    Returns:
+        DataFrame: نفس الصفوف والفهرس والقيم
+    """
+    if columns is not None:
+        frame = frame[list(columns)]
+    return pd.DataFrame({column: compact_column(frame[column]) for column in frame.columns}, index=frame.index)
+
+
+def frame_memory(frame):
+    """
+    حجم الجدول في الذاكرة لكل عمود (مع محتوى النصوص)
+
+    Returns:
+        dict: عدد الصفوف والحجم الكلي ونوع وحجم كل عمود
+    """
+    usage = frame.memory_usage(deep=True)
+    return {
+        "rows": len(frame),
+        "bytes": int(usage.sum()),
+        "index_bytes": int(usage['Index']),
+        "columns": {
+            column: {"dtype": str(frame[column].dtype), "bytes": int(usage[column])}
+            for column in frame.columns
+        }
+    }
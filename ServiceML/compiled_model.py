@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+محرك تنبؤ مُجمَّع للغابة العشوائية مع الـ Scaler
+Compiled Forest Inference
+
+يُدمج تطبيع StandardScaler في عتبات التقسيم فتُقارن الميزات الخام مباشرة، وتُقيَّم الأشجار
+من مصفوفات عقد متجاورة دون استدعاء sklearn أثناء الطلب.
+يُستخدم numba عند توفره لتقييم الصف الواحد في ميكروثوانٍ، وإلا يُستخدم تقييم NumPy متجه.
+"""
+
+import hashlib
+
+import numpy as np
+
+from shared_model import SharedForest, flatten_forest, is_supported
+
+try:
+    from numba import njit
+except ImportError:  # numba اختياري
+    njit = None
+
+INT64_MIN = np.iinfo(np.int64).min
+
+
+def _to_ordered(values):
+    """تحويل float64 إلى أعداد صحيحة بنفس الترتيب (للبحث الثنائي على القيم الممكنة)"""
+    bits = values.view(np.int64)
+    return np.where(bits < 0, INT64_MIN - bits, bits)
+
+
+def _from_ordered(ordered):
+    bits = np.where(ordered < 0, INT64_MIN - ordered, ordered)
+    return bits.view(np.float64)
+
+
+def fold_thresholds(feature, threshold, internal, mean, scale):
+    """
+    تحويل عتبات التقسيم من الفضاء المطبَّع إلى فضاء الميزات الخام
+
+    sklearn تقارن float32((x - mean) / scale) <= t. هذه الدالة رتيبة في x، لذلك لكل عقدة
+    توجد أكبر قيمة خام x* تحقق الشرط، ويصبح الشرط مكافئاً تماماً لـ x <= x*.
+    تُحسب x* ببحث ثنائي على جميع قيم float64 الممكنة (64 خطوة لكل العقد معاً).
+    """
+    folded = np.array(threshold, dtype=np.float64)
+    columns = feature[internal]
+    t = folded[internal]
+    m = mean[columns]
+    s = scale[columns]
+
+    def passes(x):
+        return ((x - m) / s).astype(np.float32) <= t
+
+    # الحد الأدنى يحقق الشرط دائماً والحد الأعلى لا يحققه
+    low = np.full(len(t), _to_ordered(np.array([-np.finfo(np.float64).max]))[0])
+    high = np.full(len(t), _to_ordered(np.array([np.finfo(np.float64).max]))[0])
+    with np.errstate(over='ignore', invalid='ignore'):
+        for _ in range(64):
+            active = high > low + 1
+            if not active.any():
+                break
+            # متوسط دون تجاوز حدود int64
+            middle = (low >> 1) + (high >> 1) + (low & high & 1)
+            ok = passes(_from_ordered(middle))
+            low = np.where(active & ok, middle, low)
+            high = np.where(active & ~ok, middle, high)
+
+    folded[internal] = _from_ordered(low)
+    return folded
+
+
+def fold_raw_thresholds(arrays, mean, scale):
+    """عتبات جميع العقد في فضاء الميزات الخام (الأوراق تبقى كما هي)"""
+    left = np.asarray(arrays['left'])
+    internal = left != np.arange(len(left))
+    return fold_thresholds(np.asarray(arrays['feature']), np.asarray(arrays['threshold']), internal, mean, scale)
+
+
+if njit is not None:
+    @njit(cache=True, nogil=True)
+    def _predict_kernel(X, feature, threshold, left, right, value, roots, out):
+        n_trees = roots.shape[0]
+        for i in range(X.shape[0]):
+            total = 0.0
+            for t in range(n_trees):
+                node = roots[t]
+                # الورقة تشير إلى نفسها
+                while left[node] != node:
+                    if X[i, feature[node]] <= threshold[node]:
+                        node = left[node]
+                    else:
+                        node = right[node]
+                total += value[node]
+            out[i] = total / n_trees
+
+    @njit(cache=True, nogil=True)
+    def _tree_values_kernel(X, feature, threshold, left, right, value, roots, out):
+        for i in range(X.shape[0]):
+            for t in range(roots.shape[0]):
+                node = roots[t]
+                while left[node] != node:
+                    if X[i, feature[node]] <= threshold[node]:
+                        node = left[node]
+                    else:
+                        node = right[node]
+                out[i, t] = value[node]
+
+    @njit(cache=True, nogil=True)
+    def _spread_kernel(tree_values, lower, upper, fraction, mean, std, spread):
+        n_trees = tree_values.shape[1]
+        for i in range(tree_values.shape[0]):
+            row = tree_values[i]
+            total = 0.0
+            for t in range(n_trees):
+                total += row[t]
+            mean[i] = total / n_trees
+            squares = 0.0
+            for t in range(n_trees):
+                squares += (row[t] - mean[i]) ** 2
+            std[i] = np.sqrt(squares / n_trees)
+            ordered = np.sort(row)
+            for j in range(lower.shape[0]):
+                spread[i, j] = ordered[lower[j]] + (ordered[upper[j]] - ordered[lower[j]]) * fraction[j]
+else:
+    _predict_kernel = None
+    _tree_values_kernel = None
+    _spread_kernel = None
+
+
+def tree_spread(tree_values, quantiles=()):
+    """
+    المتوسط والانحراف المعياري والمئينات من مخرجات جميع الأشجار
+
+    المتوسط يُجمع بالتتابع بترتيب الأشجار فيطابق predict تماماً.
+
+    Args:
+        tree_values: مصفوفة (صفوف × أشجار)
+        quantiles: المئينات المطلوبة بين 0 و 1
+
+    Returns:
+        tuple: (المتوسط, الانحراف المعياري, مصفوفة صفوف × مئينات)
+    """
+    n_trees = tree_values.shape[1]
+    # استيفاء خطي بين القيمتين المحيطتين بعد الترتيب (طريقة linear في np.quantile)
+    position = np.asarray(quantiles, dtype=np.float64) * (n_trees - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, n_trees - 1)
+    fraction = position - lower
+
+    if _spread_kernel is not None:
+        mean = np.empty(len(tree_values))
+        std = np.empty(len(tree_values))
+        spread = np.empty((len(tree_values), len(position)))
+        _spread_kernel(np.ascontiguousarray(tree_values, dtype=np.float64), lower, upper, fraction, mean, std, spread)
+        return mean, std, spread
+
+    mean = np.cumsum(tree_values, axis=1)[:, -1] / n_trees
+    deviation = tree_values - mean[:, None]
+    std = np.sqrt(np.einsum('ij,ij->i', deviation, deviation) / n_trees)
+    ordered = np.sort(tree_values, axis=1)
+    spread = ordered[:, lower] + (ordered[:, upper] - ordered[:, lower]) * fraction
+    return mean, std, spread
+
+
+class CompiledForest:
+    """غابة مُجمَّعة تستقبل الميزات الخام (قبل التطبيع) بنفس ترتيب feature_columns"""
+
+    def __init__(self, arrays, n_features, max_depth, mean, scale, threshold=None):
+        """
+        Args:
+            arrays: مصفوفات العقد حسب ARRAY_NAMES
+            mean, scale: معاملا StandardScaler
+            threshold: العتبات بعد دمج التطبيع إن كانت محسوبة مسبقاً (وإلا تُحسب هنا)
+        """
+        self.n_features_in_ = n_features
+        self.max_depth = max_depth
+        self.feature = np.asarray(arrays['feature'])
+        self.left = np.asarray(arrays['left'])
+        self.right = np.asarray(arrays['right'])
+        self.value = np.asarray(arrays['value'])
+        self.roots = np.asarray(arrays['roots'])
+        self.n_estimators = len(self.roots)
+
+        if threshold is None:
+            threshold = fold_raw_thresholds(arrays, mean, scale)
+        self.threshold = np.asarray(threshold)
+        self.uses_numba = _predict_kernel is not None
+
+    def predict(self, X):
+        """
+        التنبؤ لصف أو مجموعة صفوف من الميزات الخام
+
+        Args:
+            X: مصفوفة (صفوف × ميزات) أو متجه صف واحد
+
+        Returns:
+            ndarray: التنبؤ لكل صف
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        if self.uses_numba:
+            out = np.empty(len(X))
+            _predict_kernel(X, self.feature, self.threshold, self.left, self.right, self.value, self.roots, out)
+            return out
+
+        # الجمع بالتتابع بترتيب الأشجار كما في sklearn ثم القسمة
+        return np.cumsum(self.predict_trees(X), axis=1)[:, -1] / self.n_estimators
+
+    def predict_trees(self, X):
+        """
+        مخرج كل شجرة لكل صف في تقييم واحد (لحساب فترات التنبؤ)
+
+        Returns:
+            ndarray: مصفوفة (صفوف × أشجار)، متوسط كل صف يساوي predict
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        if self.uses_numba:
+            out = np.empty((len(X), self.n_estimators))
+            _tree_values_kernel(X, self.feature, self.threshold, self.left, self.right, self.value, self.roots, out)
+            return out
+
+        # جميع الأشجار لجميع الصفوف تنزل خطوة في كل تكرار
+        flat = X.ravel()
+        offsets = (np.arange(len(X)) * X.shape[1])[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_estimators)).copy()
+        for _ in range(self.max_depth):
+            go_left = flat[offsets + self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes]
+
+
+def _scaler_parameters(scaler, n_features):
+    mean = getattr(scaler, 'mean_', None) if getattr(scaler, 'with_mean', True) else None
+    scale = getattr(scaler, 'scale_', None) if getattr(scaler, 'with_std', True) else None
+    mean = np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64)
+    scale = np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64)
+    return mean, scale
+
+
+def compile_forest(model, scaler):
+    """
+    تجميع الغابة (sklearn أو SharedForest) مع StandardScaler في محرك تنبؤ واحد
+
+    Returns:
+        CompiledForest أو None إذا كان النموذج أو الـ Scaler غير مدعوم
+    """
+    if type(scaler).__name__ != 'StandardScaler':
+        return None
+
+    if isinstance(model, SharedForest):
+        arrays = {name: getattr(model, name) for name in ['feature', 'threshold', 'left', 'right', 'value', 'roots']}
+        n_features, max_depth = model.n_features_in_, model.max_depth
+    elif is_supported(model):
+        arrays, meta = flatten_forest(model)
+        n_features, max_depth = meta["n_features"], meta["max_depth"]
+    else:
+        return None
+
+    mean, scale = _scaler_parameters(scaler, n_features)
+    if len(mean) != n_features or (scale <= 0).any():
+        return None
+
+    threshold = None
+    if isinstance(model, SharedForest):
+        # العتبات المدمجة تُحفظ مع الأشجار المشتركة لكل Scaler فتشترك فيها العمليات أيضاً
+        key = hashlib.sha1(mean.tobytes() + scale.tobytes()).hexdigest()[:12]
+        try:
+            threshold = model.derived_array(f'folded-{key}', lambda: fold_raw_thresholds(arrays, mean, scale))
+        except OSError:
+            threshold = None
+    return CompiledForest(arrays, n_features, max_depth, mean, scale, threshold)
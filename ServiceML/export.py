@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تصدير البيانات والتنبؤات على دفعات
+Streaming Bulk Export
+
+يصدّر السجل اليومي (history) أو البيانات المعالجة (features: تُبنى من السجل بنفس طريقة
+processed_sales_data.csv) أو التنبؤات التاريخية (predictions: تنبؤ كل يوم من البيانات السابقة له فقط
+مع المبيعات الفعلية) بصيغة CSV أو NDJSON.
+تُقرأ الصفوف وتُحوّل على أجزاء ثابتة الحجم وتُكتب مباشرة إلى الاستجابة أو الملف،
+فلا يُبنى الناتج كاملاً في الذاكرة مهما طال السجل.
+
+يُستخدم من /api/data/export ومن سطر الأوامر:
+
+    python export.py --dataset history --format csv --output history.csv
+    python export.py --dataset predictions --format ndjson --start 2023-06-01 --output predictions.ndjson.gz
+"""
+
+import argparse
+import contextlib
+import gzip
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from feature_engine import build_feature_frame, materialize_processed, seasonal_features, seasonal_means
+from serialization import csv_lines, ndjson_lines
+
+EXPORT_DATASETS = ('history', 'features', 'predictions')
+EXPORT_FORMATS = ('csv', 'ndjson')
+MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+# عدد الصفوف في كل جزء (ذاكرة التحويل تتناسب معه وليس مع طول السجل)
+CHUNK_ROWS = 2000
+
+
+def _date_bounds(index, start, end):
+    """موضعا بداية ونهاية الفترة في فهرس تواريخ مرتب (بحث ثنائي)"""
+    try:
+        start = pd.Timestamp(start).normalize() if start else None
+        end = pd.Timestamp(end).normalize() if end else None
+    except (ValueError, TypeError):
+        raise ValueError("صيغة التاريخ غير صحيحة. يرجى استخدام YYYY-MM-DD")
+    if start is not None and end is not None and start > end:
+        raise ValueError("تاريخ البداية يجب أن يكون قبل تاريخ النهاية")
+    dates = index.values
+    first = np.searchsorted(dates, start.to_datetime64(), 'left') if start is not None else 0
+    stop = np.searchsorted(dates, end.to_datetime64(), 'right') if end is not None else len(dates)
+    return int(first), int(max(stop, first))
+
+
+def _sorted_unique(frame):
+    # البيانات المعالجة مرتبة عادةً، والنسخ فقط عند الحاجة
+    if not frame.index.is_monotonic_increasing:
+        frame = frame.sort_index()
+    if not frame.index.is_unique:
+        frame = frame[~frame.index.duplicated(keep='last')]
+    return frame
+
+
+def dataset_chunks(handler, dataset, start=None, end=None, chunk_rows=CHUNK_ROWS):
+    """
+    أجزاء مجموعة البيانات المطلوبة كجداول مفهرسة بالتاريخ
+
+    تُقرأ البيانات ونسخة النموذج عند الاستدعاء، فلا يتأثر التصدير بإضافة بيانات أو إعادة تحميل النموذج أثناءه.
+
+    Raises:
+        ValueError: مجموعة بيانات أو تواريخ غير صالحة، أو البيانات/النموذج غير محملين
+    """
+    if dataset not in EXPORT_DATASETS:
+        raise ValueError(f"مجموعة البيانات يجب أن تكون إحدى: {', '.join(EXPORT_DATASETS)}")
+    if handler.df_original is None or handler.df_clean is None:
+        raise ValueError("البيانات غير محملة")
+    if chunk_rows < 1:
+        raise ValueError("حجم الجزء يجب أن يكون 1 أو أكثر")
+
+    history = handler.get_history()
+    seasonal = None
+    if dataset == 'history':
+        source = history
+    elif dataset == 'features':
+        # الخدمة لا تحتفظ بأعمدة الميزات في الذاكرة، فتُبنى صفوفها من السجل لكل جزء
+        # بمتوسطات الشهر ويوم الأسبوع على كامل السجل (كإعادة بناء البيانات المعالجة)
+        source = history
+        seasonal = seasonal_means(history)
+    else:
+        source = _sorted_unique(handler.df_clean)
+
+    artifacts = None
+    if dataset == 'predictions':
+        if not handler.is_ready():
+            raise ValueError("النموذج غير مهيأ. يرجى تشغيل initialize() أولاً")
+        artifacts = handler.artifacts
+        # الميزات الموسمية تحتاج إلى المبيعات فقط وليس جميع أعمدة البيانات المعالجة
+        amounts = source[['total_amount']]
+
+    first, stop = _date_bounds(source.index, start, end)
+    if artifacts is not None:
+        # المتوسطات الموسمية التراكمية لجميع التواريخ المطلوبة مرة واحدة، وتُقرأ منها كل دفعة
+        seasonal_columns = seasonal_features(amounts, source.index[first:stop])
+
+    def generate():
+        for offset in range(first, stop, chunk_rows):
+            end_position = min(offset + chunk_rows, stop)
+            if seasonal is not None:
+                # الأيام الأولى التي لا تكتمل نوافذها لا تظهر في البيانات المعالجة
+                chunk = materialize_processed(history.iloc[:end_position], offset, seasonal)
+                if len(chunk):
+                    yield chunk
+                continue
+
+            chunk = source.iloc[offset:end_position]
+            if artifacts is None:
+                yield chunk
+                continue
+
+            X = build_feature_frame(
+                history, amounts, chunk.index, artifacts.feature_columns,
+                seasonal_columns.iloc[offset - first:end_position - first]
+            ).to_numpy()
+            valid = ~np.isnan(X).any(axis=1)
+            predicted = np.full(len(chunk), np.nan)
+            if valid.any():
+                predicted[valid] = handler._score_rows(X[valid], artifacts)
+            yield pd.DataFrame({
+                'actual_sales': chunk['total_amount'].to_numpy(dtype=float),
+                'predicted_sales': np.round(predicted, 2),
+            }, index=chunk.index)
+
+    return generate()
+
+
+def _fields(frame):
+    """أعمدة الجدول بصيغة records_json/ndjson_lines حسب نوع كل عمود"""
+    fields = [('sale_date', 'date', frame.index)]
+    for column in frame.columns:
+        values = frame[column]
+        if pd.api.types.is_integer_dtype(values.dtype):
+            kind = 'int'
+        elif pd.api.types.is_float_dtype(values.dtype):
+            kind = 'float'
+        else:
+            kind = 'text'
+        fields.append((column, kind, values))
+    return fields
+
+
+def encode_chunks(frames, fmt):
+    """تحويل أجزاء الجداول إلى bytes بصيغة CSV (سطر العناوين مرة واحدة) أو NDJSON"""
+    header = True
+    for frame in frames:
+        if fmt == 'ndjson':
+            yield ndjson_lines(_fields(frame), len(frame))
+        else:
+            yield csv_lines(_fields(frame), len(frame), header=header)
+            header = False
+
+
+def export_chunks(handler, dataset, fmt, start=None, end=None, chunk_rows=CHUNK_ROWS):
+    """
+    مولد أجزاء الملف المصدّر
+
+    يُتحقق من المدخلات عند الاستدعاء (قبل بدء الإرسال) ويُنتج الجسم جزءاً جزءاً.
+
+    Raises:
+        ValueError: مدخلات غير صالحة
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"الصيغة يجب أن تكون إحدى: {', '.join(EXPORT_FORMATS)}")
+    return encode_chunks(dataset_chunks(handler, dataset, start, end, chunk_rows), fmt)
+
+
+def export_to_file(handler, dataset, fmt, path, start=None, end=None, chunk_rows=CHUNK_ROWS):
+    """
+    كتابة التصدير إلى ملف (مضغوط بـ gzip إذا انتهى المسار بـ .gz، و - للمخرج القياسي)
+
+    Returns:
+        int: عدد البايتات المكتوبة قبل الضغط
+    """
+    chunks = export_chunks(handler, dataset, fmt, start, end, chunk_rows)
+    if path == '-':
+        return _write_chunks(chunks, sys.stdout.buffer)
+
+    # الكتابة في ملف مؤقت ثم استبداله حتى لا يُقرأ ملف ناقص
+    temp = f'{path}.{os.getpid()}.tmp'
+    try:
+        with (gzip.open(temp, 'wb') if path.endswith('.gz') else open(temp, 'wb')) as f:
+            written = _write_chunks(chunks, f)
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    return written
+
+
+def _write_chunks(chunks, stream):
+    written = 0
+    for chunk in chunks:
+        stream.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def main(argv=None):
+    # مسارات البيانات والنموذج نسبية لمجلد الخدمة
+    service_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="تصدير السجل أو الميزات أو التنبؤات التاريخية")
+    parser.add_argument('--dataset', choices=EXPORT_DATASETS, default='history', help="مجموعة البيانات")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv', help="صيغة الملف")
+    parser.add_argument('--start', help="أول تاريخ (YYYY-MM-DD)")
+    parser.add_argument('--end', help="آخر تاريخ (YYYY-MM-DD)")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="عدد الصفوف في كل جزء")
+    parser.add_argument('--output', default='-', help="ملف الناتج (.gz للضغط، - للمخرج القياسي)")
+    args = parser.parse_args(argv)
+    output = args.output if args.output == '-' else os.path.abspath(args.output)
+
+    os.chdir(service_dir)
+    sys.path.insert(0, service_dir)
+    from model_handler import SalesModelHandler
+
+    handler = SalesModelHandler()
+    # رسائل التهيئة إلى stderr حتى لا تختلط بالناتج عند الكتابة إلى المخرج القياسي
+    with contextlib.redirect_stdout(sys.stderr):
+        if not handler.initialize():
+            print("❌ فشل تهيئة معالج النموذج")
+            return 1
+
+    try:
+        written = export_to_file(handler, args.dataset, args.format, output, args.start, args.end, args.chunk_rows)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    if output != '-':
+        print(f"✓ تم تصدير {args.dataset} ({written} بايت): {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
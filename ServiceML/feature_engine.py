@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+محرك بناء الميزات المتجه
+Vectorized Feature Engine
+
+يبني مصفوفة الميزات الكاملة لعدد كبير من التواريخ المستهدفة في تمريرة واحدة
+باستخدام NumPy/pandas بدلاً من بناء صف واحد لكل تاريخ.
+لكل تاريخ مستهدف تُستخدم فقط البيانات السابقة له (كما في التنبؤ باليوم التالي).
+"""
+
+import numpy as np
+import pandas as pd
+
+from feature_state import SALES_LAGS, OTHER_LAGS, SALES_WINDOWS, OTHER_WINDOWS, MAX_WINDOW
+
+# ميزات التأخير: اسم البادئة -> العمود الأصلي
+OTHER_LAG_COLUMNS = {
+    'quantity': 'total_quantity',
+    'invoices': 'invoices_count',
+    'discount': 'total_discount',
+}
+
+
+def prepare_history(df_original):
+    """تجهيز السجل الخام مرتباً ومفهرساً بالتاريخ"""
+    history = df_original.sort_values('sale_date').set_index('sale_date')
+    return history[~history.index.duplicated(keep='last')]
+
+
+def datetime_features(target_dates):
+    """ميزات التاريخ والوقت لمجموعة تواريخ"""
+    index = pd.DatetimeIndex(target_dates)
+    day_of_week = index.dayofweek.to_numpy()
+    return pd.DataFrame({
+        'year': index.year.to_numpy(),
+        'month': index.month.to_numpy(),
+        'day': index.day.to_numpy(),
+        'day_of_week': day_of_week,
+        'day_of_year': index.dayofyear.to_numpy(),
+        'week_of_year': index.isocalendar().week.to_numpy(dtype=np.int64),
+        'is_weekend': np.isin(day_of_week, [5, 6]).astype(int),
+        'is_month_start': index.is_month_start.astype(int),
+        'is_month_end': index.is_month_end.astype(int),
+    }, index=index)
+
+
+def _lookup(history_dates, values, query_dates):
+    """البحث الثنائي عن القيم بتواريخ محددة (NaN عند عدم وجود التاريخ)"""
+    positions = np.searchsorted(history_dates, query_dates)
+    clipped = np.minimum(positions, len(history_dates) - 1)
+    found = (positions < len(history_dates)) & (history_dates[clipped] == query_dates)
+    result = np.full(len(query_dates), np.nan)
+    result[found] = values[clipped[found]]
+    return result
+
+
+def lag_features(history, target_dates):
+    """ميزات التأخير حسب التاريخ لمجموعة تواريخ"""
+    index = pd.DatetimeIndex(target_dates)
+    dates = history.index.to_numpy(dtype='datetime64[ns]')
+    columns = {}
+
+    if len(dates) == 0:
+        for lag in SALES_LAGS:
+            columns[f'sales_lag_{lag}'] = np.full(len(index), np.nan)
+        for lag in OTHER_LAGS:
+            for prefix in OTHER_LAG_COLUMNS:
+                columns[f'{prefix}_lag_{lag}'] = np.full(len(index), np.nan)
+        return pd.DataFrame(columns, index=index)
+
+    sales = history['total_amount'].to_numpy(dtype=float)
+    for lag in SALES_LAGS:
+        query = (index - pd.Timedelta(days=lag)).to_numpy(dtype='datetime64[ns]')
+        columns[f'sales_lag_{lag}'] = _lookup(dates, sales, query)
+
+    for lag in OTHER_LAGS:
+        query = (index - pd.Timedelta(days=lag)).to_numpy(dtype='datetime64[ns]')
+        for prefix, column in OTHER_LAG_COLUMNS.items():
+            values = history[column].to_numpy(dtype=float)
+            columns[f'{prefix}_lag_{lag}'] = _lookup(dates, values, query)
+
+    return pd.DataFrame(columns, index=index)
+
+
+def rolling_features(history, target_dates):
+    """
+    ميزات المتوسطات المتحركة ونسبة التغيير لمجموعة تواريخ
+
+    تُحسب النوافذ مرة واحدة على الجزء المطلوب من السجل ثم تُقرأ عند آخر صف يسبق كل تاريخ مستهدف.
+    """
+    index = pd.DatetimeIndex(target_dates)
+    dates = history.index.to_numpy(dtype='datetime64[ns]')
+    positions = np.searchsorted(dates, index.to_numpy(dtype='datetime64[ns]'), side='left') - 1
+    valid = positions >= 0
+
+    # الاقتصار على الصفوف التي تغطي أكبر نافذة قبل أقدم تاريخ مستهدف
+    if valid.any():
+        start = max(int(positions[valid].min()) - MAX_WINDOW, 0)
+        history = history.iloc[start:int(positions.max()) + 1]
+        positions = positions - start
+    safe_positions = np.maximum(positions, 0)
+
+    def pick(series):
+        values = series.to_numpy(dtype=float)
+        result = np.full(len(index), np.nan)
+        if len(values):
+            result[valid] = values[safe_positions[valid]]
+        return result
+
+    sales = history['total_amount']
+    quantity = history['total_quantity']
+    invoices = history['invoices_count']
+    columns = {}
+
+    for window in SALES_WINDOWS:
+        rolling = sales.rolling(window=window)
+        columns[f'rolling_mean_sales_{window}'] = pick(rolling.mean())
+        columns[f'rolling_std_sales_{window}'] = pick(rolling.std())
+        columns[f'rolling_max_sales_{window}'] = pick(rolling.max())
+        columns[f'rolling_min_sales_{window}'] = pick(rolling.min())
+
+    for window in OTHER_WINDOWS:
+        columns[f'rolling_mean_quantity_{window}'] = pick(quantity.rolling(window=window).mean())
+        columns[f'rolling_std_quantity_{window}'] = pick(quantity.rolling(window=window).std())
+        columns[f'rolling_mean_invoices_{window}'] = pick(invoices.rolling(window=window).mean())
+        columns[f'rolling_std_invoices_{window}'] = pick(invoices.rolling(window=window).std())
+
+    columns['weekly_avg_sales'] = columns['rolling_mean_sales_7']
+    columns['sales_change_pct'] = pick(sales.pct_change())
+
+    return pd.DataFrame(columns, index=index)
+
+
+def seasonal_features(df_clean, target_dates):
+    """
+    متوسط المبيعات حسب الشهر ويوم الأسبوع لمجموعة تواريخ
+
+    يُستخدم لكل تاريخ متوسط الصفوف المعالجة السابقة له فقط (مجاميع تراكمية)،
+    وعند عدم وجود صفوف للشهر أو اليوم يُستخدم المتوسط العام للصفوف السابقة
+    (وNaN إذا لم تسبقه أي صفوف)، بنفس قاعدة FeatureState لتنبؤ اليوم التالي.
+    """
+    index = pd.DatetimeIndex(target_dates)
+    clean = df_clean.sort_index()
+    clean_dates = clean.index.to_numpy(dtype='datetime64[ns]')
+    amounts = clean['total_amount'].to_numpy(dtype=float)
+    positions = np.searchsorted(clean_dates, index.to_numpy(dtype='datetime64[ns]'), side='left')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        overall = np.concatenate([[0.0], np.cumsum(amounts)])[positions] / positions
+
+    def causal_mean(groups, target_groups, group_count):
+        result = overall.copy()
+        for group in range(group_count):
+            targets = np.flatnonzero(target_groups == group)
+            rows = np.flatnonzero(groups == group)
+            if len(targets) == 0 or len(rows) == 0:
+                continue
+            # مجموع تراكمي لصفوف المجموعة: العنصر 0 يمثل "لا توجد بيانات"
+            sums = np.concatenate([[0.0], np.cumsum(amounts[rows])])
+            counts = np.searchsorted(rows, positions[targets], side='left')
+            has_rows = counts > 0
+            result[targets[has_rows]] = sums[counts[has_rows]] / counts[has_rows]
+        return result
+
+    return pd.DataFrame({
+        'monthly_avg_sales': causal_mean(clean.index.month.to_numpy(), index.month.to_numpy(), 13),
+        'day_of_week_avg': causal_mean(clean.index.dayofweek.to_numpy(), index.dayofweek.to_numpy(), 7),
+    }, index=index)
+
+
+def build_feature_frame(history, df_clean, target_dates, feature_columns, seasonal=None):
+    """
+    بناء جدول الميزات الكامل لمجموعة تواريخ مستهدفة
+
+    Args:
+        history: السجل الخام المفهرس بالتاريخ (من prepare_history)
+        df_clean: البيانات المعالجة المفهرسة بالتاريخ
+        target_dates: التواريخ المطلوب بناء الميزات لها
+        feature_columns: ترتيب الميزات المتوقع من النموذج
+        seasonal: ناتج seasonal_features لنفس التواريخ إن حُسب مسبقاً
+            (عند البناء على دفعات يُحسب مرة واحدة لجميع الدفعات بدل ترتيب df_clean لكل دفعة)
+
+    Returns:
+        DataFrame: صف لكل تاريخ وأعمدة حسب feature_columns
+    """
+    if seasonal is None:
+        seasonal = seasonal_features(df_clean, target_dates)
+    frame = pd.concat([
+        datetime_features(target_dates),
+        lag_features(history, target_dates),
+        rolling_features(history, target_dates),
+        seasonal,
+    ], axis=1)
+    return frame[feature_columns].astype(float)
+
+
+def _rolling_mean_std(values, size):
+    """
+    المتوسط والانحراف المعياري المتحركان محسوبان لكل نافذة على حدة
+
+    بخلاف rolling في pandas (مجموع تراكمي) لا تعتمد النتيجة على موضع بداية السجل،
+    فتتطابق الصفوف المحسوبة من ذيل السجل مع إعادة البناء الكاملة بتاً بتاً.
+    """
+    values = np.asarray(values, dtype=float)
+    mean = np.full(len(values), np.nan)
+    std = np.full(len(values), np.nan)
+    if len(values) >= size:
+        windows = np.lib.stride_tricks.sliding_window_view(values, size)
+        mean[size - 1:] = windows.mean(axis=1)
+        std[size - 1:] = windows.std(axis=1, ddof=1)
+    return mean, std
+
+
+def seasonal_means(history):
+    """متوسط المبيعات حسب الشهر ويوم الأسبوع على كامل السجل الخام (كما في الدفتر)"""
+    sales = history['total_amount']
+    return sales.groupby(history.index.month).mean(), sales.groupby(history.index.dayofweek).mean()
+
+
+def materialize_processed(history, start_position=0, seasonal=None):
+    """
+    بناء صفوف البيانات المعالجة بنفس طريقة دفتر التدريب ابتداءً من صف محدد
+
+    يُستخدم من السجل السابق فقط ما تحتاجه أكبر نافذة، لذلك تتناسب التكلفة مع عدد الصفوف
+    الجديدة. متوسطا الشهر ويوم الأسبوع يُحسبان على كامل السجل الخام كما في الدفتر.
+
+    Args:
+        history: السجل الخام المفهرس بالتاريخ (من prepare_history)
+        start_position: رقم أول صف مطلوب في السجل
+        seasonal: (متوسطات الشهر, متوسطات يوم الأسبوع) محسوبة مسبقاً على كامل السجل،
+            وإلا تُحسب من history (الذي يجب أن يكون كاملاً في هذه الحالة)
+
+    Returns:
+        DataFrame: الصفوف المعالجة الكاملة (تُحذف الصفوف التي تحتوي على قيم مفقودة)
+    """
+    offset = max(start_position - MAX_WINDOW, 0)
+    window = history.iloc[offset:]
+    sales = window['total_amount']
+
+    frame = pd.DataFrame({'day_of_week': window.index.dayofweek}, index=window.index)
+    for column in ['invoices_count', 'total_quantity', 'total_discount', 'total_amount']:
+        frame[column] = window[column]
+    calendar = datetime_features(window.index).drop(columns=['day_of_week'])
+    frame = frame.join(calendar)
+
+    # ميزات التأخير: إزاحة بعدد الصفوف كما في الدفتر
+    for lag in SALES_LAGS:
+        frame[f'sales_lag_{lag}'] = sales.shift(lag)
+    for prefix, column in OTHER_LAG_COLUMNS.items():
+        for lag in OTHER_LAGS:
+            frame[f'{prefix}_lag_{lag}'] = window[column].shift(lag)
+
+    # المتوسطات المتحركة تشمل اليوم نفسه كما في الدفتر
+    for size in SALES_WINDOWS:
+        rolling = sales.rolling(window=size)
+        frame[f'rolling_mean_sales_{size}'], frame[f'rolling_std_sales_{size}'] = _rolling_mean_std(sales, size)
+        frame[f'rolling_max_sales_{size}'] = rolling.max()
+        frame[f'rolling_min_sales_{size}'] = rolling.min()
+    for size in OTHER_WINDOWS:
+        frame[f'rolling_mean_quantity_{size}'], frame[f'rolling_std_quantity_{size}'] = \
+            _rolling_mean_std(window['total_quantity'], size)
+    for size in OTHER_WINDOWS:
+        frame[f'rolling_mean_invoices_{size}'], frame[f'rolling_std_invoices_{size}'] = \
+            _rolling_mean_std(window['invoices_count'], size)
+
+    frame['weekly_avg_sales'] = frame['rolling_mean_sales_7']
+    frame['sales_change_pct'] = sales.pct_change()
+
+    monthly, weekday = seasonal if seasonal is not None else seasonal_means(history)
+    frame['monthly_avg_sales'] = monthly.reindex(window.index.month).to_numpy()
+    frame['day_of_week_avg'] = weekday.reindex(window.index.dayofweek).to_numpy()
+
+    return frame.iloc[start_position - offset:].dropna()
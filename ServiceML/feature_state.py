@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+الحالة التراكمية لميزات التنبؤ
+Incremental Feature State
+
+تحتفظ هذه الوحدة بالنوافذ المتحركة (7/14/30 يوم) ومتوسطات الشهر ويوم الأسبوع
+بحيث تكون إضافة يوم جديد عملية ثابتة التكلفة لا تعتمد على طول السجل التاريخي.
+"""
+
+from collections import deque
+import calendar
+import copy
+import math
+
+import numpy as np
+import pandas as pd
+
+# فترات التأخير والنوافذ المستخدمة في تدريب النموذج
+SALES_LAGS = [1, 2, 3, 7, 14, 30]
+OTHER_LAGS = [1, 7]
+SALES_WINDOWS = [7, 14, 30]
+OTHER_WINDOWS = [7, 14]
+MAX_LAG = max(SALES_LAGS + OTHER_LAGS)
+MAX_WINDOW = max(SALES_WINDOWS + OTHER_WINDOWS)
+
+# أعمدة البيانات الأصلية بالترتيب المخزن في الحالة
+METRICS = ['total_amount', 'total_quantity', 'invoices_count', 'total_discount']
+
+# جميع الميزات التي تحسبها الحالة بالترتيب الذي تُحسب به
+FEATURE_NAMES = (
+    ['year', 'month', 'day', 'day_of_week', 'day_of_year', 'week_of_year',
+     'is_weekend', 'is_month_start', 'is_month_end']
+    + [f'sales_lag_{lag}' for lag in SALES_LAGS]
+    + [f'{prefix}_lag_{lag}' for lag in OTHER_LAGS for prefix in ('quantity', 'invoices', 'discount')]
+    + [f'rolling_{stat}_sales_{w}' for w in SALES_WINDOWS for stat in ('mean', 'std', 'max', 'min')]
+    + [f'rolling_{stat}_{metric}_{w}' for w in OTHER_WINDOWS
+       for metric, stat in (('quantity', 'mean'), ('quantity', 'std'), ('invoices', 'mean'), ('invoices', 'std'))]
+    + ['weekly_avg_sales', 'sales_change_pct', 'monthly_avg_sales', 'day_of_week_avg']
+)
+
+
+def calendar_values(target_date):
+    """ميزات التقويم لتاريخ واحد بنفس ترتيب FEATURE_NAMES (دون pandas)"""
+    day_of_week = target_date.weekday()
+    return [
+        target_date.year,
+        target_date.month,
+        target_date.day,
+        day_of_week,
+        target_date.timetuple().tm_yday,
+        target_date.isocalendar()[1],
+        int(day_of_week >= 5),
+        int(target_date.day == 1),
+        int(target_date.day == calendar.monthrange(target_date.year, target_date.month)[1]),
+    ]
+
+
+class FeatureLayout:
+    """
+    مواقع الميزات داخل متجه النموذج حسب feature_columns
+    تُحسب مرة واحدة عند تحميل قائمة الميزات، ثم تُكتب القيم مباشرة في متجه NumPy معد مسبقاً.
+    """
+
+    def __init__(self, feature_columns):
+        known = set(FEATURE_NAMES)
+        unknown = [column for column in feature_columns if column not in known]
+        if unknown:
+            raise ValueError(f"ميزات غير معروفة في قائمة الميزات: {unknown}")
+
+        self.columns = list(feature_columns)
+        self.size = len(self.columns)
+        slot = {name: i for i, name in enumerate(self.columns)}
+        # الميزات غير المطلوبة للنموذج تُكتب في خانة إضافية بنهاية المتجه وتُهمل
+        self.slots = np.array([slot.get(name, self.size) for name in FEATURE_NAMES], dtype=np.intp)
+
+    def new_vector(self):
+        """متجه فارغ بحجم الميزات (مع الخانة الإضافية)"""
+        return np.empty(self.size + 1)
+
+    def new_matrix(self, rows):
+        """مصفوفة فارغة لعدة صفوف (مع الخانة الإضافية في آخر عمود)"""
+        return np.empty((rows, self.size + 1))
+
+    def missing(self, row):
+        """أسماء الميزات التي قيمتها مفقودة في صف النموذج"""
+        return [self.columns[i] for i in np.flatnonzero(np.isnan(row))]
+
+
+class RollingWindow:
+    """نافذة متحركة بحجم ثابت تحسب المتوسط والانحراف والقيم القصوى بتكلفة ثابتة"""
+
+    def __init__(self, size, track_extremes=False):
+        self.size = size
+        self.track_extremes = track_extremes
+        self.values = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+        self._appended = 0
+        self._seq = 0
+        # طوابير رتيبة (index, value) للحد الأقصى والأدنى
+        self._max = deque()
+        self._min = deque()
+
+    def push(self, value):
+        """إضافة قيمة جديدة وإخراج أقدم قيمة عند امتلاء النافذة"""
+        value = float(value)
+        self.values.append(value)
+        self.total += value
+        self.total_sq += value * value
+
+        if len(self.values) > self.size:
+            old = self.values.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+
+        if self.track_extremes:
+            seq = self._seq
+            while self._max and self._max[-1][1] <= value:
+                self._max.pop()
+            self._max.append((seq, value))
+            while self._min and self._min[-1][1] >= value:
+                self._min.pop()
+            self._min.append((seq, value))
+            oldest = seq - self.size + 1
+            if self._max[0][0] < oldest:
+                self._max.popleft()
+            if self._min[0][0] < oldest:
+                self._min.popleft()
+        self._seq += 1
+
+        # إعادة حساب المجاميع دورياً لمنع تراكم أخطاء الفاصلة العائمة
+        self._appended += 1
+        if self._appended >= self.size:
+            self._appended = 0
+            self.total = float(sum(self.values))
+            self.total_sq = float(sum(v * v for v in self.values))
+
+    @property
+    def full(self):
+        return len(self.values) == self.size
+
+    def mean(self):
+        if not self.full:
+            return np.nan
+        return self.total / self.size
+
+    def std(self):
+        if not self.full or self.size < 2:
+            return np.nan
+        variance = (self.total_sq - self.total * self.total / self.size) / (self.size - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def max(self):
+        return self._max[0][1] if self.full else np.nan
+
+    def min(self):
+        return self._min[0][1] if self.full else np.nan
+
+
+class FeatureState:
+    """حالة الميزات التراكمية لسلسلة المبيعات اليومية"""
+
+    def __init__(self):
+        # آخر الأيام المتاحة للبحث عن ميزات التأخير حسب رقم اليوم (toordinal)
+        self.recent = {}
+        self.recent_dates = deque()
+        self.last_date = None
+        self.last_amount = np.nan
+        self.prev_amount = np.nan
+
+        self.sales_windows = {w: RollingWindow(w, track_extremes=True) for w in SALES_WINDOWS}
+        self.quantity_windows = {w: RollingWindow(w) for w in OTHER_WINDOWS}
+        self.invoices_windows = {w: RollingWindow(w) for w in OTHER_WINDOWS}
+
+        # مجاميع وأعداد المبيعات حسب الشهر (1-12) ويوم الأسبوع (0-6)
+        self.month_sum = np.zeros(13)
+        self.month_count = np.zeros(13, dtype=np.int64)
+        self.dow_sum = np.zeros(7)
+        self.dow_count = np.zeros(7, dtype=np.int64)
+
+    @classmethod
+    def from_frames(cls, df_original, df_clean):
+        """بناء الحالة من البيانات الأصلية والمعالجة المحملة"""
+        state = cls()
+
+        history = df_original.sort_values('sale_date').tail(MAX_WINDOW + 1)
+        for row in zip(history['sale_date'], *(history[m] for m in METRICS)):
+            state.append_day(*row)
+
+        if df_clean is not None and not df_clean.empty:
+            amounts = df_clean['total_amount'].to_numpy(dtype=float)
+            months = df_clean.index.month.to_numpy()
+            days = df_clean.index.dayofweek.to_numpy()
+            np.add.at(state.month_sum, months, amounts)
+            np.add.at(state.month_count, months, 1)
+            np.add.at(state.dow_sum, days, amounts)
+            np.add.at(state.dow_count, days, 1)
+
+        return state
+
+    def copy(self):
+        """نسخة مستقلة من الحالة (مفيدة للتنبؤ المتسلسل)"""
+        return copy.deepcopy(self)
+
+    def append_day(self, sale_date, total_amount, total_quantity, invoices_count, total_discount):
+        """إضافة يوم جديد إلى السجل الخام بتكلفة ثابتة"""
+        sale_date = pd.Timestamp(sale_date)
+        if self.last_date is not None and sale_date <= self.last_date:
+            raise ValueError(f"التاريخ {sale_date.date()} ليس بعد آخر تاريخ متاح {self.last_date.date()}")
+
+        day = sale_date.toordinal()
+        self.recent[day] = (
+            float(total_amount), float(total_quantity), float(invoices_count), float(total_discount)
+        )
+        self.recent_dates.append(day)
+        # يكفي الاحتفاظ بآخر MAX_LAG صف لأن أي تاريخ ضمن آخر MAX_LAG يوماً موجود بينها
+        while len(self.recent_dates) > MAX_LAG:
+            del self.recent[self.recent_dates.popleft()]
+
+        for window in self.sales_windows.values():
+            window.push(total_amount)
+        for window in self.quantity_windows.values():
+            window.push(total_quantity)
+        for window in self.invoices_windows.values():
+            window.push(invoices_count)
+
+        self.prev_amount = self.last_amount
+        self.last_amount = float(total_amount)
+        self.last_date = sale_date
+
+    def project_day(self, sale_date, total_amount):
+        """
+        إضافة يوم متوقع إلى الحالة (للتنبؤ المتسلسل)
+
+        المبيعات تأتي من التنبؤ، أما الكمية والفواتير والخصومات فغير متوقعة
+        لذلك تُقدّر بمتوسط آخر 7 أيام.
+        """
+        self.append_day(
+            sale_date,
+            total_amount,
+            self.quantity_windows[7].mean(),
+            self.invoices_windows[7].mean(),
+            self._recent_mean(3, 7),
+        )
+
+    def _recent_mean(self, position, days):
+        if len(self.recent_dates) < days:
+            return np.nan
+        dates = list(self.recent_dates)[-days:]
+        return float(np.mean([self.recent[d][position] for d in dates]))
+
+    def add_seasonal_sample(self, sale_date, total_amount):
+        """إضافة مبيعات يوم إلى متوسطات الشهر ويوم الأسبوع"""
+        sale_date = pd.Timestamp(sale_date)
+        self.month_sum[sale_date.month] += float(total_amount)
+        self.month_count[sale_date.month] += 1
+        self.dow_sum[sale_date.dayofweek] += float(total_amount)
+        self.dow_count[sale_date.dayofweek] += 1
+
+    def _lag(self, day, lag, position):
+        row = self.recent.get(day - lag)
+        return row[position] if row is not None else np.nan
+
+    def feature_values(self, target_date):
+        """قيم جميع الميزات لتاريخ مستهدف بترتيب FEATURE_NAMES"""
+        target_date = pd.Timestamp(target_date)
+        day = target_date.toordinal()
+        values = calendar_values(target_date)
+
+        for lag in SALES_LAGS:
+            values.append(self._lag(day, lag, 0))
+        for lag in OTHER_LAGS:
+            values.append(self._lag(day, lag, 1))
+            values.append(self._lag(day, lag, 2))
+            values.append(self._lag(day, lag, 3))
+
+        for window in self.sales_windows.values():
+            values += [window.mean(), window.std(), window.max(), window.min()]
+        for w in OTHER_WINDOWS:
+            quantity = self.quantity_windows[w]
+            invoices = self.invoices_windows[w]
+            values += [quantity.mean(), quantity.std(), invoices.mean(), invoices.std()]
+
+        if self.prev_amount == 0 or math.isnan(self.prev_amount) or math.isnan(self.last_amount):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                change = float(np.float64(self.last_amount) / np.float64(self.prev_amount) - 1.0)
+        else:
+            change = self.last_amount / self.prev_amount - 1.0
+
+        values += [
+            self.sales_windows[7].mean(),
+            change,
+            self._seasonal_mean(self.month_sum, self.month_count, target_date.month),
+            self._seasonal_mean(self.dow_sum, self.dow_count, values[3]),
+        ]
+        return values
+
+    def write_features(self, target_date, out, layout):
+        """
+        كتابة ميزات التاريخ المستهدف مباشرة في متجه معد مسبقاً
+
+        Args:
+            target_date: التاريخ المطلوب التنبؤ به
+            out: متجه من layout.new_vector()
+            layout: FeatureLayout لقائمة ميزات النموذج
+
+        Returns:
+            ndarray: صف النموذج (عرض على out بطول layout.size)
+        """
+        out[layout.slots] = self.feature_values(target_date)
+        return out[:layout.size]
+
+    def features_for(self, target_date):
+        """
+        حساب جميع الميزات لتاريخ مستهدف من الحالة الحالية
+
+        Args:
+            target_date: التاريخ المطلوب التنبؤ به
+
+        Returns:
+            dict: اسم الميزة -> القيمة
+        """
+        return dict(zip(FEATURE_NAMES, self.feature_values(target_date)))
+
+    @staticmethod
+    def _seasonal_mean(sums, counts, key):
+        """
+        متوسط المبيعات لشهر أو يوم أسبوع من الصفوف السابقة
+
+        الشهر أو اليوم غير الموجود في البيانات (مثل فجوة أبريل 2023) يأخذ المتوسط العام لجميع الصفوف
+        بدلاً من فشل التنبؤ، كما في seasonal_features و SeriesPanel.feature_matrix.
+        بدون أي صفوف تكون القيمة NaN فيُرفض التنبؤ لنقص البيانات.
+        """
+        if counts[key] > 0:
+            return float(sums[key] / counts[key])
+        total = counts.sum()
+        return float(sums.sum() / total) if total > 0 else float('nan')
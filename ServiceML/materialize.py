@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تحديث البيانات المعالجة تدريجياً
+Incremental Feature Materialization
+
+يحدّث processed_sales_data.csv من Daily_sales.csv دون إعادة بنائه بالكامل:
+تُحفظ بجانب الملف المعالج حالة صغيرة (processed_sales_data.state.json) تحتوي على موضع آخر بايت
+مقروء من ملف المبيعات اليومية، وآخر صفوف السجل بقدر أكبر نافذة، ومجاميع المبيعات لكل شهر ويوم أسبوع.
+في كل تشغيل يُقرأ الجزء المضاف فقط من ملف المبيعات، وتُحسب صفوفه المعالجة من ذيل السجل
+(materialize_processed) وتُلحق بالملف، فتتناسب تكلفة حساب الميزات مع عدد الأيام الجديدة وليس طول السجل.
+متوسطا الشهر ويوم الأسبوع محسوبان على كامل السجل فتتغير قيمهما للصفوف القديمة أيضاً، لذلك يُعاد
+كتابة هذين العمودين لجميع الصفوف بتمريرة نصية واحدة على الملف (دون قراءته في DataFrame).
+
+يُعاد البناء الكامل تلقائياً عند غياب الحالة أو تعديل أي من الملفين بغير الإلحاق
+(أو عند وصول تواريخ غير لاحقة لآخر تاريخ معالج).
+تستخدم الخدمة نفس الدالة materialize لحفظ الأيام المضافة عبر /api/data/append.
+
+    python materialize.py
+    python materialize.py --rebuild
+    python materialize.py --verify
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+from datetime import date
+
+# مسارات البيانات نسبية لمجلد الخدمة (يُنتقل إليه عند التشغيل كسكربت، فالخدمة تستورد هذه الوحدة أيضاً)
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SERVICE_DIR)
+
+import numpy as np
+import pandas as pd
+
+from feature_engine import prepare_history, materialize_processed
+from feature_state import METRICS, MAX_WINDOW
+from model_handler import DAILY_SALES_PATH, PROCESSED_DATA_PATH
+
+# يُزاد عند تغيير صيغة ملف الحالة لإجبار إعادة البناء
+STATE_FORMAT = 1
+
+# عدد البايتات قبل آخر موضع مقروء التي يُتحقق من عدم تغيرها
+TAIL_CHECK_BYTES = 4096
+
+# متوسطا الشهر ويوم الأسبوع محسوبان على كامل السجل كما في الدفتر (انظر _rewrite_processed)
+SEASONAL_COLUMNS = ['monthly_avg_sales', 'day_of_week_avg']
+
+
+def state_path(processed_path):
+    """مسار ملف الحالة المقابل للملف المعالج"""
+    root, _ = os.path.splitext(processed_path)
+    return root + '.state.json'
+
+
+def _tail_hash(path, offset):
+    with open(path, 'rb') as f:
+        start = max(offset - TAIL_CHECK_BYTES, 0)
+        f.seek(start)
+        return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+
+def _complete_length(path):
+    """طول الملف حتى نهاية آخر سطر مكتمل"""
+    with open(path, 'rb') as f:
+        data_end = f.seek(0, os.SEEK_END)
+        f.seek(max(data_end - TAIL_CHECK_BYTES, 0))
+        tail = f.read()
+    newline = tail.rfind(b'\n')
+    return data_end - len(tail) + newline + 1 if newline >= 0 else 0
+
+
+def _read_appended(path, offset, end):
+    """قراءة الأسطر المضافة بين موضعين مع سطر العناوين"""
+    with open(path, 'rb') as f:
+        header = f.readline()
+        offset = max(offset, f.tell())
+        f.seek(offset)
+        chunk = f.read(max(end - offset, 0))
+    # round_trip: نفس القيم المكتوبة تماماً حتى تتطابق الميزات مع إعادة البناء
+    return pd.read_csv(io.BytesIO(header + chunk), parse_dates=['sale_date'], float_precision='round_trip')
+
+
+def _empty_seasonal():
+    # الشهر 1-12 ويوم الأسبوع 0-6
+    return {
+        key: {"sum": [0.0] * size, "compensation": [0.0] * size, "count": [0] * size}
+        for key, size in (("month", 13), ("dow", 7))
+    }
+
+
+def _accumulate_seasonal(seasonal, history):
+    """
+    إضافة مبيعات أيام جديدة إلى مجاميع الشهر ويوم الأسبوع
+
+    الجمع بتعويض Kahan وبترتيب التواريخ كما في groupby().mean() في pandas،
+    فتطابق المتوسطات الناتجة متوسطات إعادة البناء الكاملة تماماً.
+    """
+    sales = history['total_amount'].to_numpy(dtype=float)
+    for key, groups in (("month", history.index.month), ("dow", history.index.dayofweek)):
+        total, compensation, count = (seasonal[key][name] for name in ("sum", "compensation", "count"))
+        for group, value in zip(groups.tolist(), sales.tolist()):
+            y = value - compensation[group]
+            t = total[group] + y
+            compensation[group] = t - total[group] - y
+            total[group] = t
+            count[group] += 1
+    return seasonal
+
+
+def _seasonal_means(seasonal):
+    """متوسطات الشهر ويوم الأسبوع من المجاميع (للقيم الموجودة فقط كما في groupby)"""
+    def means(group):
+        present = [i for i, count in enumerate(group["count"]) if count]
+        return pd.Series([group["sum"][i] / group["count"][i] for i in present], index=present)
+    return means(seasonal["month"]), means(seasonal["dow"])
+
+
+def _rewrite_processed(processed_path, appended, monthly, weekday):
+    """
+    كتابة الملف المعالج مع متوسطي الشهر ويوم الأسبوع الحاليين لجميع الصفوف ثم الصفوف الجديدة
+
+    تُستبدل قيم العمودين في كل سطر نصياً بنفس تنسيق to_csv (repr) وتبقى باقي الحقول كما هي،
+    ويُكتب الناتج في ملف مؤقت يحل محل الملف المعالج دفعة واحدة.
+
+    Args:
+        appended: الصفوف المعالجة الجديدة بترتيب أعمدة الملف
+        monthly, weekday: المتوسطات حسب رقم الشهر ويوم الأسبوع
+    """
+    monthly_text = {month: repr(float(value)) for month, value in monthly.items()}
+    weekday_text = {dow: repr(float(value)) for dow, value in weekday.items()}
+
+    temp = f'{processed_path}.{os.getpid()}.tmp'
+    with open(processed_path, encoding='utf-8', newline='') as source, \
+            open(temp, 'w', encoding='utf-8', newline='') as target:
+        header = source.readline()
+        target.write(header)
+        names = header.rstrip('\r\n').split(',')
+        month_field, dow_field = (names.index(column) for column in SEASONAL_COLUMNS)
+        for line in source:
+            end = len(line) - len(line.rstrip('\r\n'))
+            fields = line[:len(line) - end].split(',')
+            day = date.fromisoformat(fields[0][:10])
+            fields[month_field] = monthly_text[day.month]
+            fields[dow_field] = weekday_text[day.weekday()]
+            target.write(','.join(fields) + line[len(line) - end:])
+        appended.to_csv(target, header=False, date_format='%Y-%m-%d')
+    os.replace(temp, processed_path)
+
+
+def _window_records(history):
+    window = history.tail(MAX_WINDOW)
+    records = {"sale_date": window.index.strftime('%Y-%m-%d').tolist()}
+    for column in METRICS:
+        records[column] = window[column].tolist()
+    return records
+
+
+def _window_frame(records):
+    frame = pd.DataFrame({column: records[column] for column in METRICS})
+    frame.index = pd.DatetimeIndex(pd.to_datetime(records["sale_date"]), name='sale_date')
+    return frame
+
+
+def _write_state(path, state):
+    temp = f'{path}.{os.getpid()}.tmp'
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(temp, path)
+
+
+def _build_state(daily_path, processed_path, daily_offset, history, seasonal):
+    return {
+        "format": STATE_FORMAT,
+        "daily_offset": daily_offset,
+        "daily_tail": _tail_hash(daily_path, daily_offset),
+        "processed_size": os.path.getsize(processed_path),
+        "last_date": history.index[-1].strftime('%Y-%m-%d'),
+        "rows": int(len(history)),
+        "window": _window_records(history),
+        "seasonal": seasonal,
+    }
+
+
+def load_state(daily_path=DAILY_SALES_PATH, processed_path=PROCESSED_DATA_PATH):
+    """
+    قراءة الحالة المحفوظة والتحقق من أن الملفين لم يتغيرا إلا بالإلحاق
+
+    Returns:
+        tuple: (الحالة أو None, سبب عدم صلاحيتها)
+    """
+    path = state_path(processed_path)
+    if not os.path.exists(path) or not os.path.exists(processed_path):
+        return None, "لا توجد حالة سابقة"
+    try:
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None, "ملف الحالة تالف"
+
+    if state.get("format") != STATE_FORMAT:
+        return None, "صيغة ملف الحالة قديمة"
+    if os.path.getsize(processed_path) != state["processed_size"]:
+        return None, "الملف المعالج عُدّل خارج هذا الأمر"
+    if os.path.getsize(daily_path) < state["daily_offset"] or \
+            _tail_hash(daily_path, state["daily_offset"]) != state["daily_tail"]:
+        return None, "ملف المبيعات اليومية عُدّل بغير الإلحاق"
+    return state, None
+
+
+def rebuild(daily_path=DAILY_SALES_PATH, processed_path=PROCESSED_DATA_PATH):
+    """إعادة بناء الملف المعالج بالكامل وحفظ الحالة"""
+    daily_offset = _complete_length(daily_path)
+    daily = _read_appended(daily_path, 0, daily_offset)
+    history = prepare_history(daily)
+    processed = materialize_processed(history)
+
+    temp = f'{processed_path}.{os.getpid()}.tmp'
+    processed.to_csv(temp, date_format='%Y-%m-%d')
+    os.replace(temp, processed_path)
+
+    seasonal = _accumulate_seasonal(_empty_seasonal(), history)
+    state = _build_state(daily_path, processed_path, daily_offset, history, seasonal)
+    _write_state(state_path(processed_path), state)
+    return {
+        "mode": "rebuild",
+        "new_days": int(len(history)),
+        "processed_rows": int(len(processed)),
+        "last_date": state["last_date"],
+    }
+
+
+def materialize(daily_path=DAILY_SALES_PATH, processed_path=PROCESSED_DATA_PATH, force_rebuild=False):
+    """
+    تحديث الملف المعالج بالأيام الجديدة فقط (أو إعادة بنائه عند الحاجة)
+
+    Returns:
+        dict: طريقة التحديث وعدد الأيام والصفوف المضافة وآخر تاريخ
+    """
+    state, reason = (None, "طُلبت إعادة البناء") if force_rebuild else load_state(daily_path, processed_path)
+    if state is None:
+        return {**rebuild(daily_path, processed_path), "reason": reason}
+
+    daily_offset = _complete_length(daily_path)
+    if daily_offset <= state["daily_offset"]:
+        return {"mode": "up-to-date", "new_days": 0, "processed_rows": 0, "last_date": state["last_date"]}
+
+    new_rows = _read_appended(daily_path, state["daily_offset"], daily_offset)
+    dates = new_rows['sale_date']
+    if dates.iloc[0] <= pd.Timestamp(state["last_date"]) or not dates.is_monotonic_increasing or dates.duplicated().any():
+        return {**rebuild(daily_path, processed_path), "reason": "تواريخ جديدة غير لاحقة لآخر تاريخ معالج"}
+
+    window = _window_frame(state["window"])
+    history = pd.concat([window, new_rows.set_index('sale_date')[METRICS]])
+    appended = history.iloc[len(window):]
+
+    seasonal = _accumulate_seasonal(state["seasonal"], appended)
+
+    with open(processed_path, encoding='utf-8') as f:
+        columns = f.readline().rstrip('\r\n').split(',')[1:]
+    monthly, weekday = _seasonal_means(seasonal)
+    processed = materialize_processed(history, len(window), (monthly, weekday))[columns]
+    _rewrite_processed(processed_path, processed, monthly, weekday)
+
+    # الحالة تُكتب بعد استبدال الملف: إذا توقف الأمر بينهما يختلف حجم الملف المعالج فيُعاد البناء في التشغيل التالي
+    next_state = _build_state(daily_path, processed_path, daily_offset, history, seasonal)
+    next_state["rows"] = state["rows"] + len(appended)
+    _write_state(state_path(processed_path), next_state)
+    return {
+        "mode": "incremental",
+        "new_days": int(len(appended)),
+        "processed_rows": int(len(processed)),
+        "last_date": next_state["last_date"],
+    }
+
+
+def verify(daily_path=DAILY_SALES_PATH, processed_path=PROCESSED_DATA_PATH):
+    """
+    مقارنة الملف المعالج بإعادة بناء كاملة في الذاكرة
+
+    يتطابق الملف فقط إذا تساوت جميع الأعمدة لجميع الصفوف، ومنها متوسطا الشهر ويوم الأسبوع
+    (seasonal_drift_rows: عدد الصفوف التي يختلف فيها أحدهما).
+
+    Returns:
+        dict: نتيجة المقارنة (match=True عند التطابق)
+    """
+    daily = pd.read_csv(daily_path, parse_dates=['sale_date'], float_precision='round_trip')
+    expected = materialize_processed(prepare_history(daily))
+    actual = pd.read_csv(processed_path, index_col=0, parse_dates=True, float_precision='round_trip')
+    result = {"rows": int(len(actual)), "expected_rows": int(len(expected))}
+    if not actual.index.equals(expected.index) or list(actual.columns) != list(expected.columns):
+        return {**result, "match": False, "error": "التواريخ أو الأعمدة غير متطابقة"}
+
+    row_columns = [column for column in actual.columns if column not in SEASONAL_COLUMNS]
+    a, e = actual[row_columns].to_numpy(dtype=float), expected[row_columns].to_numpy(dtype=float)
+    seasonal_a, seasonal_e = actual[SEASONAL_COLUMNS].to_numpy(), expected[SEASONAL_COLUMNS].to_numpy()
+    drift_rows = int((seasonal_a != seasonal_e).any(axis=1).sum())
+    return {
+        **result,
+        "match": bool(np.array_equal(a, e)) and drift_rows == 0,
+        "max_abs_diff": float(np.abs(a - e).max()) if a.size else 0.0,
+        "seasonal_drift_rows": drift_rows,
+    }
+
+
+def main(argv=None):
+    os.chdir(SERVICE_DIR)
+    parser = argparse.ArgumentParser(description="تحديث البيانات المعالجة بالأيام الجديدة فقط")
+    parser.add_argument('--daily', default=DAILY_SALES_PATH, help="ملف المبيعات اليومية")
+    parser.add_argument('--processed', default=PROCESSED_DATA_PATH, help="ملف البيانات المعالجة")
+    parser.add_argument('--rebuild', action='store_true', help="إعادة البناء الكامل")
+    parser.add_argument('--verify', action='store_true', help="مقارنة الملف بإعادة بناء كاملة بعد التحديث")
+    args = parser.parse_args(argv)
+
+    result = materialize(args.daily, args.processed, args.rebuild)
+    print(json.dumps(result, ensure_ascii=False))
+    if args.verify:
+        check = verify(args.daily, args.processed)
+        print(json.dumps(check, ensure_ascii=False))
+        return 0 if check["match"] else 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
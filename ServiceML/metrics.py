@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+مقاييس زمن الاستجابة وعدد الطلبات بصيغة Prometheus
+Request and Stage Metrics
+
+كل طلب يجمع زمن مراحله (اقتطاع البيانات، بناء الميزات، التطبيع، التنبؤ، تحويل JSON)
+في ذاكرة الخيط الحالي، وعند انتهائه تُضاف المجاميع إلى المدرجات التكرارية دفعة واحدة.
+
+مع عدة عمليات (gunicorn) تكتب كل عملية مقاييسها دورياً في مجلد مشترك،
+ويجمع /api/metrics ملفات جميع العمليات حتى لا يرى Prometheus عاملاً واحداً فقط.
+"""
+
+import atexit
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+# حدود مدرجات زمن الاستجابة بالثواني
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# مراحل معالجة الطلب
+STAGES = ('data_slice', 'feature_build', 'scale', 'predict', 'serialize')
+
+# فترة كتابة مقاييس العملية إلى المجلد المشترك (ثوانٍ)
+FLUSH_INTERVAL = 5.0
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_DESCRIPTIONS = {
+    'ml_requests_total': ('counter', "عدد الطلبات حسب المسار والطريقة والحالة ونسخة النموذج"),
+    'ml_request_errors_total': ('counter', "عدد الطلبات الفاشلة (حالة 400 فأكثر) حسب المسار ونسخة النموذج"),
+    'ml_request_duration_seconds': ('histogram', "زمن معالجة الطلب كاملاً"),
+    'ml_stage_duration_seconds': ('histogram', "زمن كل مرحلة داخل الطلب"),
+    'ml_coalesced_requests_total': ('counter', "طلبات شاركت نتيجة حساب جارٍ لطلب مطابق (الوضع غير المتزامن)"),
+    'ml_rejected_requests_total': ('counter', "طلبات رُفضت بـ 503 لامتلاء مجموعة الخيوط (الوضع غير المتزامن)"),
+}
+
+
+class Registry:
+    """عدادات ومدرجات تكرارية لعملية واحدة (آمنة بين الخيوط)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + amount
+
+    def observe_many(self, name, observations):
+        """إضافة عدة قيم (labels, seconds) إلى مدرج واحد تحت قفل واحد"""
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            for labels, value in observations:
+                entry = series.get(labels)
+                if entry is None:
+                    # عدد لكل حد + حد اللانهاية، ثم المجموع
+                    entry = series[labels] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+                entry[bisect_left(LATENCY_BUCKETS, value)] += 1
+                entry[-1] += value
+
+    def snapshot(self):
+        """نسخة قابلة للتحويل إلى JSON"""
+        with self._lock:
+            return {
+                "counters": {name: [[list(k), v] for k, v in series.items()]
+                             for name, series in self.counters.items()},
+                "histograms": {name: [[list(k), list(v)] for k, v in series.items()]
+                               for name, series in self.histograms.items()},
+            }
+
+
+registry = Registry()
+_local = threading.local()
+
+# المجلد المشترك بين العمليات (None لعملية واحدة)
+_shared_dir = None
+_flusher_pid = None
+
+
+class _Stage:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        stages = getattr(_local, 'stages', None)
+        if stages is None:
+            # خارج الطلبات (مثل التنبؤ المسبق عند بدء التشغيل)
+            registry.observe_many('ml_stage_duration_seconds', [(('internal', self.name), elapsed)])
+        else:
+            stages[self.name] = stages.get(self.name, 0.0) + elapsed
+        return False
+
+
+def stage(name):
+    """قياس زمن مرحلة: with metrics.stage('predict'): ..."""
+    return _Stage(name)
+
+
+def begin_request():
+    """بداية طلب في الخيط الحالي"""
+    _local.stages = {}
+    _local.start = time.perf_counter()
+
+
+def end_request(endpoint, method, status, model_version):
+    """تسجيل الطلب المنتهي وزمن مراحله"""
+    start = getattr(_local, 'start', None)
+    stages = getattr(_local, 'stages', None) or {}
+    _local.stages = None
+    _local.start = None
+    duration = time.perf_counter() - start if start is not None else None
+    record_request(endpoint, method, status, model_version, duration, stages)
+
+
+def record_request(endpoint, method, status, model_version, duration=None, stages=None):
+    """
+    تسجيل طلب منتهٍ
+
+    يُستدعى مباشرة للطلبات التي لم تمر عبر Flask (مثل الطلبات المدموجة في async_api
+    التي تشترك في استجابة طلب آخر، فتُسجَّل دون مراحل).
+    """
+    model_version = model_version or 'none'
+    registry.inc('ml_requests_total', (endpoint, method, str(status), model_version))
+    if status >= 400:
+        registry.inc('ml_request_errors_total', (endpoint, model_version))
+
+    if stages:
+        observations = [((endpoint, name), seconds) for name, seconds in stages.items()]
+        registry.observe_many('ml_stage_duration_seconds', observations)
+    if duration is not None:
+        registry.observe_many('ml_request_duration_seconds', [((endpoint,), duration)])
+
+    if _shared_dir is not None and _flusher_pid != os.getpid():
+        _start_flusher()
+
+
+_LABEL_NAMES = {
+    'ml_requests_total': ('endpoint', 'method', 'status', 'model_version'),
+    'ml_request_errors_total': ('endpoint', 'model_version'),
+    'ml_request_duration_seconds': ('endpoint',),
+    'ml_stage_duration_seconds': ('endpoint', 'stage'),
+    'ml_coalesced_requests_total': ('endpoint',),
+    'ml_rejected_requests_total': ('endpoint',),
+}
+
+
+def enable_multiprocess(directory=None):
+    """
+    تفعيل تجميع المقاييس بين العمليات (يُستدعى في العملية الرئيسية قبل إنشاء العمليات الفرعية)
+
+    Args:
+        directory: مجلد ملفات المقاييس (ML_METRICS_DIR أو مجلد مؤقت جديد)
+    """
+    global _shared_dir
+    directory = directory or os.environ.get('ML_METRICS_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        # ملفات تشغيل سابق لا تخص العمليات الحالية
+        for name in os.listdir(directory):
+            if name.startswith('metrics-') and name.endswith('.json'):
+                os.remove(os.path.join(directory, name))
+    else:
+        directory = tempfile.mkdtemp(prefix='ml-metrics-')
+        owner = os.getpid()
+
+        def cleanup():
+            # العمليات الفرعية ترث atexit، والحذف للعملية الرئيسية فقط
+            if os.getpid() == owner:
+                shutil.rmtree(directory, ignore_errors=True)
+
+        atexit.register(cleanup)
+    _shared_dir = directory
+
+    # مقاييس العملية الرئيسية (مثل التنبؤ المسبق) تُكتب مرة واحدة، وتبدأ كل عملية فرعية من الصفر
+    # حتى لا تُحسب المقاييس الموروثة مرة لكل عامل
+    flush()
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_reset_registry)
+    return directory
+
+
+def _reset_registry():
+    global registry
+    registry = Registry()
+
+
+def _process_file(pid):
+    return os.path.join(_shared_dir, f'metrics-{pid}.json')
+
+
+def flush():
+    """كتابة مقاييس العملية الحالية في المجلد المشترك"""
+    if _shared_dir is None:
+        return
+    target = _process_file(os.getpid())
+    temp = f'{target}.tmp'
+    try:
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(registry.snapshot(), f)
+        os.replace(temp, target)
+    except OSError as e:
+        print(f"تحذير: تعذر كتابة المقاييس: {str(e)}")
+
+
+def _start_flusher():
+    global _flusher_pid
+    _flusher_pid = os.getpid()
+
+    def run():
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            flush()
+
+    threading.Thread(target=run, daemon=True, name='metrics-flush').start()
+    atexit.register(flush)
+
+
+def _collect():
+    """مقاييس جميع العمليات: العملية الحالية مباشرة والباقي من ملفاتها"""
+    snapshots = [registry.snapshot()]
+    if _shared_dir is not None:
+        own = os.path.basename(_process_file(os.getpid()))
+        for name in os.listdir(_shared_dir):
+            if not name.startswith('metrics-') or not name.endswith('.json') or name == own:
+                continue
+            try:
+                with open(os.path.join(_shared_dir, name), 'r', encoding='utf-8') as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, series in snapshot["counters"].items():
+            target = counters.setdefault(name, {})
+            for labels, value in series:
+                target[tuple(labels)] = target.get(tuple(labels), 0) + value
+        for name, series in snapshot["histograms"].items():
+            target = histograms.setdefault(name, {})
+            for labels, values in series:
+                entry = target.setdefault(tuple(labels), [0] * len(values))
+                for i, value in enumerate(values):
+                    entry[i] += value
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def render(gauges=None):
+    """
+    المقاييس بصيغة Prometheus النصية
+
+    Args:
+        gauges: قائمة (الاسم, الوصف, التسميات dict, القيمة) لقيم العملية الحالية
+
+    Returns:
+        str: نص المقاييس
+    """
+    counters, histograms = _collect()
+    lines = []
+
+    for name, series in counters.items():
+        kind, description = _DESCRIPTIONS[name]
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+        for labels, value in sorted(series.items()):
+            lines.append(f'{name}{_labels(_LABEL_NAMES[name], labels)} {value}')
+
+    bounds = [repr(float(b)) for b in LATENCY_BUCKETS] + ['+Inf']
+    for name, series in histograms.items():
+        kind, description = _DESCRIPTIONS[name]
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+        label_names = _LABEL_NAMES[name]
+        for labels, entry in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, entry[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f'{name}_bucket{_labels(label_names, labels, le)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(label_names, labels)} {entry[-1]!r}')
+            lines.append(f'{name}_count{_labels(label_names, labels)} {cumulative}')
+
+    for name, description, labels, value in gauges or []:
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} gauge']
+        lines.append(f'{name}{_labels(list(labels), list(labels.values()))} {value}')
+
+    return '\n'.join(lines) + '\n'
@@ -5,77 +5,325 @@
 Sales Prediction Model Handler
 """
 
+import os
+import time
+import hashlib
+import contextlib
+import io
 import pandas as pd
 import numpy as np
 import joblib
+import threading
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    import fcntl
+except ImportError:  # Windows: عملية واحدة فلا حاجة لقفل بين العمليات
+    fcntl = None
+
+from feature_state import FeatureState, FeatureLayout, METRICS
+from feature_engine import (
+    prepare_history, datetime_features, lag_features, rolling_features, build_feature_frame,
+    materialize_processed
+)
+from snapshot import read_csv_cached
+from compact import compact_frame, frame_memory
+from shared_model import load_shared_forest, SharedForest, memory_report, is_supported
+from compiled_model import compile_forest, tree_spread
+from series_panel import SeriesPanel, normalize_series_frame, series_codes, concat_series_frames, latest_rows
+import metrics
+
+# مسارات ملفات البيانات
+DAILY_SALES_PATH = 'data/Daily_sales.csv'
+PROCESSED_DATA_PATH = 'data/processed_sales_data.csv'
+# مبيعات المنتجات والفئات اليومية (اختياري): series_id, level, sale_date, ...
+SERIES_DATA_PATH = 'data/series_sales.csv'
+
+# قفل بين العمليات لكتابة ملفات البيانات وقراءة ما أضافته العمليات الأخرى
+DATA_LOCK_PATH = 'data/.write.lock'
+
+# عدد البايتات قبل نهاية المحتوى المحمّل التي يُتحقق من عدم تغيرها قبل قراءة الأسطر المضافة فقط
+TAIL_CHECK_BYTES = 4096
+
+# أعمدة البيانات المعالجة التي تقرأها الخدمة (باقي الميزات تُحسب من السجل الخام عند الحاجة)
+CLEAN_COLUMNS = ['total_amount']
+
+# الحد الأقصى لعدد التواريخ في طلب التنبؤ الدفعي الواحد
+MAX_BATCH_DATES = 3660
+
+# الحد الأقصى لعدد سيناريوهات "ماذا لو" في الطلب الواحد
+MAX_SCENARIOS = 100000
+
+# الحد الأقصى لعدد أيام التنبؤ المتسلسل
+MAX_HORIZON_DAYS = 365
+
+# الحد الأقصى لحجم الصفحة في التنبؤ للسلاسل المتعددة
+MAX_SERIES_PAGE_SIZE = 1000
+
+# الحد الأقصى لعدد الأيام في صفحة JSON من استعلام نطاق التواريخ (NDJSON دون حد)
+MAX_RANGE_PAGE_SIZE = 10000
+
+# تحميل أشجار النموذج من مصفوفات مشتركة بين العمليات (ML_SHARED_MODEL=0 لتعطيله)
+SHARED_MODEL = os.environ.get('ML_SHARED_MODEL', '1') != '0'
+
+# مجلد ملفات النموذج وأنواع النماذج بترتيب الأولوية
+MODEL_DIR = 'modelAI'
+MODEL_TYPES = ['randomforest', 'xgboost', 'linearregression']
+SCALER_FILE = 'standard_scaler.joblib'
+FEATURES_FILE = 'feature_columns.txt'
+
+# فترة مراقبة مجلد النموذج بالثواني لإعادة التحميل التلقائي (0 للتعطيل)
+MODEL_WATCH_INTERVAL = float(os.environ.get('ML_MODEL_WATCH_INTERVAL', '0'))
+
+# المئينات الافتراضية لفترة التنبؤ من مخرجات أشجار الغابة (مفصولة بفواصل)
+PREDICTION_QUANTILES = os.environ.get('ML_PREDICTION_QUANTILES', '0.05,0.5,0.95')
+
+# الحد الأقصى لعدد المئينات في الطلب الواحد
+MAX_QUANTILES = 20
+
+
+class ModelArtifacts:
+    """نسخة ثابتة من النموذج والـ Scaler وقائمة الميزات تُستبدل دفعة واحدة عند إعادة التحميل"""
+
+    def __init__(self, model, scaler, feature_columns, model_file, fingerprint):
+        self.model = model
+        self.scaler = scaler
+        self.feature_columns = feature_columns
+        # مواقع الميزات في متجه النموذج (ValueError إذا احتوت القائمة على ميزة غير معروفة)
+        self.layout = FeatureLayout(feature_columns)
+        self.model_file = model_file
+        self.fingerprint = fingerprint
+        # الغابة مع الـ Scaler مُجمَّعة في مصفوفات عقد (None للنماذج غير المدعومة)
+        try:
+            self.compiled = compile_forest(model, scaler)
+        except Exception as e:
+            print(f"تحذير: تعذر تجميع النموذج، سيُستخدم sklearn: {str(e)}")
+            self.compiled = None
+        # معرف النسخة مشتق من الملفات نفسها فيتطابق بين جميع العمليات
+        self.version = hashlib.sha1(repr(fingerprint).encode('utf-8')).hexdigest()[:12]
+        self.loaded_at = datetime.now()
+
+
+def artifacts_fingerprint(model_dir=MODEL_DIR):
+    """وقت التعديل والحجم لملفات النموذج (لاكتشاف نشر نموذج جديد)"""
+    files = [f'best_model_{model_type}.joblib' for model_type in MODEL_TYPES] + [SCALER_FILE, FEATURES_FILE]
+    fingerprint = []
+    for name in files:
+        try:
+            stat = os.stat(os.path.join(model_dir, name))
+        except FileNotFoundError:
+            continue
+        fingerprint.append((name, stat.st_mtime_ns, stat.st_size))
+    return tuple(fingerprint)
+
+
+def file_state(path):
+    """الحجم ووقت التعديل لملف بيانات (None إذا لم يوجد)"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def parse_quantiles(quantiles):
+    """
+    قراءة المئينات من نص مفصول بفواصل أو قائمة أرقام
+
+    Returns:
+        tuple: المئينات مرتبة دون تكرار
+
+    Raises:
+        ValueError: قيمة خارج [0, 1] أو غير رقمية أو عدد يتجاوز MAX_QUANTILES
+    """
+    if isinstance(quantiles, str):
+        quantiles = [part for part in quantiles.split(',') if part.strip()]
+    try:
+        values = sorted({float(q) for q in quantiles})
+    except (ValueError, TypeError):
+        raise ValueError("المئينات يجب أن تكون أرقاماً بين 0 و 1")
+    if any(not 0 <= q <= 1 for q in values):
+        raise ValueError("المئينات يجب أن تكون أرقاماً بين 0 و 1")
+    if len(values) > MAX_QUANTILES:
+        raise ValueError(f"عدد المئينات يتجاوز الحد المسموح ({MAX_QUANTILES})")
+    return tuple(values)
+
+
+DEFAULT_QUANTILES = parse_quantiles(PREDICTION_QUANTILES)
+
+
 class SalesModelHandler:
     """فئة للتعامل مع نموذج التنبؤ بالمبيعات"""
     
     def __init__(self):
         """تهيئة معالج النموذج"""
-        self.model = None
-        self.scaler = None
-        self.feature_columns = None
+        self.artifacts = None
         self.df_original = None
         self.df_clean = None
+        # أعمدة ملف البيانات المعالجة بترتيبها (للإلحاق بالملف)
+        self.processed_columns = None
         self.last_available_date = None
-        
+        self.feature_state = None
+        self._history = None
+
+        # السلاسل المتعددة (منتجات وفئات): البيانات الطويلة واللوحة المبنية منها
+        self.series_frame = None
+        self.series_panel = None
+        # نسخة بيانات السلاسل: تحديثها يبطل تنبؤات السلاسل فقط وليس نتائج المتجر
+        self.series_version = 0
+
+        # الذاكرة المؤقتة للنتائج المحسوبة: (الاسم، نسخة البيانات) -> النتيجة
+        self.data_version = 0
+        self._result_cache = {}
+        self._cache_lock = threading.Lock()
+        # قفل لكل مفتاح قيد الحساب: الحساب البطيء لا يؤخر حساب مفاتيح أخرى
+        self._key_locks = {}
+
+        # قفل الكتابة: يضمن تنفيذ عمليات إضافة البيانات بالتتابع
+        self._data_lock = threading.Lock()
+
+        # إعادة تحميل النموذج: عملية واحدة في كل مرة وحالة آخر محاولة
+        self._reload_lock = threading.Lock()
+        self.reload_status = {"state": "idle"}
+        self._watcher_pid = None
+
+        # مزامنة العمليات (gunicorn بعدة عمليات): حالة ملفات البيانات كما حمّلتها هذه العملية
+        self.sync_workers = False
+        self._file_states = {}
+        self._file_tails = {}
+        self._failed_fingerprint = None
+
+    @property
+    def model(self):
+        return self.artifacts.model if self.artifacts else None
+
+    @property
+    def scaler(self):
+        return self.artifacts.scaler if self.artifacts else None
+
+    @property
+    def feature_columns(self):
+        return self.artifacts.feature_columns if self.artifacts else None
+
+    @property
+    def model_version(self):
+        return self.artifacts.version if self.artifacts else None
+
     def load_artifacts(self):
         """تحميل النموذج والمكونات المحفوظة"""
         try:
-            # محاولة تحميل أنواع مختلفة من النماذج من مجلد modelAI
-            model_types = ['randomforest', 'xgboost', 'linearregression']
-            model_loaded = False
-
-            for model_type in model_types:
-                try:
-                    model_file = f'modelAI/best_model_{model_type}.joblib'
-                    self.model = joblib.load(model_file)
-                    print(f"✓ تم تحميل النموذج: {model_type}")
-                    model_loaded = True
-                    break
-                except FileNotFoundError:
-                    continue
-
-            if not model_loaded:
-                raise FileNotFoundError("لم يتم العثور على أي نموذج محفوظ في مجلد modelAI")
-
-            # تحميل الـ Scaler
-            self.scaler = joblib.load('modelAI/standard_scaler.joblib')
-            print("✓ تم تحميل الـ Scaler")
-
-            # تحميل قائمة الميزات
-            with open('modelAI/feature_columns.txt', 'r', encoding='utf-8') as f:
-                self.feature_columns = [line.strip() for line in f]
-            print("✓ تم تحميل قائمة الميزات")
-
+            self.artifacts = self._read_artifacts()
             return True
 
         except Exception as e:
             print(f"خطأ في تحميل المكونات: {str(e)}")
             return False
-    
+
+    def _read_artifacts(self, model_dir=MODEL_DIR):
+        """قراءة النموذج والـ Scaler وقائمة الميزات من مجلد النموذج دون تعديل المعالج"""
+        # البصمة تُقرأ قبل الملفات: إذا تغيّرت أثناء القراءة ستُكتشف في المراقبة التالية
+        fingerprint = artifacts_fingerprint(model_dir)
+
+        # محاولة تحميل أنواع مختلفة من النماذج من مجلد modelAI
+        model = None
+        for model_type in MODEL_TYPES:
+            try:
+                model_file = os.path.join(model_dir, f'best_model_{model_type}.joblib')
+                model = self._load_model_file(model_file)
+                print(f"✓ تم تحميل النموذج: {model_type}")
+                break
+            except FileNotFoundError:
+                continue
+
+        if model is None:
+            raise FileNotFoundError("لم يتم العثور على أي نموذج محفوظ في مجلد modelAI")
+
+        # تحميل الـ Scaler
+        scaler = joblib.load(os.path.join(model_dir, SCALER_FILE))
+        print("✓ تم تحميل الـ Scaler")
+
+        # تحميل قائمة الميزات
+        with open(os.path.join(model_dir, FEATURES_FILE), 'r', encoding='utf-8') as f:
+            feature_columns = [line.strip() for line in f]
+        print("✓ تم تحميل قائمة الميزات")
+
+        return ModelArtifacts(model, scaler, feature_columns, model_file, fingerprint)
+
+    def _load_model_file(self, model_file):
+        """
+        تحميل ملف النموذج، بنسخة مشتركة بين العمليات إن أمكن
+
+        في الوضع المشترك تُقرأ الأشجار من مصفوفات مصدَّرة عبر memory-map
+        ولا يُحمّل ملف joblib إلا عند أول تصدير لنسخة النموذج.
+        """
+        if not os.path.exists(model_file):
+            raise FileNotFoundError(model_file)
+        if not SHARED_MODEL:
+            return joblib.load(model_file)
+
+        try:
+            forest = SharedForest.open(model_file)
+            if forest is not None:
+                print(f"✓ تم فتح أشجار النموذج المشتركة: {forest.path}")
+                return forest
+        except Exception as e:
+            print(f"تحذير: تعذر فتح أشجار النموذج المشتركة: {str(e)}")
+
+        model = joblib.load(model_file)
+        try:
+            forest = load_shared_forest(model, model_file)
+        except Exception as e:
+            print(f"تحذير: تعذر تصدير أشجار النموذج المشتركة: {str(e)}")
+            return model
+        if forest is None:
+            return model
+
+        print(f"✓ تم تصدير أشجار النموذج المشتركة: {forest.path}")
+        return forest
+
     def load_data(self):
         """تحميل البيانات الأصلية والمعالجة"""
         try:
-            # تحميل البيانات الأصلية من مجلد data
-            self.df_original = pd.read_csv('data/Daily_sales.csv', parse_dates=['sale_date'])
-            self.last_available_date = self.df_original['sale_date'].max()
-            print(f"✓ تم تحميل البيانات الأصلية. آخر تاريخ متاح: {self.last_available_date.date()}")
+            self._load_sales_data()
 
-            # تحميل البيانات المعالجة من مجلد data
-            self.df_clean = pd.read_csv('data/processed_sales_data.csv', index_col=0, parse_dates=True)
-            print("✓ تم تحميل البيانات المعالجة")
+            # بيانات المنتجات والفئات اختيارية ولا يمنع فشل تحميلها تشغيل الخدمة
+            self.load_series()
 
+            self.bump_data_version()
             return True
 
         except Exception as e:
             print(f"خطأ في تحميل البيانات: {str(e)}")
             return False
+
+    def _load_sales_data(self):
+        """قراءة ملفي المبيعات اليومية والبيانات المعالجة ثم استبدال الجداول المحملة معاً"""
+        states = {path: file_state(path) for path in (DAILY_SALES_PATH, PROCESSED_DATA_PATH)}
+
+        # تحميل البيانات الأصلية من مجلد data بأنواع بيانات مضغوطة
+        df_original = compact_frame(read_csv_cached(DAILY_SALES_PATH, parse_dates=['sale_date']))
+        last_available_date = df_original['sale_date'].max()
+        print(f"✓ تم تحميل البيانات الأصلية. آخر تاريخ متاح: {last_available_date.date()}")
+
+        # تحميل الأعمدة المستخدمة فقط من البيانات المعالجة
+        header = list(pd.read_csv(PROCESSED_DATA_PATH, nrows=0).columns)
+        df_clean = compact_frame(read_csv_cached(
+            PROCESSED_DATA_PATH, index_col=0, parse_dates=True, usecols=header[:1] + CLEAN_COLUMNS
+        ))
+        print("✓ تم تحميل البيانات المعالجة")
+
+        # بناء الحالة التراكمية للنوافذ المتحركة والمتوسطات الموسمية
+        feature_state = FeatureState.from_frames(df_original, df_clean)
+
+        self.df_original = df_original
+        self.df_clean = df_clean
+        self.processed_columns = header[1:]
+        self.last_available_date = last_available_date
+        self.feature_state = feature_state
+        for path, state in states.items():
+            self._record_file(path, state)
     
     def initialize(self):
         """تهيئة المعالج بتحميل جميع المكونات"""
@@ -88,117 +336,677 @@ class SalesModelHandler:
         
         if not self.load_data():
             return False
+
+        # حساب تنبؤ اليوم التالي مسبقاً حتى تصبح الطلبات مجرد قراءة من الذاكرة
+        warm_result = self.predict_next_day_sales()
+        if "error" in warm_result:
+            print(f"تحذير: تعذر حساب التنبؤ المسبق: {warm_result['error']}")
         
         print("✓ تم تهيئة المعالج بنجاح")
         return True
+
+    def enable_worker_sync(self):
+        """
+        تفعيل مزامنة العمليات (يُستدعى قبل إنشاء عمال gunicorn)
+
+        كل عملية تحمل نسختها من البيانات والنموذج، لذلك تُقارن قبل كل طلب ملفات البيانات والنموذج
+        بما حمّلته العملية ويُعاد تحميل ما تغيّر. الإضافات المحفوظة وإعادة تحميل النموذج من أي عامل
+        تصل بذلك إلى جميع العمليات، وتُكتب ملفات البيانات تحت قفل بين العمليات (DATA_LOCK_PATH).
+        """
+        self.sync_workers = True
+
+    def sync_shared_state(self):
+        """
+        تحميل ما تغيّر في ملفات النموذج والبيانات منذ آخر تحميل في هذه العملية
+
+        عند عدم التغيير تكلف المقارنة بضع قراءات لحالة الملفات (stat) فقط.
+        """
+        if not self.sync_workers:
+            return
+        self._sync_model()
+        if self._changed_files():
+            with self._shared_lock(), self._data_lock:
+                self._apply_file_changes()
+
+    def _sync_model(self):
+        if self.artifacts is None or self._reload_lock.locked():
+            return
+        current = artifacts_fingerprint()
+        if current == self.artifacts.fingerprint or current == self._failed_fingerprint:
+            return
+        result = self.reload_model()
+        # عند الفشل لا تُعاد المحاولة حتى تتغير الملفات مرة أخرى
+        if "error" in result and self.reload_status.get("state") == "failed":
+            self._failed_fingerprint = current
+
+    def _changed_files(self):
+        """ملفات البيانات التي تغيّرت منذ آخر تحميل أو كتابة في هذه العملية"""
+        return [
+            path for path in (DAILY_SALES_PATH, PROCESSED_DATA_PATH, SERIES_DATA_PATH)
+            if file_state(path) != self._file_states.get(path)
+        ]
+
+    @contextlib.contextmanager
+    def _shared_lock(self):
+        """قفل ملفات البيانات بين العمليات (fcntl.flock) عند تفعيل مزامنة العمليات"""
+        if not self.sync_workers or fcntl is None:
+            yield
+            return
+        with open(DATA_LOCK_PATH, 'a') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _record_file(self, path, state=None):
+        """حفظ حالة ملف بيانات كما حمّلته أو كتبته هذه العملية مع آخر بايتات محتواه"""
+        state = state if state is not None else file_state(path)
+        tail = b''
+        if state is not None:
+            start = max(state[0] - TAIL_CHECK_BYTES, 0)
+            with open(path, 'rb') as f:
+                f.seek(start)
+                tail = f.read(state[0] - start)
+        self._file_states[path] = state
+        self._file_tails[path] = tail
+
+    def _append_offset(self, path):
+        """نهاية المحتوى المحمّل إذا لم يتغير الملف بعده إلا بالإلحاق (وإلا None)"""
+        recorded = self._file_states.get(path)
+        current = file_state(path)
+        if recorded is None or current is None or current[0] < recorded[0]:
+            return None
+        tail = self._file_tails.get(path, b'')
+        with open(path, 'rb') as f:
+            f.seek(recorded[0] - len(tail))
+            if f.read(len(tail)) != tail:
+                return None
+        return recorded[0]
+
+    def _read_appended(self, path, offset, **read_csv_kwargs):
+        """الصفوف المضافة إلى ملف CSV بعد موضع محدد (مع سطر العناوين)"""
+        with open(path, 'rb') as f:
+            header = f.readline()
+            f.seek(max(offset, f.tell()))
+            chunk = f.read()
+        # round_trip: نفس القيم المكتوبة تماماً فتتطابق الميزات مع العملية التي أضافتها
+        return pd.read_csv(io.BytesIO(header + chunk), float_precision='round_trip', **read_csv_kwargs)
+
+    def _apply_file_changes(self):
+        """
+        تحميل ما غيّرته عمليات أخرى في ملفات البيانات (مع القفلين)
+
+        الأيام الملحقة بملف المبيعات اليومية تُضاف كما في append_daily_sales (الأيام الجديدة فقط)،
+        وأي تعديل آخر يعيد تحميل الملفات كاملة. عند فشل القراءة تبقى البيانات الحالية
+        ولا تُعاد المحاولة حتى يتغير الملف مرة أخرى.
+        """
+        if not self.sync_workers:
+            return
+        changed = self._changed_files()
+        if DAILY_SALES_PATH in changed or PROCESSED_DATA_PATH in changed:
+            # تغيّر الملف المعالج وحده (مثل إعادة بنائه يدوياً) يعيد التحميل الكامل
+            if DAILY_SALES_PATH not in changed or not self._apply_appended_days():
+                try:
+                    self._load_sales_data()
+                except Exception as e:
+                    print(f"تحذير: تعذر إعادة تحميل البيانات: {str(e)}")
+                    for path in (DAILY_SALES_PATH, PROCESSED_DATA_PATH):
+                        self._record_file(path)
+                self.bump_data_version()
+        if SERIES_DATA_PATH in changed and not self._apply_appended_series():
+            if not self.load_series():
+                self._record_file(SERIES_DATA_PATH)
+            self.bump_series_version()
+
+    def _apply_appended_days(self):
+        """
+        إضافة الأيام التي ألحقتها عملية أخرى بملف المبيعات اليومية (False إذا تغيّر بغير الإلحاق)
+
+        الملف المعالج يُعاد كتابته عند كل إضافة (متوسطا الشهر ويوم الأسبوع لجميع الصفوف)،
+        ومنه يُحمَّل عمود المبيعات فقط، فتُحسب صفوفه للأيام الجديدة من السجل كما في append_daily_sales.
+        """
+        offset = self._append_offset(DAILY_SALES_PATH)
+        if offset is None or self.df_original is None:
+            return False
+        try:
+            new_rows = self._read_appended(DAILY_SALES_PATH, offset, parse_dates=['sale_date'])
+            if len(new_rows) and "error" in self._append_rows(new_rows[self.df_original.columns], persist=False):
+                return False
+        except Exception as e:
+            print(f"تحذير: تعذر قراءة الأيام المضافة: {str(e)}")
+            return False
+        for path in (DAILY_SALES_PATH, PROCESSED_DATA_PATH):
+            self._record_file(path)
+        return True
+
+    def _apply_appended_series(self):
+        """إضافة صفوف السلاسل التي ألحقتها عملية أخرى بملف السلاسل (False إذا تغيّر بغير الإلحاق)"""
+        offset = self._append_offset(SERIES_DATA_PATH)
+        if offset is None or self.series_frame is None:
+            return False
+        try:
+            rows = self._read_appended(SERIES_DATA_PATH, offset, parse_dates=['sale_date'], dtype={'series_id': str})
+            if len(rows):
+                self.series_frame, self.series_panel = self._merge_series(normalize_series_frame(rows))
+                self.bump_series_version()
+        except Exception as e:
+            print(f"تحذير: تعذر قراءة صفوف السلاسل المضافة: {str(e)}")
+            return False
+        self._record_file(SERIES_DATA_PATH)
+        return True
+
+    def bump_series_version(self):
+        """زيادة رقم نسخة بيانات السلاسل وإبطال تنبؤات السلاسل المخزنة فقط"""
+        with self._cache_lock:
+            self.series_version += 1
+            self._result_cache = {
+                key: value for key, value in self._result_cache.items()
+                if not (isinstance(key[0], tuple) and key[0][0] == 'series_forecast')
+            }
+        return self.series_version
+
+    def bump_data_version(self):
+        """زيادة رقم نسخة البيانات وإبطال النتائج المخزنة مؤقتاً"""
+        with self._cache_lock:
+            self.data_version += 1
+            self._result_cache = {}
+        return self.data_version
+
+    def reload_model(self, model_dir=MODEL_DIR):
+        """
+        إعادة تحميل النموذج دون إيقاف الخدمة
+        تُحمّل النسخة الجديدة وتُتحقق منها ويُحسب بها تنبؤ اليوم التالي قبل استبدالها دفعة واحدة،
+        والطلبات الجارية تكمل بالنسخة السابقة.
+
+        Returns:
+            dict: نتيجة إعادة التحميل أو رسالة خطأ
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return {"error": "توجد عملية إعادة تحميل جارية"}
+
+        try:
+            previous_version = self.model_version
+            self.reload_status = {"state": "loading", "started_at": datetime.now().isoformat()}
+
+            try:
+                artifacts = self._read_artifacts(model_dir)
+                error = self._validate_artifacts(artifacts)
+            except Exception as e:
+                error = f"خطأ في تحميل المكونات: {str(e)}"
+
+            result = None
+            if error is None and artifacts.version == previous_version:
+                result = {"success": True, "changed": False, "model_version": previous_version}
+
+            if error is None and result is None:
+                # قفل البيانات يمنع إضافة أيام جديدة بين حساب التنبؤ المسبق والاستبدال
+                with self._data_lock:
+                    warm_result = self._compute_next_day_forecast(artifacts)
+                    if "error" in warm_result:
+                        error = f"فشل التنبؤ بالنموذج الجديد: {warm_result['error']}"
+                    else:
+                        with self._cache_lock:
+                            self.artifacts = artifacts
+                            self._result_cache = {
+                                ('next_day_forecast', self.data_version, artifacts.version): warm_result
+                            }
+                        result = {
+                            "success": True,
+                            "changed": True,
+                            "previous_version": previous_version,
+                            "model_version": artifacts.version,
+                            "model_file": artifacts.model_file
+                        }
+
+            if error is not None:
+                print(f"خطأ في إعادة تحميل النموذج: {error}")
+                self.reload_status = {"state": "failed", "error": error, "finished_at": datetime.now().isoformat()}
+                return {"error": error}
+
+            if result["changed"]:
+                print(f"✓ تم استبدال النموذج: {previous_version} -> {artifacts.version}")
+            self.reload_status = dict(result, state="done", finished_at=datetime.now().isoformat())
+            return result
+
+        finally:
+            self._reload_lock.release()
+
+    def reload_model_async(self, model_dir=MODEL_DIR):
+        """بدء إعادة تحميل النموذج في الخلفية"""
+        if self._reload_lock.locked():
+            return {"error": "توجد عملية إعادة تحميل جارية"}
+        thread = threading.Thread(target=self.reload_model, args=(model_dir,), daemon=True, name='model-reload')
+        thread.start()
+        return {"success": True, "state": "loading"}
+
+    def _validate_artifacts(self, artifacts):
+        """التحقق من توافق النموذج والـ Scaler مع قائمة الميزات (None عند النجاح)"""
+        columns = artifacts.feature_columns
+        if not columns or len(set(columns)) != len(columns):
+            return "قائمة الميزات فارغة أو تحتوي على أسماء مكررة"
+
+        for name, component in [("النموذج", artifacts.model), ("الـ Scaler", artifacts.scaler)]:
+            expected = getattr(component, 'n_features_in_', None)
+            if expected is not None and expected != len(columns):
+                return f"{name} يتوقع {expected} ميزة بينما قائمة الميزات تحتوي على {len(columns)}"
+
+        names = getattr(artifacts.scaler, 'feature_names_in_', None)
+        if names is not None and list(names) != columns:
+            return "ترتيب ميزات الـ Scaler لا يطابق قائمة الميزات"
+
+        return None
+
+    def start_model_watcher(self, interval=MODEL_WATCH_INTERVAL):
+        """
+        مراقبة مجلد النموذج وإعادة التحميل تلقائياً عند نشر ملفات جديدة
+        تعمل مرة واحدة لكل عملية (تُستدعى في كل عامل بعد إنشائه).
+        """
+        if interval <= 0 or self._watcher_pid == os.getpid():
+            return False
+
+        self._watcher_pid = os.getpid()
+        thread = threading.Thread(target=self._watch_artifacts, args=(interval,), daemon=True, name='model-watcher')
+        thread.start()
+        print(f"✓ مراقبة مجلد النموذج كل {interval:g} ثانية")
+        return True
+
+    def _watch_artifacts(self, interval):
+        seen = self.artifacts.fingerprint if self.artifacts else None
+        pending = None
+        while True:
+            time.sleep(interval)
+            current = artifacts_fingerprint()
+            if current == seen:
+                pending = None
+                continue
+
+            # الانتظار دورة إضافية حتى تستقر الملفات ولا يُقرأ ملف قيد النسخ
+            if current != pending:
+                pending = current
+                continue
+
+            if self._reload_lock.locked():
+                continue
+            self.reload_model()
+            # عند الفشل لا تُعاد المحاولة حتى تتغير الملفات مرة أخرى
+            seen = current
+            pending = None
+
+    def _get_cached(self, name, compute):
+        """
+        قراءة نتيجة محسوبة لنسخة البيانات والنموذج الحاليتين أو حسابها مرة واحدة وتخزينها
+
+        الحساب يتم بقفل خاص بالمفتاح فقط، فينتظر الطلبات المتزامنة لنفس المفتاح فقط،
+        ويُستخدم قفل الذاكرة المؤقتة العام لنشر النتيجة.
+        """
+        key = (name, self.data_version, self.model_version)
+        cached = self._result_cache.get(key)
+        if cached is not None:
+            return cached
+
+        with self._cache_lock:
+            lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with lock:
+            # قد يكون طلب آخر حسب النتيجة أثناء انتظار القفل
+            cached = self._result_cache.get(key)
+            if cached is not None:
+                return cached
+
+            result = compute()
+            with self._cache_lock:
+                # لا تُخزَّن نتيجة نسخة بيانات أو نموذج استُبدلت أثناء الحساب
+                if "error" not in result and key[1:] == (self.data_version, self.model_version):
+                    self._result_cache[key] = result
+                self._key_locks.pop(key, None)
+            return result
     
+    def append_daily_sales(self, rows, persist=False):
+        """
+        إضافة أيام مبيعات جديدة إلى البيانات المحملة دون إعادة تشغيل الخدمة
+        تُحدّث البيانات المعالجة والحالة التراكمية وآخر تاريخ متاح للأيام الجديدة فقط.
+
+        Args:
+            rows (list): صفوف يومية تحتوي على sale_date, invoices_count,
+                total_quantity, total_discount, total_amount
+            persist (bool): إلحاق الصفوف أيضاً بملفات CSV في مجلد data
+
+        Returns:
+            dict: ملخص الإضافة أو رسالة خطأ
+        """
+        if self.df_original is None or self.df_clean is None or self.feature_state is None:
+            return {"error": "البيانات غير محملة"}
+        if self.sync_workers and not persist:
+            return {"error": "الخدمة تعمل بعدة عمليات: يجب حفظ الأيام المضافة (persist: true) حتى تصل إلى جميع العمليات"}
+
+        if isinstance(rows, dict):
+            rows = [rows]
+        if not isinstance(rows, list) or not rows or not all(isinstance(row, dict) for row in rows):
+            return {"error": "يجب توفير صف واحد على الأقل بصيغة كائن JSON"}
+
+        new_rows = pd.DataFrame(rows)
+        required = ['sale_date'] + METRICS
+        missing = [column for column in required if column not in new_rows.columns]
+        if missing:
+            return {"error": f"حقول مفقودة في البيانات: {missing}"}
+
+        try:
+            new_rows['sale_date'] = pd.to_datetime(new_rows['sale_date']).dt.normalize()
+            for column in METRICS:
+                new_rows[column] = pd.to_numeric(new_rows[column]).astype(float)
+        except (ValueError, TypeError):
+            return {"error": "قيم غير صالحة: يجب أن يكون التاريخ بصيغة YYYY-MM-DD والقيم أرقاماً"}
+
+        if new_rows['sale_date'].isnull().any():
+            return {"error": "صيغة التاريخ غير صحيحة. يرجى استخدام YYYY-MM-DD"}
+        values = new_rows[METRICS]
+        if values.isnull().values.any() or (values < 0).values.any():
+            return {"error": "يجب أن تكون جميع القيم أرقاماً غير سالبة"}
+        counts = new_rows[['total_quantity', 'invoices_count']]
+        if (counts % 1 != 0).values.any():
+            return {"error": "total_quantity و invoices_count يجب أن تكون أعداداً صحيحة"}
+        if new_rows['sale_date'].duplicated().any():
+            return {"error": "توجد تواريخ مكررة في البيانات المرسلة"}
+
+        new_rows = new_rows.sort_values('sale_date').reset_index(drop=True)
+        for column in ['total_quantity', 'invoices_count']:
+            new_rows[column] = new_rows[column].astype('int64')
+        new_rows['day_of_week'] = new_rows['sale_date'].dt.day_name()
+        new_rows = new_rows[self.df_original.columns]
+
+        with self._shared_lock(), self._data_lock:
+            # الأيام التي أضافتها عمليات أخرى أولاً حتى يُتحقق من التواريخ مقابل الملف الحالي
+            self._apply_file_changes()
+            result = self._append_rows(new_rows, persist)
+        if "error" in result:
+            return result
+
+        return {
+            "success": True,
+            "appended_rows": len(new_rows),
+            "processed_rows": result["processed_rows"],
+            "last_available_date": self.last_available_date.strftime('%Y-%m-%d'),
+            "data_version": result["data_version"],
+            "persisted": bool(persist)
+        }
+
+    def _append_rows(self, new_rows, persist):
+        """
+        إضافة صفوف يومية مرتبة بأعمدة df_original (مع قفل البيانات)
+
+        Returns:
+            dict: عدد الصفوف المعالجة ونسخة البيانات أو رسالة خطأ
+        """
+        if new_rows['sale_date'].iloc[0] <= self.last_available_date:
+            return {
+                "error": f"يجب أن تكون جميع التواريخ بعد آخر تاريخ متاح ({self.last_available_date.strftime('%Y-%m-%d')})"
+            }
+
+        try:
+            # حساب الصفوف المعالجة للأيام الجديدة فقط من ذيل السجل
+            history = self.get_history()
+            start = len(history)
+            history = pd.concat([history, new_rows.set_index('sale_date')])
+            processed = materialize_processed(history, start)[self.processed_columns]
+
+            # تحديث نسخة من الحالة التراكمية ثم استبدالها دفعة واحدة
+            state = self.feature_state.copy()
+            for row in zip(new_rows['sale_date'], *(new_rows[m] for m in METRICS)):
+                state.append_day(*row)
+            for sale_date, amount in zip(processed.index, processed['total_amount']):
+                state.add_seasonal_sample(sale_date, amount)
+
+            if persist:
+                # الملف المعالج يُحدَّث بنفس مسار materialize.py: تُعاد كتابة متوسطي الشهر ويوم الأسبوع
+                # لجميع الصفوف (محسوبان على كامل السجل) وتُحدَّث حالته، وليس إلحاق الصفوف الجديدة فقط
+                from materialize import materialize
+                new_rows.to_csv(DAILY_SALES_PATH, mode='a', header=False, index=False, date_format='%Y-%m-%d')
+                materialize(DAILY_SALES_PATH, PROCESSED_DATA_PATH)
+                for path in (DAILY_SALES_PATH, PROCESSED_DATA_PATH):
+                    self._record_file(path)
+
+            self.df_original = compact_frame(pd.concat([self.df_original, new_rows], ignore_index=True))
+            self.df_clean = compact_frame(pd.concat([self.df_clean, processed[self.df_clean.columns]]))
+            self.feature_state = state
+            self.last_available_date = new_rows['sale_date'].iloc[-1]
+            version = self.bump_data_version()
+            self._history = (version, history)
+
+        except Exception as e:
+            return {"error": f"خطأ في إضافة البيانات: {str(e)}"}
+
+        return {"processed_rows": len(processed), "data_version": version}
+
+    def load_series(self, path=None):
+        """تحميل مبيعات المنتجات والفئات اليومية وبناء لوحة السلاسل (إن وجد الملف)"""
+        path = path or SERIES_DATA_PATH
+        state = file_state(path)
+        if state is None:
+            return False
+        try:
+            # الملف يُلحق به عند كل تحديث، فالصف الأخير لكل سلسلة ويوم هو الساري
+            frame = latest_rows(normalize_series_frame(
+                read_csv_cached(path, parse_dates=['sale_date'], dtype={'series_id': str})
+            ))
+            panel = SeriesPanel.from_frame(frame)
+        except Exception as e:
+            print(f"تحذير: تعذر تحميل بيانات السلاسل: {str(e)}")
+            return False
+
+        self.series_frame = frame
+        self.series_panel = panel
+        if path == SERIES_DATA_PATH:
+            self._record_file(path, state)
+        print(f"✓ تم تحميل بيانات السلاسل: {len(panel)} سلسلة حتى {panel.last_date.date()}")
+        return True
+
+    def update_series(self, rows, replace=False, persist=False):
+        """
+        إضافة أو استبدال مبيعات المنتجات والفئات اليومية
+        تُعاد حسابات السلاسل الواردة في الطلب فقط، والصف الأحدث لنفس السلسلة واليوم يستبدل السابق.
+
+        Args:
+            rows: قائمة صفوف أو قاموس أعمدة (series_id, level, sale_date, invoices_count,
+                total_quantity, total_discount, total_amount)
+            replace (bool): استبدال جميع بيانات السلاسل بدلاً من الإضافة إليها
+            persist (bool): إلحاق الصفوف بـ SERIES_DATA_PATH (أو إعادة كتابته عند replace)
+
+        Returns:
+            dict: ملخص التحديث أو رسالة خطأ
+        """
+        if self.sync_workers and not persist:
+            return {"error": "الخدمة تعمل بعدة عمليات: يجب حفظ بيانات السلاسل (persist: true) حتى تصل إلى جميع العمليات"}
+
+        if isinstance(rows, dict):
+            # صيغة عمودية: اسم العمود -> قائمة القيم
+            try:
+                new_rows = pd.DataFrame(rows)
+            except ValueError:
+                return {"error": "يجب أن تكون جميع الأعمدة بنفس الطول"}
+        elif isinstance(rows, list) and rows and all(isinstance(row, dict) for row in rows):
+            new_rows = pd.DataFrame(rows)
+        else:
+            return {"error": "يجب توفير صف واحد على الأقل بصيغة كائن JSON أو أعمدة"}
+
+        try:
+            new_rows = normalize_series_frame(new_rows)
+        except ValueError as e:
+            return {"error": str(e)}
+        if new_rows.empty:
+            return {"error": "لا توجد صفوف في البيانات المرسلة"}
+
+        with self._shared_lock(), self._data_lock:
+            self._apply_file_changes()
+            try:
+                frame, panel = self._merge_series(new_rows, replace)
+
+                if persist and replace:
+                    temp = f'{SERIES_DATA_PATH}.{os.getpid()}.tmp'
+                    frame.to_csv(temp, index=False, date_format='%Y-%m-%d')
+                    os.replace(temp, SERIES_DATA_PATH)
+                elif persist and os.path.exists(SERIES_DATA_PATH):
+                    # الإلحاق بترتيب أعمدة الملف الموجود
+                    header = list(pd.read_csv(SERIES_DATA_PATH, nrows=0).columns)
+                    new_rows[header].to_csv(SERIES_DATA_PATH, mode='a', header=False, index=False, date_format='%Y-%m-%d')
+                elif persist:
+                    new_rows.to_csv(SERIES_DATA_PATH, index=False, date_format='%Y-%m-%d')
+                if persist:
+                    self._record_file(SERIES_DATA_PATH)
+
+                self.series_frame = frame
+                self.series_panel = panel
+                version = self.bump_series_version()
+
+            except Exception as e:
+                return {"error": f"خطأ في تحديث بيانات السلاسل: {str(e)}"}
+
+        return {
+            "success": True,
+            "received_rows": len(new_rows),
+            "series_count": len(panel),
+            "last_date": panel.last_date.strftime('%Y-%m-%d'),
+            "series_version": version,
+            "persisted": bool(persist)
+        }
+
+    def _merge_series(self, new_rows, replace=False):
+        """
+        بيانات السلاسل الطويلة ولوحتها بعد إضافة صفوف (مع قفل البيانات)
+
+        تُجمع صفوف السلاسل الواردة فقط مع صفوفها السابقة وتُعاد حساباتها في اللوحة،
+        وتبقى باقي السلاسل كما هي (تُنقل إلى آخر تاريخ جديد فقط).
+
+        Returns:
+            tuple: (البيانات الطويلة, SeriesPanel)
+        """
+        if self.series_frame is None or replace:
+            frame = latest_rows(new_rows)
+            return frame, SeriesPanel.from_frame(frame)
+
+        current = self.series_frame
+        levels, ids = current['level'].cat.categories, current['series_id'].cat.categories
+        touched = series_codes(new_rows, levels, ids)
+        rows = np.isin(series_codes(current, levels, ids), touched[touched >= 0])
+        updated = latest_rows(concat_series_frames([current[rows], new_rows]))
+        frame = concat_series_frames([current[~rows], updated])
+
+        panel = self.series_panel.with_series(updated)
+        if panel is None:
+            # صفوف قبل بداية المحور المشترك: إعادة البناء الكاملة
+            panel = SeriesPanel.from_frame(frame)
+        return frame, panel
+
+    def is_ready(self):
+        """التحقق من تحميل النموذج والبيانات اللازمة للتنبؤ"""
+        return all([
+            self.model is not None,
+            self.scaler is not None,
+            self.feature_columns is not None and len(self.feature_columns) > 0,
+            self.df_original is not None and not self.df_original.empty,
+            self.last_available_date is not None,
+            self.feature_state is not None,
+        ])
+
+    def get_history(self):
+        """السجل الخام مرتباً ومفهرساً بالتاريخ (يُعاد بناؤه فقط عند تغير نسخة البيانات)"""
+        if self._history is None or self._history[0] != self.data_version:
+            self._history = (self.data_version, prepare_history(self.df_original))
+        return self._history[1]
+
+    def get_date_range(self, start=None, end=None, limit=None, cursor=None):
+        """
+        أيام السجل بين تاريخين بالبحث الثنائي في فهرس التواريخ المرتب (O(log n + k))
+
+        Args:
+            start, end: حدود النطاق شاملة (YYYY-MM-DD، الافتراضي: أول وآخر تاريخ)
+            limit (int): أقصى عدد أيام في الصفحة (None دون حد)
+            cursor: next_cursor من الصفحة السابقة (أول تاريخ في الصفحة التالية)
+
+        Returns:
+            dict: صفوف الصفحة (DataFrame مفهرس بالتاريخ) و next_cursor أو رسالة خطأ
+        """
+        if self.df_original is None:
+            return {"error": "البيانات غير محملة"}
+        if limit is not None and limit < 1:
+            return {"error": "limit يجب أن يكون 1 أو أكثر"}
+
+        try:
+            bounds = [pd.Timestamp(value).normalize() if value else None for value in (start, end, cursor)]
+        except (ValueError, TypeError):
+            return {"error": "صيغة التاريخ غير صحيحة. يرجى استخدام YYYY-MM-DD"}
+        start, end, cursor = bounds
+        if start is not None and end is not None and start > end:
+            return {"error": "تاريخ البداية يجب أن يكون قبل تاريخ النهاية"}
+
+        with metrics.stage('data_slice'):
+            history = self.get_history()
+            dates = history.index.values
+            first = np.searchsorted(dates, start.to_datetime64(), 'left') if start is not None else 0
+            stop = np.searchsorted(dates, end.to_datetime64(), 'right') if end is not None else len(dates)
+            position = max(first, np.searchsorted(dates, cursor.to_datetime64(), 'left')) if cursor is not None else first
+            page_end = stop if limit is None else min(stop, position + limit)
+            rows = history.iloc[position:page_end]
+
+        return {
+            "success": True,
+            "start": start.strftime('%Y-%m-%d') if start is not None else None,
+            "end": end.strftime('%Y-%m-%d') if end is not None else None,
+            "total": int(max(stop - first, 0)),
+            "count": len(rows),
+            "next_cursor": pd.Timestamp(dates[page_end]).strftime('%Y-%m-%d') if page_end < stop else None,
+            "rows": rows
+        }
+
     def create_datetime_features(self, target_date):
         """إنشاء ميزات التاريخ والوقت للتاريخ المحدد"""
-        X_predict = pd.DataFrame(index=[target_date])
-        
-        # ميزات التاريخ والوقت الأساسية
-        X_predict['year'] = X_predict.index.year
-        X_predict['month'] = X_predict.index.month
-        X_predict['day'] = X_predict.index.day
-        X_predict['day_of_week'] = X_predict.index.dayofweek
-        X_predict['day_of_year'] = X_predict.index.dayofyear
-        X_predict['week_of_year'] = X_predict.index.isocalendar().week
-        
-        # ميزات منطقية
-        X_predict['is_weekend'] = X_predict['day_of_week'].isin([5, 6]).astype(int)
-        X_predict['is_month_start'] = X_predict.index.is_month_start.astype(int)
-        X_predict['is_month_end'] = X_predict.index.is_month_end.astype(int)
-        
-        return X_predict
+        return datetime_features([target_date])
     
     def create_lag_features(self, X_predict, target_date):
         """إنشاء ميزات التأخير للتاريخ المحدد"""
-        # إعداد البيانات للحصول على ميزات التأخير
-        data_for_features = self.df_original[self.df_original['sale_date'] <= self.last_available_date].copy()
-        data_for_features['sale_date'] = pd.to_datetime(data_for_features['sale_date'])
-        data_for_features = data_for_features.sort_values('sale_date').reset_index(drop=True)
-        data_for_features.set_index('sale_date', inplace=True)
-        
-        # ميزات تأخير المبيعات
-        for lag in [1, 2, 3, 7, 14, 30]:
-            lag_date = target_date - pd.Timedelta(days=lag)
-            if lag_date in data_for_features.index:
-                X_predict[f'sales_lag_{lag}'] = data_for_features.loc[lag_date, 'total_amount']
-            else:
-                X_predict[f'sales_lag_{lag}'] = np.nan
-        
-        # ميزات تأخير أخرى
-        for lag in [1, 7]:
-            lag_date = target_date - pd.Timedelta(days=lag)
-            if lag_date in data_for_features.index:
-                X_predict[f'quantity_lag_{lag}'] = data_for_features.loc[lag_date, 'total_quantity']
-                X_predict[f'invoices_lag_{lag}'] = data_for_features.loc[lag_date, 'invoices_count']
-                X_predict[f'discount_lag_{lag}'] = data_for_features.loc[lag_date, 'total_discount']
-            else:
-                X_predict[f'quantity_lag_{lag}'] = np.nan
-                X_predict[f'invoices_lag_{lag}'] = np.nan
-                X_predict[f'discount_lag_{lag}'] = np.nan
-        
+        data_for_features = self.get_history()
+        X_predict = X_predict.join(lag_features(data_for_features, X_predict.index))
         return X_predict, data_for_features
     
     def create_rolling_features(self, X_predict, data_for_features):
         """إنشاء ميزات المتوسطات المتحركة"""
-        # ميزات المتوسطات المتحركة للمبيعات
-        for window in [7, 14, 30]:
-            rolling_mean_sales = data_for_features['total_amount'].rolling(window=window).mean().iloc[-1]
-            rolling_std_sales = data_for_features['total_amount'].rolling(window=window).std().iloc[-1]
-            rolling_max_sales = data_for_features['total_amount'].rolling(window=window).max().iloc[-1]
-            rolling_min_sales = data_for_features['total_amount'].rolling(window=window).min().iloc[-1]
-            
-            X_predict[f'rolling_mean_sales_{window}'] = rolling_mean_sales
-            X_predict[f'rolling_std_sales_{window}'] = rolling_std_sales
-            X_predict[f'rolling_max_sales_{window}'] = rolling_max_sales
-            X_predict[f'rolling_min_sales_{window}'] = rolling_min_sales
-        
-        # ميزات المتوسطات المتحركة للكميات والفواتير
-        for window in [7, 14]:
-            rolling_mean_quantity = data_for_features['total_quantity'].rolling(window=window).mean().iloc[-1]
-            rolling_std_quantity = data_for_features['total_quantity'].rolling(window=window).std().iloc[-1]
-            rolling_mean_invoices = data_for_features['invoices_count'].rolling(window=window).mean().iloc[-1]
-            rolling_std_invoices = data_for_features['invoices_count'].rolling(window=window).std().iloc[-1]
-            
-            X_predict[f'rolling_mean_quantity_{window}'] = rolling_mean_quantity
-            X_predict[f'rolling_std_quantity_{window}'] = rolling_std_quantity
-            X_predict[f'rolling_mean_invoices_{window}'] = rolling_mean_invoices
-            X_predict[f'rolling_std_invoices_{window}'] = rolling_std_invoices
-        
-        return X_predict
+        rolling = rolling_features(data_for_features, X_predict.index)
+        return X_predict.join(rolling.drop(columns=['weekly_avg_sales', 'sales_change_pct']))
     
     def create_advanced_features(self, X_predict, data_for_features, target_date):
         """إنشاء الميزات المتقدمة"""
-        # متوسط المبيعات الأسبوعي
-        X_predict['weekly_avg_sales'] = data_for_features['total_amount'].rolling(window=7).mean().iloc[-1]
-        
-        # نسبة التغيير في المبيعات
-        X_predict['sales_change_pct'] = data_for_features['total_amount'].pct_change().iloc[-1]
+        # متوسط المبيعات الأسبوعي ونسبة التغيير في المبيعات
+        rolling = rolling_features(data_for_features, X_predict.index)
+        X_predict = X_predict.join(rolling[['weekly_avg_sales', 'sales_change_pct']])
         
-        # متوسط المبيعات الشهري ومتوسط يوم الأسبوع
-        X_predict['monthly_avg_sales'] = self.df_clean.groupby(self.df_clean.index.month)['total_amount'].mean().loc[target_date.month]
-        X_predict['day_of_week_avg'] = self.df_clean.groupby(self.df_clean.index.dayofweek)['total_amount'].mean().loc[target_date.dayofweek]
+        # متوسط المبيعات الشهري ومتوسط يوم الأسبوع من الحالة التراكمية
+        seasonal = self.feature_state.features_for(target_date)
+        X_predict['monthly_avg_sales'] = seasonal['monthly_avg_sales']
+        X_predict['day_of_week_avg'] = seasonal['day_of_week_avg']
         
         return X_predict
     
-    def predict_next_day_sales(self):
+    def predict_next_day_sales(self, quantiles=None):
         """
         التنبؤ بمبيعات اليوم التالي فقط
-        هذه الدالة تتنبأ باليوم التالي مباشرة بعد آخر تاريخ في البيانات
+        هذه الدالة تتنبأ باليوم التالي مباشرة بعد آخر تاريخ في البيانات.
+        النتيجة تُحسب مرة واحدة لكل نسخة من البيانات ثم تُقرأ من الذاكرة المؤقتة.
+
+        Args:
+            quantiles: مئينات فترة التنبؤ (None للمئينات الافتراضية المحفوظة في الذاكرة المؤقتة)
 
         Returns:
             dict: نتيجة التنبؤ أو رسالة خطأ
         """
-        if not all([
-    self.model is not None,
-    self.scaler is not None,
-    self.feature_columns is not None and len(self.feature_columns) > 0,
-    self.df_original is not None and not self.df_original.empty,
-    self.last_available_date is not None,
-        ]):
-              return {"error": "النموذج غير مهيأ. يرجى تشغيل initialize() أولاً"}
+        if quantiles is None:
+            return dict(self._get_cached('next_day_forecast', self._compute_next_day_forecast))
+        return self._compute_next_day_forecast(quantiles=quantiles)
+
+    def _compute_next_day_forecast(self, artifacts=None, quantiles=DEFAULT_QUANTILES):
+        """حساب تنبؤ اليوم التالي من البيانات الحالية دون المرور بالذاكرة المؤقتة"""
+        artifacts = artifacts or self.artifacts
+        if not self.is_ready():
+            return {"error": "النموذج غير مهيأ. يرجى تشغيل initialize() أولاً"}
         
         # if not all([self.model, self.scaler, self.feature_columns, self.df_original, self.last_available_date]):
         #     return {"error": "النموذج غير مهيأ. يرجى تشغيل initialize() أولاً"}
@@ -208,94 +1016,463 @@ class SalesModelHandler:
         target_date_str = next_date.strftime('%Y-%m-%d')
 
         try:
-            # إعداد البيانات للميزات
-            data_for_features = self.df_original[self.df_original['sale_date'] <= self.last_available_date].copy()
-            data_for_features['sale_date'] = pd.to_datetime(data_for_features['sale_date'])
-            data_for_features = data_for_features.sort_values('sale_date').reset_index(drop=True)
-            data_for_features.set_index('sale_date', inplace=True)
-
-            # إنشاء DataFrame للتاريخ المستهدف
-            X_predict = pd.DataFrame(index=[next_date])
-
-            # إنشاء الميزات الزمنية
-            X_predict['year'] = X_predict.index.year
-            X_predict['month'] = X_predict.index.month
-            X_predict['day'] = X_predict.index.day
-            X_predict['day_of_week'] = X_predict.index.dayofweek
-            X_predict['day_of_year'] = X_predict.index.dayofyear
-            X_predict['week_of_year'] = X_predict.index.isocalendar().week
-            X_predict['is_weekend'] = X_predict['day_of_week'].isin([5, 6]).astype(int)
-            X_predict['is_month_start'] = X_predict.index.is_month_start.astype(int)
-            X_predict['is_month_end'] = X_predict.index.is_month_end.astype(int)
-
-            # إنشاء ميزات التأخير
-            for lag in [1, 2, 3, 7, 14, 30]:
-                lag_date = next_date - pd.Timedelta(days=lag)
-                if lag_date in data_for_features.index:
-                    X_predict[f'sales_lag_{lag}'] = data_for_features.loc[lag_date, 'total_amount']
-                else:
-                    X_predict[f'sales_lag_{lag}'] = np.nan
-
-            for lag in [1, 7]:
-                lag_date = next_date - pd.Timedelta(days=lag)
-                if lag_date in data_for_features.index:
-                    X_predict[f'quantity_lag_{lag}'] = data_for_features.loc[lag_date, 'total_quantity']
-                    X_predict[f'invoices_lag_{lag}'] = data_for_features.loc[lag_date, 'invoices_count']
-                    X_predict[f'discount_lag_{lag}'] = data_for_features.loc[lag_date, 'total_discount']
-                else:
-                    X_predict[f'quantity_lag_{lag}'] = np.nan
-                    X_predict[f'invoices_lag_{lag}'] = np.nan
-                    X_predict[f'discount_lag_{lag}'] = np.nan
-
-            # إنشاء ميزات المتوسطات المتحركة
-            for window in [7, 14, 30]:
-                X_predict[f'rolling_mean_sales_{window}'] = data_for_features['total_amount'].rolling(window=window).mean().iloc[-1]
-                X_predict[f'rolling_std_sales_{window}'] = data_for_features['total_amount'].rolling(window=window).std().iloc[-1]
-                X_predict[f'rolling_max_sales_{window}'] = data_for_features['total_amount'].rolling(window=window).max().iloc[-1]
-                X_predict[f'rolling_min_sales_{window}'] = data_for_features['total_amount'].rolling(window=window).min().iloc[-1]
-
-            for window in [7, 14]:
-                X_predict[f'rolling_mean_quantity_{window}'] = data_for_features['total_quantity'].rolling(window=window).mean().iloc[-1]
-                X_predict[f'rolling_std_quantity_{window}'] = data_for_features['total_quantity'].rolling(window=window).std().iloc[-1]
-                X_predict[f'rolling_mean_invoices_{window}'] = data_for_features['invoices_count'].rolling(window=window).mean().iloc[-1]
-                X_predict[f'rolling_std_invoices_{window}'] = data_for_features['invoices_count'].rolling(window=window).std().iloc[-1]
-
-            # إنشاء الميزات المتقدمة
-            X_predict['weekly_avg_sales'] = data_for_features['total_amount'].rolling(window=7).mean().iloc[-1]
-            X_predict['sales_change_pct'] = data_for_features['total_amount'].pct_change().iloc[-1]
-            X_predict['monthly_avg_sales'] = self.df_clean.groupby(self.df_clean.index.month)['total_amount'].mean().loc[next_date.month]
-            X_predict['day_of_week_avg'] = self.df_clean.groupby(self.df_clean.index.dayofweek)['total_amount'].mean().loc[next_date.dayofweek]
-
-            # ترتيب الميزات حسب القائمة المحفوظة
-            X_predict = X_predict[self.feature_columns]
+            # الميزات تُقرأ من الحالة التراكمية بدلاً من إعادة حسابها على كامل السجل
+            # تُكتب مباشرة في متجه بترتيب القائمة المحفوظة
+            layout = artifacts.layout
+            with metrics.stage('feature_build'):
+                row = self.feature_state.write_features(next_date, layout.new_vector(), layout)
 
             # التحقق من وجود قيم مفقودة
-            if X_predict.isnull().values.any():
-                nan_features = X_predict.columns[X_predict.isnull().any()].tolist()
+            if np.isnan(row).any():
                 return {
-                    "error": f"الميزات للتاريخ {target_date_str} تحتوي على قيم مفقودة: {nan_features}"
+                    "error": f"الميزات للتاريخ {target_date_str} تحتوي على قيم مفقودة: {layout.missing(row)}"
                 }
 
-            # تطبيق التطبيع
-            X_predict_scaled = self.scaler.transform(X_predict)
-
-            # التنبؤ
-            predicted_sales = self.model.predict(X_predict_scaled)[0]
+            # تطبيق التطبيع والتنبؤ مع انتشار مخرجات الأشجار
+            predicted, std, spread = self._score_rows_with_spread(row.reshape(1, -1), artifacts, quantiles)
+            predicted_sales = float(predicted[0])
 
             return {
                 "success": True,
                 "date": target_date_str,
                 "last_available_date": self.last_available_date.strftime('%Y-%m-%d'),
                 "predicted_sales": round(predicted_sales, 2),
+                **self._interval_fields(std, spread, quantiles, 0),
                 "message": f"التنبؤ بمبيعات اليوم التالي ({target_date_str}): {predicted_sales:.2f} ريال"
             }
 
         except Exception as e:
             return {"error": f"خطأ في التنبؤ: {str(e)}"}
     
+    def _score_rows(self, X, artifacts=None):
+        """تطبيق التطبيع ثم التنبؤ لصف واحد أو أكثر بنسخة نموذج واحدة"""
+        artifacts = artifacts or self.artifacts
+        if artifacts.compiled is not None:
+            # التطبيع مدمج في عتبات المحرك المُجمَّع فلا توجد مرحلة scale منفصلة
+            with metrics.stage('predict'):
+                return artifacts.compiled.predict(X)
+        with metrics.stage('scale'):
+            X_scaled = artifacts.scaler.transform(X)
+        with metrics.stage('predict'):
+            return artifacts.model.predict(X_scaled)
+
+    def _score_rows_with_spread(self, X, artifacts=None, quantiles=DEFAULT_QUANTILES):
+        """
+        التنبؤ مع الانحراف المعياري والمئينات من مخرجات جميع أشجار الغابة في تقييم واحد
+
+        التنبؤ هو متوسط الأشجار نفسه فيطابق _score_rows تماماً.
+
+        Returns:
+            tuple: (التنبؤ, الانحراف المعياري, مصفوفة صفوف × مئينات)، والأخيران None لغير الغابات
+        """
+        artifacts = artifacts or self.artifacts
+        if artifacts.compiled is not None:
+            with metrics.stage('predict'):
+                return tree_spread(artifacts.compiled.predict_trees(X), quantiles)
+        if not is_supported(artifacts.model):
+            return self._score_rows(X, artifacts), None, None
+        with metrics.stage('scale'):
+            X_scaled = artifacts.scaler.transform(X)
+        with metrics.stage('predict'):
+            tree_values = np.column_stack([tree.predict(X_scaled) for tree in artifacts.model.estimators_])
+            return tree_spread(tree_values, quantiles)
+
+    @staticmethod
+    def _interval_fields(std, spread, quantiles, position):
+        """حقول فترة التنبؤ لصف واحد (None إذا لم تتوفر مخرجات الأشجار)"""
+        if std is None:
+            return {"prediction_std": None, "prediction_quantiles": None}
+        return {
+            "prediction_std": round(float(std[position]), 2),
+            "prediction_quantiles": {
+                f'{q:g}': round(float(value), 2) for q, value in zip(quantiles, spread[position])
+            }
+        }
+
+    def predict_sales_horizon(self, days):
+        """
+        التنبؤ المتسلسل لعدة أيام بعد آخر تاريخ متاح
+        كل تنبؤ يُضاف إلى نسخة من الحالة التراكمية ليغذي ميزات التأخير والمتوسطات
+        المتحركة لليوم الذي يليه، دون إعادة بناء أي DataFrame للسجل.
+
+        Args:
+            days (int): عدد الأيام المطلوب التنبؤ بها
+
+        Returns:
+            dict: التنبؤ لكل يوم أو رسالة خطأ
+        """
+        if not self.is_ready():
+            return {"error": "النموذج غير مهيأ. يرجى تشغيل initialize() أولاً"}
+
+        if days < 1 or days > MAX_HORIZON_DAYS:
+            return {"error": f"عدد الأيام يجب أن يكون بين 1 و {MAX_HORIZON_DAYS}"}
+
+        try:
+            # الطلب يكمل بنفس نسخة النموذج حتى لو أعيد تحميله أثناء التنفيذ
+            artifacts = self.artifacts
+            layout = artifacts.layout
+            with metrics.stage('data_slice'):
+                state = self.feature_state.copy()
+            vector = layout.new_vector()
+            predictions = []
+
+            for _ in range(days):
+                target_date = state.last_date + pd.Timedelta(days=1)
+                target_date_str = target_date.strftime('%Y-%m-%d')
+                with metrics.stage('feature_build'):
+                    row = state.write_features(target_date, vector, layout)
+
+                if np.isnan(row).any():
+                    return {
+                        "error": f"الميزات للتاريخ {target_date_str} تحتوي على قيم مفقودة: {layout.missing(row)}"
+                    }
+
+                predicted_sales = float(self._score_rows(row.reshape(1, -1), artifacts)[0])
+                state.project_day(target_date, predicted_sales)
+                predictions.append({"date": target_date_str, "predicted_sales": round(predicted_sales, 2)})
+
+            return {
+                "success": True,
+                "last_available_date": self.last_available_date.strftime('%Y-%m-%d'),
+                "start_date": predictions[0]["date"],
+                "end_date": predictions[-1]["date"],
+                "days": days,
+                "total_predicted_sales": round(sum(p["predicted_sales"] for p in predictions), 2),
+                "predictions": predictions
+            }
+
+        except Exception as e:
+            return {"error": f"خطأ في التنبؤ: {str(e)}"}
+
+    def predict_sales_batch(self, target_dates, quantiles=None):
+        """
+        التنبؤ بالمبيعات لمجموعة تواريخ دفعة واحدة
+        لكل تاريخ تُستخدم فقط البيانات السابقة له، وتُقيّم جميع الصفوف باستدعاء واحد للنموذج.
+
+        Args:
+            target_dates (list): قائمة التواريخ بصيغة YYYY-MM-DD
+            quantiles: مئينات فترة التنبؤ لكل تاريخ (None للافتراضية)
+
+        Returns:
+            dict: التنبؤات لكل تاريخ أو رسالة خطأ
+        """
+        if not self.is_ready():
+            return {"error": "النموذج غير مهيأ. يرجى تشغيل initialize() أولاً"}
+
+        if not target_dates:
+            return {"error": "يجب توفير تاريخ واحد على الأقل"}
+
+        if len(target_dates) > MAX_BATCH_DATES:
+            return {"error": f"عدد التواريخ يتجاوز الحد المسموح ({MAX_BATCH_DATES})"}
+
+        try:
+            dates = pd.DatetimeIndex(pd.to_datetime(target_dates)).normalize()
+        except (ValueError, TypeError):
+            return {"error": "صيغة التاريخ غير صحيحة. يرجى استخدام YYYY-MM-DD"}
+        # التواريخ الفارغة (null أو "") تصبح NaT دون خطأ
+        if dates.hasnans:
+            return {"error": "صيغة التاريخ غير صحيحة. يرجى استخدام YYYY-MM-DD"}
+
+        quantiles = DEFAULT_QUANTILES if quantiles is None else quantiles
+        try:
+            artifacts = self.artifacts
+            with metrics.stage('data_slice'):
+                history = self.get_history()
+            with metrics.stage('feature_build'):
+                X_batch = build_feature_frame(history, self.df_clean, dates, artifacts.feature_columns)
+
+                # الصفوف التي لا تتوفر لها بيانات تاريخية كافية تُستبعد من التقييم
+                valid = ~np.isnan(X_batch.to_numpy()).any(axis=1)
+            predictions = np.full(len(dates), np.nan)
+            std = spread = None
+            if valid.any():
+                predictions[valid], std, spread = self._score_rows_with_spread(X_batch[valid], artifacts, quantiles)
+
+            results = []
+            # موضع الصف بين الصفوف المُقيَّمة (لمصفوفتي الانحراف والمئينات)
+            positions = np.cumsum(valid) - 1
+            for date_str, is_valid, value, position in zip(dates.strftime('%Y-%m-%d'), valid, predictions, positions):
+                if is_valid:
+                    results.append({
+                        "date": date_str,
+                        "predicted_sales": round(float(value), 2),
+                        **self._interval_fields(std, spread, quantiles, position)
+                    })
+                else:
+                    results.append({
+                        "date": date_str,
+                        "error": "الميزات تحتوي على قيم مفقودة (لا تتوفر بيانات تاريخية كافية لهذا التاريخ)"
+                    })
+
+            return {
+                "success": True,
+                "last_available_date": self.last_available_date.strftime('%Y-%m-%d'),
+                "count": len(results),
+                "predicted_count": int(valid.sum()),
+                "predictions": results
+            }
+
+        except Exception as e:
+            return {"error": f"خطأ في التنبؤ: {str(e)}"}
+
+    def predict_scenarios(self, columns, count=None):
+        """
+        تقييم سيناريوهات "ماذا لو" لليوم التالي دفعة واحدة
+        كل سيناريو صف ميزات جزئي: الميزات غير المرسلة تأخذ قيمها من الحالة الحالية لليوم التالي،
+        ويُتحقق من جميع الأعمدة معاً ثم تُقيّم جميع الصفوف (مع صف الحالة الحالية) باستدعاء واحد للنموذج.
+
+        Args:
+            columns (dict): اسم الميزة -> قائمة قيم (قيمة لكل سيناريو) أو قيمة واحدة لجميع السيناريوهات
+            count (int): عدد السيناريوهات (يُستنتج من أطوال القوائم إذا لم يُحدد)
+
+        Returns:
+            dict: تنبؤ كل سيناريو (مصفوفة بنفس ترتيب القيم) أو رسالة خطأ
+        """
+        if not self.is_ready():
+            return {"error": "النموذج غير مهيأ. يرجى تشغيل initialize() أولاً"}
+
+        artifacts = self.artifacts
+        layout = artifacts.layout
+        positions = {name: i for i, name in enumerate(layout.columns)}
+
+        unknown = [name for name in columns if name not in positions]
+        if unknown:
+            return {"error": f"ميزات غير معروفة للنموذج: {unknown}"}
+
+        lengths = {len(values) for values in columns.values() if isinstance(values, list)}
+        if len(lengths) > 1 or (count is not None and lengths and lengths != {count}):
+            return {"error": "جميع قوائم القيم يجب أن تكون بنفس الطول (عدد السيناريوهات)"}
+        if count is None:
+            count = lengths.pop() if lengths else 1
+        if count < 1 or count > MAX_SCENARIOS:
+            return {"error": f"عدد السيناريوهات يجب أن يكون بين 1 و {MAX_SCENARIOS}"}
+
+        next_date = self.last_available_date + pd.Timedelta(days=1)
+
+        try:
+            with metrics.stage('feature_build'):
+                base = self.feature_state.write_features(next_date, layout.new_vector(), layout)
+
+                # الصف الأخير هو الحالة الحالية دون تعديل (للمقارنة مع كل سيناريو)
+                X = np.empty((count + 1, layout.size))
+                X[:] = base
+                invalid = {}
+                for name, values in columns.items():
+                    try:
+                        values = np.asarray(values, dtype=np.float64)
+                    except (ValueError, TypeError):
+                        invalid[name] = "قيم غير رقمية"
+                        continue
+                    if values.ndim > 1:
+                        invalid[name] = "قيم متداخلة"
+                        continue
+                    bad = int(values.size - np.isfinite(values).sum())
+                    if bad:
+                        invalid[name] = f"{bad} قيمة مفقودة أو غير منتهية"
+                        continue
+                    X[:count, positions[name]] = values
+
+            if invalid:
+                return {"error": f"قيم غير صالحة في الميزات: {invalid}"}
+
+            # الميزات التي لم تُرسل ولا تتوفر لها قيمة من الحالة الحالية
+            missing = [name for name in layout.missing(base) if name not in columns]
+            if missing:
+                return {"error": f"الميزات {missing} غير متوفرة في الحالة الحالية ويجب إرسالها"}
+
+            predictions = self._score_rows(X, artifacts)
+
+            return {
+                "success": True,
+                "date": next_date.strftime('%Y-%m-%d'),
+                "last_available_date": self.last_available_date.strftime('%Y-%m-%d'),
+                "count": count,
+                "overridden_features": list(columns),
+                "baseline_predicted_sales": round(float(predictions[-1]), 2),
+                "predicted_sales": np.round(predictions[:count], 2)
+            }
+
+        except Exception as e:
+            return {"error": f"خطأ في التنبؤ: {str(e)}"}
+
+    def predict_series(self, level=None, series_ids=None, page=1, page_size=100):
+        """
+        التنبؤ بمبيعات اليوم التالي لكل منتج أو فئة مع التقسيم إلى صفحات
+        تُقيَّم جميع السلاسل باستدعاء واحد للنموذج مرة واحدة لكل نسخة من البيانات والنموذج،
+        ثم تُقرأ الصفحات من النتيجة المخزنة.
+
+        Args:
+            level: 'product' أو 'category' (None لجميع السلاسل)
+            series_ids: قائمة معرفات سلاسل محددة (اختياري)
+            page (int): رقم الصفحة (يبدأ من 1)
+            page_size (int): عدد السلاسل في الصفحة
+
+        Returns:
+            dict: تنبؤات الصفحة أو رسالة خطأ
+        """
+        if self.series_panel is None:
+            return {"error": f"بيانات السلاسل غير محملة (ملف {SERIES_DATA_PATH} أو POST /api/data/series)"}
+        if page < 1 or page_size < 1 or page_size > MAX_SERIES_PAGE_SIZE:
+            return {"error": f"رقم الصفحة يجب أن يكون 1 أو أكثر وحجمها بين 1 و {MAX_SERIES_PAGE_SIZE}"}
+
+        forecast = self._get_cached(('series_forecast', self.series_version), self._compute_series_forecast)
+        if "error" in forecast:
+            return forecast
+
+        selected = np.ones(len(forecast["series_ids"]), dtype=bool)
+        if level is not None:
+            selected &= forecast["levels"] == level
+        if series_ids:
+            selected &= np.isin(forecast["series_ids"], [str(i) for i in series_ids])
+        positions = np.flatnonzero(selected)
+        page_positions = positions[(page - 1) * page_size:page * page_size]
+
+        predictions = []
+        for i in page_positions:
+            item = {"series_id": forecast["series_ids"][i], "level": forecast["levels"][i]}
+            value = forecast["predicted"][i]
+            if np.isnan(value):
+                item["error"] = forecast["errors"][i]
+            else:
+                item["predicted_sales"] = round(float(value), 2)
+            predictions.append(item)
+
+        return {
+            "success": True,
+            "date": forecast["date"],
+            "last_available_date": forecast["last_available_date"],
+            "level": level,
+            "total": len(positions),
+            "predicted_count": int(np.count_nonzero(~np.isnan(forecast["predicted"][positions]))),
+            "page": page,
+            "page_size": page_size,
+            "pages": (len(positions) + page_size - 1) // page_size,
+            "predictions": predictions
+        }
+
+    def _compute_series_forecast(self, artifacts=None):
+        """تنبؤ اليوم التالي لجميع السلاسل في تمريرة ميزات واحدة واستدعاء واحد للنموذج"""
+        artifacts = artifacts or self.artifacts
+        panel = self.series_panel
+        if not self.is_ready() or panel is None:
+            return {"error": "النموذج غير مهيأ. يرجى تشغيل initialize() أولاً"}
+
+        try:
+            layout = artifacts.layout
+            with metrics.stage('feature_build'):
+                # مستوى المتجر المرجعي الذي دُرّب عليه النموذج
+                reference = self.df_original[METRICS].mean()
+                features = panel.feature_matrix()
+                factors, sales_factor = panel.scale_factors(reference)
+                X = layout.new_matrix(len(panel))
+                X[:, layout.slots] = features * factors
+                X = X[:, :layout.size]
+
+                has_history = ~np.isnan(X).any(axis=1)
+                has_sales = np.isfinite(sales_factor)
+                valid = has_history & has_sales
+
+            predicted = np.full(len(panel), np.nan)
+            if valid.any():
+                predicted[valid] = self._score_rows(X[valid], artifacts) / sales_factor[valid]
+
+            errors = np.where(
+                has_sales,
+                "الميزات تحتوي على قيم مفقودة (لا تتوفر بيانات تاريخية كافية لهذه السلسلة)",
+                "لا توجد مبيعات في سجل هذه السلسلة"
+            ).astype(object)
+            errors[valid] = None
+
+            return {
+                "success": True,
+                "date": panel.next_date.strftime('%Y-%m-%d'),
+                "last_available_date": panel.last_date.strftime('%Y-%m-%d'),
+                "levels": panel.keys.get_level_values(0).to_numpy(dtype=object),
+                "series_ids": panel.keys.get_level_values(1).to_numpy(dtype=object),
+                "predicted": predicted,
+                "errors": errors
+            }
+
+        except Exception as e:
+            return {"error": f"خطأ في التنبؤ: {str(e)}"}
+
+    def get_data_summary(self):
+        """
+        ملخص البيانات ومتوسطات آخر 7/30/365 يوماً
+        يُحسب مرة واحدة لكل نسخة من البيانات ثم يُقرأ من الذاكرة المؤقتة.
+
+        Returns:
+            dict: الملخص والمتوسطات أو رسالة خطأ
+        """
+        return self._get_cached('data_summary', self._compute_data_summary)
+
+    def _compute_data_summary(self):
+        """حساب ملخص البيانات من df_original"""
+        if self.df_original is None or self.df_original.empty:
+            return {"error": "البيانات غير محملة"}
+
+        df = self.df_original
+        dates = df['sale_date']
+        amounts = df['total_amount']
+
+        # متوسط المبيعات اليومية خلال آخر N يوماً حتى آخر تاريخ متاح
+        recent_averages = {}
+        for name, days in [("last_week_average", 7), ("last_month_average", 30), ("last_year_average", 365)]:
+            window = amounts[dates > self.last_available_date - pd.Timedelta(days=days)]
+            recent_averages[name] = float(window.mean()) if not window.empty else None
+
+        return {
+            "total_records": len(df),
+            "date_range": {
+                "start": dates.min().strftime('%Y-%m-%d'),
+                "end": dates.max().strftime('%Y-%m-%d')
+            },
+            "sales_stats": {
+                "total_sales": float(amounts.sum()),
+                "average_daily_sales": float(amounts.mean()),
+                "max_daily_sales": float(amounts.max()),
+                "min_daily_sales": float(amounts.min())
+            },
+            "quantity_stats": {
+                "total_quantity": int(df['total_quantity'].sum()),
+                "average_daily_quantity": float(df['total_quantity'].mean())
+            },
+            "invoice_stats": {
+                "total_invoices": int(df['invoices_count'].sum()),
+                "average_daily_invoices": float(df['invoices_count'].mean())
+            },
+            "last_day_sales": float(amounts.iloc[dates.to_numpy().argmax()]),
+            "recent_averages": recent_averages
+        }
+
+    def get_prediction_bundle(self):
+        """
+        تنبؤ اليوم التالي مع ملخص البيانات والمتوسطات الحديثة في نتيجة واحدة
+
+        Returns:
+            dict: التنبؤ والملخص أو رسالة خطأ
+        """
+        prediction = self.predict_next_day_sales()
+        if "error" in prediction:
+            return prediction
+
+        summary = self.get_data_summary()
+        if "error" in summary:
+            return summary
+
+        return {
+            "success": True,
+            "data_version": self.data_version,
+            "prediction": prediction,
+            "recent_averages": summary["recent_averages"],
+            "last_day_sales": summary["last_day_sales"],
+            "summary": summary
+        }
+
     def get_model_info(self):
         """الحصول على معلومات النموذج"""
-        if not self.model:
+        artifacts = self.artifacts
+        if artifacts is None:
             return {"error": "النموذج غير محمل"}
 
         next_date = None
@@ -303,13 +1480,62 @@ class SalesModelHandler:
             next_date = (self.last_available_date + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
 
         return {
-            "model_type": type(self.model).__name__,
-            "features_count": len(self.feature_columns) if self.feature_columns else 0,
+            "model_type": getattr(artifacts.model, 'source_type', type(artifacts.model).__name__),
+            "shared_model": isinstance(artifacts.model, SharedForest),
+            "inference_engine": self._inference_engine(artifacts),
+            "prediction_intervals": artifacts.compiled is not None or is_supported(artifacts.model),
+            "prediction_quantiles": list(DEFAULT_QUANTILES),
+            "features_count": len(artifacts.feature_columns),
             "last_available_date": self.last_available_date.strftime('%Y-%m-%d') if self.last_available_date else None,
             "next_prediction_date": next_date,
             "prediction_note": "يمكن التنبؤ فقط باليوم التالي مباشرة بعد آخر تاريخ في البيانات",
-            "data_range_days": len(self.df_original) if self.df_original is not None else 0
+            "data_range_days": len(self.df_original) if self.df_original is not None else 0,
+            "data_version": self.data_version,
+            "series_version": self.series_version,
+            "model_version": artifacts.version,
+            "model_file": artifacts.model_file,
+            "model_loaded_at": artifacts.loaded_at.isoformat()
         }
 
+    @staticmethod
+    def _inference_engine(artifacts):
+        if artifacts.compiled is None:
+            return "sklearn"
+        return "compiled-numba" if artifacts.compiled.uses_numba else "compiled-numpy"
+
+    def get_data_memory(self):
+        """
+        حجم جداول البيانات المحملة في الذاكرة لكل جدول وعمود
+
+        Returns:
+            dict: الحجم الكلي وتفاصيل كل جدول أو رسالة خطأ
+        """
+        if self.df_original is None or self.df_clean is None:
+            return {"error": "البيانات غير محملة"}
+
+        frames = {"df_original": self.df_original, "df_clean": self.df_clean}
+        history = self._history
+        if history is not None and history[0] == self.data_version:
+            frames["history"] = history[1]
+        if self.series_frame is not None:
+            frames["series_frame"] = self.series_frame
+
+        report = {name: frame_memory(frame) for name, frame in frames.items()}
+        return {
+            "success": True,
+            "data_version": self.data_version,
+            "total_bytes": sum(frame["bytes"] for frame in report.values()),
+            "frames": report
+        }
+
+    def get_memory_report(self):
+        """تقرير ذاكرة العملية الحالية مع حجم أشجار النموذج المشتركة"""
+        model = self.model
+        shared = isinstance(model, SharedForest)
+        report = memory_report(model.path if shared else None)
+        report["shared_model"] = shared
+        report["model_arrays_bytes"] = model.nbytes if shared else None
+        return report
+
 # إنشاء مثيل عام للاستخدام
 sales_model = SalesModelHandler()
@@ -94,12 +94,13 @@ def train_model():
     print("📊 هذا قد يستغرق بضع دقائق...")
     
     try:
-        # تشغيل notebook لتدريب النموذج
+        # نفس خطوات modelAI/sales_model.ipynb (انظر train.py)
         print("🔄 تشغيل عملية التدريب...")
-        
-        # يمكن إضافة كود لتشغيل الـ notebook هنا
-        # أو تشغيل سكريبت Python منفصل
-        
+        from train import main as train_main
+        if train_main([]) != 0:
+            print("❌ فشل في تدريب النموذج")
+            return False
+
         print("✅ تم تدريب النموذج بنجاح")
         return True
     except Exception as e:
@@ -119,8 +120,8 @@ def start_api():
     print("=" * 50)
     
     try:
-        from api import app
-        app.run(debug=True, host='0.0.0.0', port=5000)
+        from serve import main as serve_main
+        serve_main(argv=[])
     except ImportError:
         print("❌ خطأ: لا يمكن استيراد API")
         print("💡 تأكد من وجود ملف api.py")
@@ -153,12 +154,13 @@ def main():
     print("\n🔍 فحص ملفات النموذج...")
     if not check_model_files():
         print("⚠️  يجب تدريب النموذج أولاً")
-        print("📝 يرجى تشغيل sales_model.ipynb لتدريب النموذج")
-        
-        response = input("\n❓ هل تريد المتابعة بدون النموذج؟ (y/n): ")
-        if response.lower() != 'y':
-            print("🛑 تم إيقاف التشغيل")
-            return
+
+        response = input("\n❓ هل تريد تدريب النموذج الآن؟ (y/n): ")
+        if response.lower() != 'y' or not train_model():
+            response = input("\n❓ هل تريد المتابعة بدون النموذج؟ (y/n): ")
+            if response.lower() != 'y':
+                print("🛑 تم إيقاف التشغيل")
+                return
     
     # تشغيل API
     print("\n🚀 تشغيل النظام...")
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تحويل الجداول إلى JSON بشكل عمودي
+Columnar JSON Serialization
+
+يُحوَّل كل عمود دفعة واحدة (تنسيق التواريخ وتحويل الأنواع وترميز القيم)
+ثم تُدمج الأعمدة في مصفوفة سجلات JSON دون المرور على الصفوف في Python.
+يُستخدم orjson عند توفره، وإلا يُستخدم json القياسي.
+"""
+
+import json
+import zlib
+
+import numpy as np
+import pandas as pd
+from flask import Response
+
+try:
+    import orjson
+except ImportError:  # orjson اختياري
+    orjson = None
+
+# تهريب الأحرف الخاصة في النصوص حسب مواصفة JSON
+_ESCAPES = {ord('"'): '\\"', ord('\\'): '\\\\'}
+_ESCAPES.update({code: f'\\u{code:04x}' for code in range(32)})
+
+
+def dumps(value):
+    """ترميز قيمة إلى JSON كـ bytes"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def _default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"لا يمكن تحويل {type(value).__name__} إلى JSON")
+
+
+def _number_tokens(values, kind):
+    """ترميز عمود رقمي كاملاً ثم تقسيمه إلى قيم (لا تحتوي الأرقام على فواصل)"""
+    if kind == 'int':
+        array = np.asarray(values).astype(np.int64)
+    else:
+        array = np.asarray(values, dtype=np.float64)
+    if len(array) == 0:
+        return []
+    # orjson يرمّز NaN واللانهاية كـ null، أما json القياسي فيحتاج تحويلها يدوياً
+    if orjson is None:
+        if kind != 'int' and not np.isfinite(array).all():
+            array = np.where(np.isfinite(array), array, None)
+        array = array.tolist()
+    return dumps(array)[1:-1].split(b',')
+
+
+def _date_bytes(values):
+    """تواريخ بصيغة YYYY-MM-DD كمصفوفة bytes"""
+    days = pd.DatetimeIndex(values).to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+    return days.astype('S10')
+
+
+def _text_tokens(values, kind):
+    """ترميز عمود تواريخ أو نصوص كقيم JSON بين علامتي تنصيص"""
+    if kind == 'date':
+        return np.char.add(np.char.add(b'"', _date_bytes(values)), b'"')
+    text = pd.Series(pd.Index(values).astype(str)).str.translate(_ESCAPES)
+    return ('"' + text + '"').str.encode('utf-8').to_numpy()
+
+
+def records_json(fields, length):
+    """
+    بناء مصفوفة سجلات JSON من أعمدة
+
+    Args:
+        fields: قائمة (المفتاح, النوع, القيم) والنوع أحد 'date' أو 'text' أو 'int' أو 'float'
+        length: عدد السجلات
+
+    Returns:
+        bytes: مصفوفة JSON بالشكل [{"key": value, ...}, ...]
+    """
+    if length == 0:
+        return b'[]'
+    grid = _record_grid(fields, length, b'},')
+    grid[-1, -1] = b'}'
+    return b'[' + b''.join(grid.ravel().tolist()) + b']'
+
+
+def ndjson_lines(fields, length):
+    """
+    سجلات JSON مفصولة بأسطر (NDJSON) من أعمدة، بنفس مدخلات records_json
+
+    Returns:
+        bytes: سطر لكل سجل ينتهي بـ \n
+    """
+    if length == 0:
+        return b''
+    return b''.join(_record_grid(fields, length, b'}\n').ravel().tolist())
+
+
+def csv_lines(fields, length, header=True):
+    """
+    أسطر CSV من أعمدة بنفس مدخلات records_json (القيم المفقودة حقول فارغة)
+
+    Returns:
+        bytes: سطر العناوين (اختياري) ثم سطر لكل سجل
+    """
+    head = b','.join(_csv_text([key for key, _, _ in fields])) + b'\n' if header else b''
+    if length == 0:
+        return head
+    grid = np.empty((length, 2 * len(fields)), dtype=object)
+    for i, (key, kind, values) in enumerate(fields):
+        if kind == 'date':
+            grid[:, 2 * i] = _date_bytes(values)
+        elif kind == 'text':
+            grid[:, 2 * i] = _csv_text(values)
+        else:
+            tokens = np.array(_number_tokens(values, kind), dtype=object)
+            tokens[tokens == b'null'] = b''
+            grid[:, 2 * i] = tokens
+        grid[:, 2 * i + 1] = b','
+    grid[:, -1] = b'\n'
+    return head + b''.join(grid.ravel().tolist())
+
+
+def _csv_text(values):
+    """نصوص CSV بترميز UTF-8، وتُحاط بعلامتي تنصيص فقط عند احتوائها على فاصلة أو تنصيص أو سطر جديد"""
+    text = pd.Series(pd.Index(values).astype(str))
+    special = text.str.contains('[",\r\n]', regex=True)
+    if special.any():
+        text = text.where(~special, '"' + text.str.replace('"', '""', regex=False) + '"')
+    return text.str.encode('utf-8').to_numpy()
+
+
+def _record_grid(fields, length, record_end):
+    # كل سجل = جزء ثابت (المفتاح) ثم القيمة لكل عمود، ويُغلق السجل في العمود الأخير
+    grid = np.empty((length, 2 * len(fields) + 1), dtype=object)
+    for i, (key, kind, values) in enumerate(fields):
+        grid[:, 2 * i] = (b'{' if i == 0 else b',') + dumps(key) + b':'
+        if kind in ('date', 'text'):
+            grid[:, 2 * i + 1] = _text_tokens(values, kind)
+        else:
+            grid[:, 2 * i + 1] = _number_tokens(values, kind)
+    grid[:, -1] = record_end
+    return grid
+
+
+def object_json(members):
+    """دمج أجزاء JSON جاهزة (bytes) في كائن واحد"""
+    return b'{' + b','.join(dumps(key) + b':' + value for key, value in members.items()) + b'}'
+
+
+def success_response(data_json, status=200):
+    """استجابة {"success": true, "data": ...} من بيانات مرمَّزة مسبقاً"""
+    body = b'{"success":true,"data":' + data_json + b'}'
+    return Response(body, status=status, mimetype='application/json')
+
+
+def gzip_chunks(chunks, level=6):
+    """ضغط أجزاء متتالية بصيغة gzip أثناء التدفق (لا يُجمع الجسم كاملاً في الذاكرة)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_response(chunks, mimetype, compress=False, headers=None):
+    """
+    استجابة متدفقة من مولد أجزاء bytes
+
+    Args:
+        chunks: مولد يُنتج أجزاء الجسم بالترتيب
+        mimetype: نوع المحتوى
+        compress (bool): ضغط الجسم بـ gzip (عندما يقبله العميل)
+        headers (dict): ترويسات إضافية
+    """
+    response = Response(gzip_chunks(chunks) if compress else chunks, mimetype=mimetype, headers=headers)
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
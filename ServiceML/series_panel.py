@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+التنبؤ لسلاسل متعددة (منتجات وفئات) دفعة واحدة
+Multi-Series Panel Forecasting
+
+تُحفظ جميع السلاسل اليومية في مصفوفات عمودية (سلسلة × يوم) على محور تواريخ مشترك:
+آخر أيام النافذة لميزات التأخير والمتوسطات المتحركة، ومجاميع الشهر ويوم الأسبوع لكل سلسلة.
+تُبنى ميزات اليوم التالي لجميع السلاسل في تمريرة متجهة واحدة بنفس ترتيب FEATURE_NAMES.
+
+النموذج مدرب على مبيعات المتجر الكاملة، لذلك تُطبَّع كل سلسلة إلى مستوى المتجر
+(نسبة متوسط المتجر إلى متوسط السلسلة لكل مقياس) قبل التقييم ثم يُعاد التنبؤ إلى مستواها.
+اليوم الذي لا توجد له مبيعات لسلسلة ما يُعتبر صفراً، أما الأيام قبل أول مبيعات لها فغير معروفة.
+
+عند تحديث بعض السلاسل تُعاد حسابات هذه السلاسل فقط من صفوفها (with_series)، وتُنقل باقي السلاسل
+إلى آخر تاريخ جديد بإزاحة نوافذها وإضافة أيام المحور الجديدة إلى أعداد الشهر ويوم الأسبوع.
+"""
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from feature_state import (
+    FEATURE_NAMES, METRICS, SALES_LAGS, OTHER_LAGS, SALES_WINDOWS, OTHER_WINDOWS,
+    MAX_LAG, MAX_WINDOW, calendar_values
+)
+
+# مستويات السلاسل المدعومة
+SERIES_LEVELS = ('product', 'category')
+
+# الأعمدة المطلوبة في البيانات الطويلة (صف لكل سلسلة ويوم)
+SERIES_COLUMNS = ['series_id', 'level', 'sale_date'] + METRICS
+
+# عدد الأيام الأخيرة المحفوظة لكل سلسلة
+WINDOW_DAYS = max(MAX_LAG, MAX_WINDOW)
+
+# موقع كل ميزة في مصفوفة FEATURE_NAMES
+_POSITION = {name: i for i, name in enumerate(FEATURE_NAMES)}
+
+# المقياس الذي تُطبَّع به كل ميزة (None للميزات غير المرتبطة بمستوى السلسلة)
+_FEATURE_METRIC = {}
+for _name in FEATURE_NAMES:
+    if 'sales' in _name or _name == 'day_of_week_avg':
+        _FEATURE_METRIC[_name] = 'total_amount'
+    elif 'quantity' in _name:
+        _FEATURE_METRIC[_name] = 'total_quantity'
+    elif 'invoices' in _name:
+        _FEATURE_METRIC[_name] = 'invoices_count'
+    elif 'discount' in _name:
+        _FEATURE_METRIC[_name] = 'total_discount'
+# نسبة التغيير لا تتأثر بمستوى السلسلة
+_FEATURE_METRIC['sales_change_pct'] = None
+
+
+def _categorical(values, lower=False):
+    """عمود معرفات كـ category بفئات نصية مرتبة (التحويل إلى نص للقيم المميزة فقط)"""
+    codes, uniques = pd.factorize(values)
+    text = pd.Index(uniques).astype(str)
+    if lower:
+        text = text.str.lower()
+    text_codes, categories = pd.factorize(text, sort=True)
+    return pd.Categorical.from_codes(np.where(codes >= 0, text_codes[codes], -1), categories=categories)
+
+
+def normalize_series_frame(frame):
+    """
+    التحقق من البيانات الطويلة للسلاسل وتوحيد أنواعها
+
+    Returns:
+        DataFrame بالأعمدة SERIES_COLUMNS
+
+    Raises:
+        ValueError: عند نقص الأعمدة أو وجود قيم غير صالحة
+    """
+    missing = [column for column in SERIES_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ValueError(f"حقول مفقودة في بيانات السلاسل: {missing}")
+
+    frame = frame[SERIES_COLUMNS].copy()
+    frame['series_id'] = _categorical(frame['series_id'])
+    frame['level'] = _categorical(frame['level'], lower=True)
+    if frame['series_id'].isnull().any() or frame['level'].isnull().any():
+        raise ValueError("series_id و level مطلوبان لكل صف")
+    unknown = sorted(set(frame['level'].cat.categories) - set(SERIES_LEVELS))
+    if unknown:
+        raise ValueError(f"مستويات غير مدعومة: {unknown} (المسموح: {list(SERIES_LEVELS)})")
+
+    try:
+        frame['sale_date'] = pd.to_datetime(frame['sale_date']).dt.normalize()
+        for column in METRICS:
+            frame[column] = pd.to_numeric(frame[column]).astype(float)
+    except (ValueError, TypeError):
+        raise ValueError("قيم غير صالحة: يجب أن يكون التاريخ بصيغة YYYY-MM-DD والقيم أرقاماً")
+
+    values = frame[METRICS]
+    if values.isnull().values.any() or (values < 0).values.any():
+        raise ValueError("يجب أن تكون جميع القيم أرقاماً غير سالبة")
+    return frame
+
+
+def series_codes(frame, levels, ids):
+    """
+    رقم (المستوى, المعرف) لكل صف بدلالة فئات محددة (-1 للأزواج غير الموجودة فيها)
+
+    Args:
+        frame: بيانات طويلة بعد normalize_series_frame
+        levels, ids: فئات المستوى والمعرف المرجعية
+    """
+    level = levels.get_indexer(frame['level'].cat.categories)[frame['level'].cat.codes.to_numpy()]
+    series = ids.get_indexer(frame['series_id'].cat.categories)[frame['series_id'].cat.codes.to_numpy()]
+    return np.where((level >= 0) & (series >= 0), level.astype(np.int64) * len(ids) + series, -1)
+
+
+def concat_series_frames(frames):
+    """دمج بيانات طويلة بعد normalize_series_frame مع توحيد فئات المستوى والمعرف (مرتبة)"""
+    columns = {}
+    for column in SERIES_COLUMNS:
+        parts = [frame[column] for frame in frames]
+        if column in ('series_id', 'level'):
+            columns[column] = union_categoricals(parts, sort_categories=True)
+        else:
+            columns[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def latest_rows(frame):
+    """الصف الأخير لكل سلسلة ويوم (التحديث الأحدث يستبدل السابق) مرتباً حسب المستوى والمعرف والتاريخ"""
+    frame = frame.drop_duplicates(['level', 'series_id', 'sale_date'], keep='last')
+    return frame.sort_values(['level', 'series_id', 'sale_date'], ignore_index=True)
+
+
+class SeriesPanel:
+    """نوافذ ومجاميع موسمية لعدد كبير من السلاسل اليومية على محور تواريخ مشترك"""
+
+    def __init__(self, keys, start, last_date, window, first_day, month_sum, month_count, dow_sum, dow_count,
+                 metric_total):
+        # المستوى ومعرف السلسلة لكل صف بترتيب ثابت (مرتب)
+        self.keys = keys
+        # بداية المحور المشترك (first_day بالأيام منها) وآخر تاريخ
+        self.start = start
+        self.last_date = last_date
+        # المقياس -> مصفوفة (سلسلة × WINDOW_DAYS) لآخر الأيام، العمود الأخير = last_date
+        self.window = window
+        self.first_day = first_day
+        self.month_sum = month_sum
+        self.month_count = month_count
+        self.dow_sum = dow_sum
+        self.dow_count = dow_count
+        # المقياس -> مجموع القيم اليومية لكل سلسلة، ومتوسطها منذ أول مبيعات لها
+        self.metric_total = metric_total
+        active_days = ((last_date - start).days + 1 - first_day).astype(float)
+        self.metric_mean = {metric: totals / active_days for metric, totals in metric_total.items()}
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_frame(cls, frame):
+        """
+        بناء اللوحة من بيانات طويلة (صف لكل سلسلة ويوم) بعد normalize_series_frame
+
+        الصفوف المكررة لنفس السلسلة واليوم تُجمع.
+        """
+        if frame.empty:
+            raise ValueError("لا توجد بيانات سلاسل")
+        keys, codes = _series_keys(frame)
+        start = frame['sale_date'].min()
+        last_date = frame['sale_date'].max()
+        return cls(keys, start, last_date, **_series_arrays(frame, codes, len(keys), start, last_date))
+
+    def with_series(self, frame):
+        """
+        لوحة جديدة تُعاد فيها حسابات السلاسل الموجودة في frame فقط
+
+        Args:
+            frame: جميع صفوف السلاسل المحدَّثة بعد latest_rows (دون تكرار ومرتبة بالتاريخ لكل سلسلة
+                فتُجمع القيم بنفس ترتيب إعادة البناء الكاملة)
+
+        Returns:
+            SeriesPanel مطابقة لإعادة البناء الكاملة، أو None إذا بدأت الصفوف قبل بداية المحور
+        """
+        if frame.empty:
+            return self
+        if frame['sale_date'].min() < self.start:
+            return None
+
+        start = self.start
+        last_date = max(self.last_date, frame['sale_date'].max())
+        shift = (last_date - self.last_date).days
+        n_days = (last_date - start).days + 1
+
+        # باقي السلاسل: إزاحة النوافذ بعدد الأيام الجديدة (مبيعاتها فيها صفر) وإضافة الأيام إلى الأعداد
+        window = {}
+        known = np.arange(n_days - WINDOW_DAYS, n_days)[None, :] >= self.first_day[:, None]
+        for metric, grid in self.window.items():
+            moved = np.zeros_like(grid)
+            if shift < WINDOW_DAYS:
+                moved[:, :WINDOW_DAYS - shift] = grid[:, shift:]
+            moved[~known] = np.nan
+            window[metric] = moved
+        month_count, dow_count = self.month_count, self.dow_count
+        if shift:
+            added = pd.date_range(self.last_date + pd.Timedelta(days=1), last_date, freq='D')
+            month_count = month_count + np.bincount(added.month, minlength=13)[None, :]
+            dow_count = dow_count + np.bincount(added.dayofweek, minlength=7)[None, :]
+
+        # السلاسل المحدَّثة تُحسب من جميع صفوفها على نفس المحور، والجديدة تُدرج بترتيبها
+        updated_keys, codes = _series_keys(frame)
+        updated = _series_arrays(frame, codes, len(updated_keys), start, last_date)
+        keys = self.keys.union(updated_keys)
+        old_rows = keys.get_indexer(self.keys)
+        new_rows = keys.get_indexer(updated_keys)
+
+        def merge(current, replacement):
+            merged = np.empty((len(keys),) + current.shape[1:], dtype=current.dtype)
+            merged[old_rows] = current
+            merged[new_rows] = replacement
+            return merged
+
+        return SeriesPanel(
+            keys, start, last_date,
+            window={metric: merge(window[metric], updated['window'][metric]) for metric in METRICS},
+            first_day=merge(self.first_day, updated['first_day']),
+            month_sum=merge(self.month_sum, updated['month_sum']),
+            month_count=merge(month_count, updated['month_count']),
+            dow_sum=merge(self.dow_sum, updated['dow_sum']),
+            dow_count=merge(dow_count, updated['dow_count']),
+            metric_total={metric: merge(self.metric_total[metric], updated['metric_total'][metric])
+                          for metric in METRICS},
+        )
+
+    @property
+    def next_date(self):
+        return self.last_date + pd.Timedelta(days=1)
+
+    def feature_matrix(self):
+        """
+        ميزات اليوم التالي لآخر تاريخ لجميع السلاسل بترتيب FEATURE_NAMES (قبل التطبيع)
+
+        متوسطا الشهر ويوم الأسبوع لسلسلة ليس لها أيام في ذلك الشهر أو اليوم يساويان متوسطها العام،
+        كما في تنبؤ المتجر (FeatureState).
+
+        Returns:
+            ndarray: (سلسلة × len(FEATURE_NAMES))
+        """
+        target_date = self.next_date
+        n = len(self)
+        features = np.empty((n, len(FEATURE_NAMES)))
+        features[:, :9] = calendar_values(target_date)
+        sales = self.window['total_amount']
+        quantity = self.window['total_quantity']
+        invoices = self.window['invoices_count']
+        discount = self.window['total_discount']
+
+        columns = []
+        for lag in SALES_LAGS:
+            columns.append(sales[:, WINDOW_DAYS - lag])
+        for lag in OTHER_LAGS:
+            columns += [quantity[:, WINDOW_DAYS - lag], invoices[:, WINDOW_DAYS - lag], discount[:, WINDOW_DAYS - lag]]
+
+        for size in SALES_WINDOWS:
+            recent = sales[:, -size:]
+            columns += [recent.mean(axis=1), recent.std(axis=1, ddof=1), recent.max(axis=1), recent.min(axis=1)]
+        for size in OTHER_WINDOWS:
+            columns += [quantity[:, -size:].mean(axis=1), quantity[:, -size:].std(axis=1, ddof=1),
+                        invoices[:, -size:].mean(axis=1), invoices[:, -size:].std(axis=1, ddof=1)]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # الأيام بلا مبيعات شائعة في سلاسل المنتجات فتُعامل نسبة التغيير بعد يوم صفري كصفر
+            previous = sales[:, -2]
+            change = np.where(previous > 0, sales[:, -1] / previous - 1.0, np.where(np.isnan(previous), np.nan, 0.0))
+
+            month = target_date.month
+            dow = target_date.dayofweek
+            overall = self.month_sum.sum(axis=1) / self.month_count.sum(axis=1)
+            monthly = np.where(self.month_count[:, month] > 0,
+                               self.month_sum[:, month] / self.month_count[:, month], overall)
+            weekday = np.where(self.dow_count[:, dow] > 0,
+                               self.dow_sum[:, dow] / self.dow_count[:, dow], overall)
+
+        columns += [sales[:, -7:].mean(axis=1), change, monthly, weekday]
+        features[:, 9:] = np.column_stack(columns)
+        return features
+
+    def scale_factors(self, reference_means):
+        """
+        معامل تطبيع كل ميزة لكل سلسلة إلى مستوى المتجر
+
+        Args:
+            reference_means: المقياس -> متوسط القيمة اليومية للمتجر
+
+        Returns:
+            tuple: (مصفوفة المعاملات سلسلة × ميزة, معامل المبيعات لكل سلسلة)
+        """
+        by_metric = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for metric in METRICS:
+                mean = self.metric_mean[metric]
+                factor = reference_means[metric] / mean
+                if metric != 'total_amount':
+                    # مقياس صفري للسلسلة (مثل عدم وجود خصومات) لا يحتاج تطبيعاً
+                    factor = np.where(mean > 0, factor, 1.0)
+                by_metric[metric] = factor
+
+        factors = np.ones((len(self), len(FEATURE_NAMES)))
+        for name, metric in _FEATURE_METRIC.items():
+            if metric is not None:
+                factors[:, _POSITION[name]] = by_metric[metric]
+        return factors, by_metric['total_amount']
+
+
+def _series_keys(frame):
+    """
+    مفاتيح السلاسل (المستوى, المعرف) مرتبة ورقم السلسلة لكل صف
+
+    الفئات مرتبة فيكون الترتيب حسب المستوى ثم المعرف.
+    """
+    levels = frame['level'].cat.categories
+    ids = frame['series_id'].cat.categories
+    combined = frame['level'].cat.codes.to_numpy(np.int64) * len(ids) + frame['series_id'].cat.codes.to_numpy(np.int64)
+    codes, combined = pd.factorize(combined, sort=True)
+    keys = pd.MultiIndex.from_arrays([levels[combined // len(ids)], ids[combined % len(ids)]],
+                                     names=['level', 'series_id'])
+    return keys, codes
+
+
+def _series_arrays(frame, codes, n_series, start, last_date):
+    """نوافذ ومجاميع السلاسل على محور يبدأ من start وينتهي بـ last_date (مع أرقام السلاسل لكل صف)"""
+    n_days = (last_date - start).days + 1
+    day = ((frame['sale_date'] - start).dt.days).to_numpy()
+
+    # أول يوم مبيعات لكل سلسلة (ما قبله غير معروف وليس صفراً)
+    first_day = np.full(n_series, n_days, dtype=np.int64)
+    np.minimum.at(first_day, codes, day)
+
+    # عدد أيام كل شهر ويوم أسبوع على المحور المشترك (مجموع تراكمي) لحساب عدد أيام كل سلسلة
+    axis = pd.date_range(start, last_date, freq='D')
+    month_days = _cumulative_counts(axis.month.to_numpy(), 13)
+    dow_days = _cumulative_counts(axis.dayofweek.to_numpy(), 7)
+    month_count = month_days[:, -1][None, :] - month_days[:, first_day].T
+    dow_count = dow_days[:, -1][None, :] - dow_days[:, first_day].T
+
+    amounts = frame['total_amount'].to_numpy()
+    month_sum = np.zeros((n_series, 13))
+    dow_sum = np.zeros((n_series, 7))
+    np.add.at(month_sum, (codes, frame['sale_date'].dt.month.to_numpy()), amounts)
+    np.add.at(dow_sum, (codes, frame['sale_date'].dt.dayofweek.to_numpy()), amounts)
+
+    recent = day >= n_days - WINDOW_DAYS
+    column = day[recent] - (n_days - WINDOW_DAYS)
+    # الأيام قبل أول مبيعات للسلسلة (أو قبل بداية المحور) تبقى NaN
+    known = np.arange(n_days - WINDOW_DAYS, n_days)[None, :] >= first_day[:, None]
+
+    window, metric_total = {}, {}
+    for metric in METRICS:
+        values = frame[metric].to_numpy()
+        totals = np.zeros(n_series)
+        np.add.at(totals, codes, values)
+        metric_total[metric] = totals
+
+        grid = np.zeros((n_series, WINDOW_DAYS))
+        np.add.at(grid, (codes[recent], column), values[recent])
+        grid[~known] = np.nan
+        window[metric] = grid
+
+    return {
+        "window": window, "first_day": first_day, "month_sum": month_sum, "month_count": month_count,
+        "dow_sum": dow_sum, "dow_count": dow_count, "metric_total": metric_total,
+    }
+
+
+def _cumulative_counts(groups, group_count):
+    """مصفوفة (مجموعة × يوم+1): عدد الأيام من كل مجموعة قبل كل موقع على المحور"""
+    counts = np.zeros((group_count, len(groups) + 1), dtype=np.int64)
+    counts[groups, np.arange(1, len(groups) + 1)] = 1
+    return np.cumsum(counts, axis=1)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تشغيل خدمة التنبؤ بالمبيعات للإنتاج
+Production Server Entry Point
+
+على Linux/macOS يُستخدم gunicorn بعدة عمليات (prefork): يُحمّل النموذج والبيانات مرة واحدة
+في العملية الرئيسية قبل إنشاء العمليات الفرعية فتتشارك الذاكرة (copy-on-write).
+على Windows (لا يدعم fork) يُستخدم waitress بعدة خيوط في عملية واحدة.
+
+مع --async (أو ML_ASYNC=1) يعمل كل عامل بحلقة asyncio (عامل asgi في gunicorn) عبر async_api:
+فحوص الحالة لا تنتظر خلف الطلبات البطيئة، والطلبات المتطابقة المتزامنة تُدمج في حساب واحد،
+والحساب على ML_THREADS خيط مع ML_QUEUE_SIZE مهمة منتظرة كحد أقصى (بعدها 503).
+
+الإعدادات من سطر الأوامر أو متغيرات البيئة:
+    ML_HOST, ML_PORT, ML_WORKERS, ML_THREADS, ML_TIMEOUT, ML_GRACEFUL_TIMEOUT,
+    ML_KEEPALIVE, ML_MAX_REQUESTS, ML_MAX_REQUESTS_JITTER, ML_METRICS_DIR,
+    ML_ASYNC, ML_QUEUE_SIZE, ML_CONNECTIONS
+
+إيقاف تدريجي: SIGTERM أو Ctrl+C (تُكمل العمليات الطلبات الجارية خلال ML_GRACEFUL_TIMEOUT).
+إعادة تشغيل العمليات تدريجياً دون انقطاع: kill -HUP <رقم العملية الرئيسية>.
+مع ML_MODEL_WATCH_INTERVAL > 0 يراقب كل عامل مجلد النموذج ويعيد تحميله عند نشر نسخة جديدة.
+
+مع أكثر من عملية تحمل كل عملية نسختها من البيانات والنموذج، لذلك يقارن كل عامل قبل كل طلب ملفات
+البيانات والنموذج بما حمّله ويعيد تحميل ما تغيّر (sync_shared_state في model_handler): الأيام المضافة
+بـ persist وإعادة تحميل النموذج من أي عامل تصل إلى جميع العمليات.
+"""
+
+import argparse
+import multiprocessing
+import os
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def parse_args(argv=None):
+    """قراءة إعدادات الخادم"""
+    parser = argparse.ArgumentParser(description="تشغيل خدمة التنبؤ بالمبيعات")
+    parser.add_argument('--host', default=os.environ.get('ML_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=_env_int('ML_PORT', 5000))
+    parser.add_argument('--workers', type=int, default=_env_int('ML_WORKERS', multiprocessing.cpu_count()),
+                        help="عدد العمليات (الافتراضي: عدد الأنوية)")
+    parser.add_argument('--threads', type=int, default=_env_int('ML_THREADS', 2),
+                        help="عدد الخيوط في كل عملية")
+    parser.add_argument('--timeout', type=int, default=_env_int('ML_TIMEOUT', 30),
+                        help="إعادة تشغيل العملية إذا لم تستجب خلال هذه المدة (ثوانٍ)")
+    parser.add_argument('--graceful-timeout', type=int, default=_env_int('ML_GRACEFUL_TIMEOUT', 30),
+                        help="مهلة إكمال الطلبات الجارية عند الإيقاف (ثوانٍ)")
+    parser.add_argument('--keepalive', type=int, default=_env_int('ML_KEEPALIVE', 5),
+                        help="مدة إبقاء الاتصال مفتوحاً بين الطلبات (ثوانٍ)")
+    parser.add_argument('--max-requests', type=int, default=_env_int('ML_MAX_REQUESTS', 0),
+                        help="إعادة تشغيل العملية بعد عدد من الطلبات (0 للتعطيل)")
+    parser.add_argument('--max-requests-jitter', type=int, default=_env_int('ML_MAX_REQUESTS_JITTER', 0),
+                        help="تفاوت عشوائي حتى لا تُعاد العمليات كلها في نفس الوقت")
+    parser.add_argument('--async', dest='async_mode', action='store_true',
+                        default=os.environ.get('ML_ASYNC', '0') not in ('', '0', 'false', 'False'),
+                        help="تشغيل غير متزامن مع دمج الطلبات المتطابقة (عامل asgi في gunicorn)")
+    parser.add_argument('--queue-size', type=int, default=_env_int('ML_QUEUE_SIZE', 64),
+                        help="الوضع غير المتزامن: أقصى عدد مهام منتظرة في كل عامل قبل الرد بـ 503")
+    parser.add_argument('--connections', type=int, default=_env_int('ML_CONNECTIONS', 1000),
+                        help="الوضع غير المتزامن: أقصى عدد اتصالات مفتوحة في كل عامل")
+    parser.add_argument('--dev', action='store_true',
+                        help="خادم التطوير (عملية واحدة مع إعادة التحميل التلقائي)")
+    return parser.parse_args(argv)
+
+
+def _gunicorn_application(app, options):
+    from gunicorn.app.base import BaseApplication
+
+    class SalesApplication(BaseApplication):
+        """تطبيق gunicorn يستخدم كائن Flask المحمّل مسبقاً"""
+
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    return SalesApplication()
+
+
+def _start_model_watcher():
+    from model_handler import sales_model
+    sales_model.start_model_watcher()
+
+
+def _post_fork(server, worker):
+    # خيوط المراقبة لا تنتقل مع fork لذلك تبدأ في كل عامل بعد إنشائه
+    _start_model_watcher()
+
+
+def _asgi_worker_available():
+    try:
+        from gunicorn.workers import SUPPORTED_WORKERS
+    except ImportError:
+        return False
+    return 'asgi' in SUPPORTED_WORKERS
+
+
+def run(app, args):
+    """تشغيل التطبيق بأفضل خادم متاح للنظام الحالي"""
+    if args.dev:
+        app.run(debug=True, host=args.host, port=args.port)
+        return
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        gunicorn = None
+
+    if gunicorn is not None and hasattr(os, 'fork'):
+        options = {
+            'bind': f'{args.host}:{args.port}',
+            'workers': args.workers,
+            'worker_class': 'gthread',
+            'threads': args.threads,
+            # التطبيق محمّل بالفعل في العملية الرئيسية قبل إنشاء العمليات الفرعية
+            'preload_app': True,
+            'timeout': args.timeout,
+            'graceful_timeout': args.graceful_timeout,
+            'keepalive': args.keepalive,
+            'max_requests': args.max_requests,
+            'max_requests_jitter': args.max_requests_jitter,
+            'post_fork': _post_fork,
+        }
+        if args.workers > 1:
+            from model_handler import sales_model
+            sales_model.enable_worker_sync()
+        if args.async_mode and not _asgi_worker_available():
+            print("تحذير: إصدار gunicorn المثبت لا يدعم عامل asgi، سيتم التشغيل بالخيوط")
+        elif args.async_mode:
+            from async_api import AsyncSalesApp
+            from model_handler import sales_model
+            app = AsyncSalesApp(app, sales_model, threads=args.threads, queue_size=args.queue_size)
+            options.update({'worker_class': 'asgi', 'threads': 1, 'worker_connections': args.connections})
+            print(f"✓ تشغيل gunicorn غير المتزامن: {args.workers} عملية، {args.threads} خيط حساب "
+                  f"و{args.queue_size} مهمة منتظرة لكل عملية على {args.host}:{args.port}")
+        if options['worker_class'] == 'gthread':
+            print(f"✓ تشغيل gunicorn: {args.workers} عملية × {args.threads} خيط على {args.host}:{args.port}")
+        # كل عامل يكتب مقاييسه في مجلد مشترك ليجمعها /api/metrics من جميع العمليات
+        import metrics
+        print(f"✓ مجلد المقاييس المشترك: {metrics.enable_multiprocess()}")
+        _gunicorn_application(app, options).run()
+        return
+
+    if args.async_mode:
+        print("تحذير: الوضع غير المتزامن يتطلب gunicorn على Linux/macOS، سيتم التشغيل بالخيوط")
+
+    _start_model_watcher()
+
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+
+    if serve is not None:
+        threads = max(args.workers * args.threads, 1)
+        print(f"✓ تشغيل waitress: {threads} خيط على {args.host}:{args.port}")
+        serve(app, host=args.host, port=args.port, threads=threads,
+              channel_timeout=args.timeout, connection_limit=max(100, threads * 4))
+        return
+
+    print("تحذير: gunicorn و waitress غير مثبتين، سيتم استخدام خادم Flask بعملية واحدة")
+    app.run(debug=False, use_reloader=False, threaded=True, host=args.host, port=args.port)
+
+
+def main(argv=None, app=None):
+    args = parse_args(argv)
+    if app is None:
+        # تحميل النموذج والبيانات هنا (مرة واحدة) قبل إنشاء العمليات
+        from api import app
+    run(app, args)
+
+
+if __name__ == '__main__':
+    main()
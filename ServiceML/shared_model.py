@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+نموذج الغابة العشوائية المشترك بين العمليات
+Shared Memory-Mapped Forest
+
+تنسخ sklearn مصفوفات العقد إلى ذاكرة خاصة بكل عملية عند تحميل النموذج (حتى مع mmap_mode)،
+لذلك تُصدَّر أشجار الغابة مرة واحدة إلى مصفوفات مسطحة (.npy) بجانب ملف النموذج
+وتُفتح للقراءة فقط عبر memory-map. جميع العمليات على نفس الجهاز تشترك في نسخة فعلية واحدة
+من هذه المصفوفات عبر ذاكرة الملفات المؤقتة لنظام التشغيل.
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+# مجلد المصفوفات المصدَّرة بجانب ملفات النموذج
+SHARED_DIR_NAME = 'shared'
+
+# يُزاد عند تغيير صيغة التصدير لإبطال المصفوفات القديمة
+EXPORT_FORMAT = 1
+
+ARRAY_NAMES = ['feature', 'threshold', 'left', 'right', 'value', 'roots']
+
+
+def _export_dir(model_file):
+    """مجلد التصدير الخاص بنسخة ملف النموذج الحالية (الوقت والحجم جزء من الاسم)"""
+    stat = os.stat(model_file)
+    stem = os.path.splitext(os.path.basename(model_file))[0]
+    root = os.path.join(os.path.dirname(model_file), SHARED_DIR_NAME)
+    return root, stem, os.path.join(root, f'{stem}-{EXPORT_FORMAT}-{stat.st_mtime_ns}-{stat.st_size}')
+
+
+def is_supported(model):
+    """هل يمكن تصدير النموذج (غابة أشجار انحدار بمخرج واحد)"""
+    estimators = getattr(model, 'estimators_', None)
+    return (
+        estimators is not None
+        and len(estimators) > 0
+        and all(hasattr(tree, 'tree_') for tree in estimators)
+        and getattr(model, 'n_outputs_', 1) == 1
+    )
+
+
+def flatten_forest(model):
+    """
+    دمج أشجار الغابة في مصفوفات مسطحة متجاورة بفهارس عامة
+
+    الأوراق تشير إلى نفسها بعتبة لا نهائية، فيكفي تكرار خطوة النزول بعدد أقصى عمق
+    لتصل كل الأشجار إلى أوراقها.
+
+    Returns:
+        tuple: (المصفوفات حسب ARRAY_NAMES, معلومات الغابة)
+    """
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    sizes = np.array([tree.node_count for tree in trees])
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    feature = np.concatenate([tree.feature for tree in trees]).astype(np.int32)
+    threshold = np.concatenate([tree.threshold for tree in trees]).astype(np.float64)
+    left = np.concatenate([tree.children_left + offset for tree, offset in zip(trees, offsets)])
+    right = np.concatenate([tree.children_right + offset for tree, offset in zip(trees, offsets)])
+    value = np.concatenate([tree.value[:, 0, 0] for tree in trees]).astype(np.float64)
+
+    is_leaf = np.concatenate([tree.children_left == -1 for tree in trees])
+    nodes = np.arange(len(feature))
+    feature[is_leaf] = 0
+    threshold[is_leaf] = np.inf
+    left = np.where(is_leaf, nodes, left).astype(np.int32)
+    right = np.where(is_leaf, nodes, right).astype(np.int32)
+
+    arrays = {
+        'feature': feature,
+        'threshold': threshold,
+        'left': left,
+        'right': right,
+        'value': value,
+        'roots': offsets.astype(np.int32),
+    }
+    meta = {
+        "model_type": type(model).__name__,
+        "n_estimators": len(trees),
+        "n_features": int(getattr(model, 'n_features_in_', feature.max() + 1)),
+        "max_depth": int(max(tree.max_depth for tree in trees)),
+        "node_count": int(len(feature)),
+    }
+    return arrays, meta
+
+
+def export_forest(model, model_file):
+    """تصدير أشجار الغابة إلى ملفات .npy بجانب ملف النموذج"""
+    root, stem, target = _export_dir(model_file)
+    arrays, meta = flatten_forest(model)
+
+    # الكتابة في مجلد مؤقت ثم إعادة تسميته حتى لا يرى عامل آخر تصديراً ناقصاً
+    os.makedirs(root, exist_ok=True)
+    temp = f'{target}.{os.getpid()}.tmp'
+    shutil.rmtree(temp, ignore_errors=True)
+    os.makedirs(temp)
+    for name, array in arrays.items():
+        np.save(os.path.join(temp, f'{name}.npy'), np.ascontiguousarray(array))
+    with open(os.path.join(temp, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    try:
+        os.rename(temp, target)
+    except OSError:
+        # عامل آخر أنهى التصدير أولاً
+        shutil.rmtree(temp, ignore_errors=True)
+
+    # حذف تصديرات النسخ السابقة من نفس النموذج
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.startswith(f'{stem}-') and path != target and not name.endswith('.tmp'):
+            shutil.rmtree(path, ignore_errors=True)
+
+    return target
+
+
+def prune_exports(model_file):
+    """
+    حذف جميع التصديرات في مجلد shared/ عدا تصدير النسخة الحالية من ملف النموذج
+
+    تُستدعى بعد استبدال ملفات النموذج فلا تبقى مصفوفات نماذج سابقة أو محذوفة.
+    العمليات التي ما زالت تفتح مصفوفات قديمة تحتفظ بها حتى تعيد التحميل.
+    """
+    root, _, target = _export_dir(model_file)
+    if not os.path.isdir(root):
+        return []
+    removed = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if path == target or name.endswith('.tmp'):
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+        removed.append(name)
+    return removed
+
+
+class SharedForest:
+    """غابة أشجار انحدار تُقيَّم مباشرة من مصفوفات مفتوحة عبر memory-map"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.source_type = meta["model_type"]
+        self.n_estimators = meta["n_estimators"]
+        self.n_features_in_ = meta["n_features"]
+        self.max_depth = meta["max_depth"]
+
+        for name in ARRAY_NAMES:
+            setattr(self, name, np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r'))
+
+    @classmethod
+    def open(cls, model_file):
+        """فتح المصفوفات المصدَّرة لملف النموذج إن وُجدت ومطابقة لنسخته الحالية"""
+        _, _, path = _export_dir(model_file)
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            return None
+        return cls(path)
+
+    def derived_array(self, name, compute):
+        """
+        مصفوفة مشتقة من الغابة (مثل العتبات بعد دمج التطبيع) محفوظة مع مصفوفاتها
+
+        تحسبها أول عملية وتحفظها، وتفتحها جميع العمليات عبر memory-map فلا تُنسخ في كل عملية.
+        الاسم بصيغة <المجموعة>-<المفتاح>، وعند حفظ مفتاح جديد تُحذف مفاتيح المجموعة السابقة.
+        """
+        path = os.path.join(self.path, f'{name}.npy')
+        if not os.path.exists(path):
+            temp = f'{path}.{os.getpid()}.tmp'
+            with open(temp, 'wb') as f:
+                np.save(f, np.ascontiguousarray(compute()))
+            os.replace(temp, path)
+
+            group = name.split('-', 1)[0] + '-'
+            for other in os.listdir(self.path):
+                if other.startswith(group) and other.endswith('.npy') and other != f'{name}.npy':
+                    os.remove(os.path.join(self.path, other))
+        return np.load(path, mmap_mode='r')
+
+    @property
+    def nbytes(self):
+        return int(sum(getattr(self, name).nbytes for name in ARRAY_NAMES))
+
+    def predict(self, X):
+        """
+        التنبؤ لصف أو مجموعة صفوف (بعد التحجيم) بنفس نتيجة sklearn
+
+        تُقارن القيم بعد تحويلها إلى float32 مع العتبات كما تفعل sklearn،
+        وتنزل جميع الأشجار لجميع الصفوف معاً خطوة في كل تكرار.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_estimators)).copy()
+
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        # الجمع بالتتابع بترتيب الأشجار كما في sklearn ثم القسمة
+        return np.cumsum(self.value[nodes], axis=1)[:, -1] / self.n_estimators
+
+
+def load_shared_forest(model, model_file):
+    """
+    إرجاع نسخة مشتركة من الغابة (تُصدَّر عند أول تحميل لملف النموذج)
+
+    Returns:
+        SharedForest أو None إذا كان النموذج غير مدعوم
+    """
+    forest = SharedForest.open(model_file)
+    if forest is not None:
+        return forest
+    if model is None or not is_supported(model):
+        return None
+    return SharedForest(export_forest(model, model_file))
+
+
+def _read_smaps_fields(lines, fields):
+    totals = dict.fromkeys(fields, 0)
+    for line in lines:
+        name, _, rest = line.partition(':')
+        if name in totals:
+            totals[name] += int(rest.split()[0]) * 1024
+    return totals
+
+
+def memory_report(shared_path=None):
+    """
+    تقرير ذاكرة العملية الحالية: الذاكرة المقيمة والمشتركة والخاصة
+
+    يعتمد على /proc/self/smaps (Linux). على الأنظمة الأخرى تُرجع الحقول None.
+
+    Args:
+        shared_path: مجلد مصفوفات النموذج المشتركة لحساب ذاكرتها منفصلة
+    """
+    fields = ['Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty']
+    report = {
+        "pid": os.getpid(),
+        "rss_bytes": None,
+        "pss_bytes": None,
+        "shared_bytes": None,
+        "private_bytes": None,
+        "model_arrays": None,
+    }
+
+    try:
+        with open('/proc/self/smaps_rollup', 'r') as f:
+            totals = _read_smaps_fields(f, fields)
+    except OSError:
+        return report
+
+    report.update({
+        "rss_bytes": totals['Rss'],
+        "pss_bytes": totals['Pss'],
+        "shared_bytes": totals['Shared_Clean'] + totals['Shared_Dirty'],
+        "private_bytes": totals['Private_Clean'] + totals['Private_Dirty'],
+    })
+
+    if shared_path:
+        # تجميع مناطق smaps التي تعود لملفات المصفوفات المشتركة فقط
+        shared_path = os.path.abspath(shared_path)
+        region_lines = []
+        in_region = False
+        with open('/proc/self/smaps', 'r') as f:
+            for line in f:
+                head = line.split()
+                if head and '-' in head[0] and len(head) >= 5 and ':' not in head[0]:
+                    in_region = len(head) >= 6 and head[5].startswith(shared_path)
+                elif in_region:
+                    region_lines.append(line)
+        arrays = _read_smaps_fields(region_lines, fields)
+        report["model_arrays"] = {
+            "path": shared_path,
+            "resident_bytes": arrays['Rss'],
+            "pss_bytes": arrays['Pss'],
+            "shared_bytes": arrays['Shared_Clean'] + arrays['Shared_Dirty'],
+            "private_bytes": arrays['Private_Clean'] + arrays['Private_Dirty'],
+        }
+
+    return report
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+نسخ ثنائية عمودية لملفات البيانات
+Binary Columnar Snapshots
+
+تُحفظ بجانب كل ملف CSV نسخة ثنائية (npz) من الجدول بعد قراءته، مرتبطة بوقت تعديل
+الملف الأصلي وحجمه. عند بدء التشغيل تُقرأ النسخة مباشرة إذا كانت مطابقة للملف،
+ويُعاد بناؤها تلقائياً عند تغيّر ملف CSV.
+القيم المفقودة في الأعمدة النصية تُحفظ كقناع منفصل فتُقرأ NaN كما في read_csv.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# يُزاد عند تغيير صيغة الملف لإبطال النسخ القديمة
+SNAPSHOT_FORMAT = 2
+
+
+def snapshot_path(csv_path):
+    """مسار النسخة الثنائية المقابلة لملف CSV"""
+    root, _ = os.path.splitext(csv_path)
+    return root + '.snapshot.npz'
+
+
+def _source_key(csv_path, read_csv_kwargs):
+    # خيارات القراءة جزء من المفتاح لأنها تغيّر الجدول الناتج من نفس الملف
+    stat = os.stat(csv_path)
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "options": repr(sorted(read_csv_kwargs.items()))
+    }
+
+
+def _column_array(values):
+    """
+    تحويل عمود إلى مصفوفة NumPy قابلة للحفظ دون pickle
+
+    Returns:
+        tuple: (المصفوفة, قناع القيم المفقودة للأعمدة النصية أو None)
+    """
+    if pd.api.types.is_numeric_dtype(values.dtype) or pd.api.types.is_datetime64_dtype(values.dtype):
+        return np.asarray(values), None
+    # astype(str) يحوّل NaN إلى النص 'nan'، لذلك تُحفظ مواقعها منفصلة
+    nulls = values.isna().to_numpy()
+    return np.asarray(values.astype(str), dtype=str), (nulls if nulls.any() else None)
+
+
+def _restore_nulls(values, nulls):
+    return values.mask(nulls) if nulls is not None else values
+
+
+def save_snapshot(frame, csv_path, source_key):
+    """حفظ الجدول كنسخة ثنائية مرتبطة بحالة ملف CSV عند قراءته"""
+    meta = {"source": source_key, "columns": [], "index": None}
+
+    # الأعمدة من نفس النوع تُحفظ في مصفوفة واحدة (عمود لكل صف) لتقليل عدد القراءات
+    blocks = {}
+    arrays = {}
+    for column in frame.columns:
+        values, nulls = _column_array(frame[column])
+        block = blocks.setdefault(values.dtype.str, [])
+        entry = {
+            "name": column,
+            "dtype": str(frame[column].dtype),
+            "block": values.dtype.str,
+            "position": len(block)
+        }
+        if nulls is not None:
+            entry["nulls"] = f'nulls{len(meta["columns"])}'
+            arrays[entry["nulls"]] = nulls
+        meta["columns"].append(entry)
+        block.append(values)
+
+    arrays.update({f'block{i}': np.stack(values) for i, values in enumerate(blocks.values())})
+    block_names = {key: f'block{i}' for i, key in enumerate(blocks)}
+    for column in meta["columns"]:
+        column["block"] = block_names[column["block"]]
+
+    if not isinstance(frame.index, pd.RangeIndex):
+        arrays['index'], nulls = _column_array(frame.index.to_series())
+        meta["index"] = {"name": frame.index.name, "dtype": str(frame.index.dtype)}
+        if nulls is not None:
+            arrays['index_nulls'] = nulls
+            meta["index"]["nulls"] = 'index_nulls'
+
+    arrays['meta'] = np.array(json.dumps(meta))
+
+    # الكتابة في ملف مؤقت ثم الاستبدال حتى لا يقرأ عامل آخر نسخة ناقصة
+    target = snapshot_path(csv_path)
+    temp = f'{target}.{os.getpid()}.tmp'
+    with open(temp, 'wb') as handle:
+        np.savez(handle, **arrays)
+    os.replace(temp, target)
+
+
+def load_snapshot(csv_path, read_csv_kwargs):
+    """
+    قراءة النسخة الثنائية إذا كانت مطابقة لملف CSV الحالي
+
+    Returns:
+        DataFrame أو None إذا لم توجد نسخة صالحة
+    """
+    path = snapshot_path(csv_path)
+    if not os.path.exists(path):
+        return None
+
+    with np.load(path, allow_pickle=False) as archive:
+        meta = json.loads(str(archive['meta']))
+        if meta["source"] != _source_key(csv_path, read_csv_kwargs):
+            return None
+
+        blocks = {name: archive[name] for name in {column["block"] for column in meta["columns"]}}
+        columns = {}
+        for column in meta["columns"]:
+            values = blocks[column["block"]][column["position"]]
+            series = pd.Series(values, copy=False)
+            if "nulls" in column:
+                series = _restore_nulls(series, archive[column["nulls"]])
+            if str(series.dtype) != column["dtype"]:
+                series = series.astype(column["dtype"])
+            columns[column["name"]] = series
+        index = None
+        if meta["index"] is not None:
+            values = pd.Series(archive['index'], copy=False)
+            if "nulls" in meta["index"]:
+                values = _restore_nulls(values, archive[meta["index"]["nulls"]])
+            index = pd.Index(values, name=meta["index"]["name"]).astype(meta["index"]["dtype"])
+
+    frame = pd.DataFrame(columns)
+    if index is not None:
+        frame.index = index
+    return frame
+
+
+def read_csv_cached(csv_path, **read_csv_kwargs):
+    """
+    قراءة ملف CSV عبر نسخته الثنائية إن كانت حديثة، وإلا قراءته وتحديث النسخة
+
+    Args:
+        csv_path: مسار ملف CSV
+        **read_csv_kwargs: معاملات pd.read_csv
+
+    Returns:
+        DataFrame: نفس نتيجة pd.read_csv(csv_path, **read_csv_kwargs)
+    """
+    try:
+        frame = load_snapshot(csv_path, read_csv_kwargs)
+        if frame is not None:
+            return frame
+    except Exception as e:
+        print(f"تحذير: تعذر قراءة النسخة الثنائية لـ {csv_path}: {str(e)}")
+
+    # المفتاح يُقرأ قبل الملف: إذا تغيّر أثناء القراءة ستُعتبر النسخة قديمة في المرة القادمة
+    source_key = _source_key(csv_path, read_csv_kwargs)
+    frame = pd.read_csv(csv_path, **read_csv_kwargs)
+    try:
+        save_snapshot(frame, csv_path, source_key)
+    except OSError as e:
+        print(f"تحذير: تعذر حفظ النسخة الثنائية لـ {csv_path}: {str(e)}")
+    return frame
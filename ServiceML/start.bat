@@ -56,7 +56,7 @@ echo.
 echo ⏹️  اضغط Ctrl+C لإيقاف الخادم
 echo ================================================
 
-python api.py
+python serve.py
 
 echo.
 echo 👋 شكراً لاستخدام نظام التنبؤ بالمبيعات!
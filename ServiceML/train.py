@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تدريب نموذج التنبؤ بالمبيعات
+Training Pipeline
+
+نفس خطوات دفتر modelAI/sales_model.ipynb كسكربت قابل للجدولة:
+1. بناء الميزات من Daily_sales.csv (materialize_processed كما في الدفتر)
+2. تقسيم زمني: آخر 20% للاختبار
+3. بحث عشوائي عن المعاملات لكل نموذج مرشح (RandomForest و XGBoost و LinearRegression)
+   مع تحقق متقاطع زمني (TimeSeriesSplit) على جميع الأنوية، والتطبيع داخل كل طية لتجنب التسريب
+4. اختيار النموذج الأفضل حسب RMSE على فترة الاختبار ثم إعادة تدريبه على كامل البيانات
+5. كتابة best_model_*.joblib و standard_scaler.joblib و feature_columns.txt دفعة واحدة
+   (النسخة السابقة تُنقل إلى modelAI/archive/)
+6. تصدير أشجار النموذج الجديد إلى modelAI/shared/ وحذف تصديرات النماذج السابقة
+
+    python train.py
+    python train.py --iterations 40 --models randomforest,xgboost --dry-run
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+
+# مسارات البيانات والنموذج نسبية لمجلد الخدمة
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+os.chdir(SERVICE_DIR)
+sys.path.insert(0, SERVICE_DIR)
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy.stats import loguniform, randint, uniform
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import RandomizedSearchCV, TimeSeriesSplit
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+try:
+    import xgboost as xgb
+except ImportError:  # xgboost اختياري
+    xgb = None
+
+from feature_engine import prepare_history, materialize_processed
+from feature_state import METRICS
+from model_handler import DAILY_SALES_PATH, MODEL_DIR, MODEL_TYPES, SCALER_FILE, FEATURES_FILE
+from shared_model import SHARED_DIR_NAME, load_shared_forest, prune_exports
+
+TARGET = 'total_amount'
+REPORT_FILE = 'training_report.json'
+ARCHIVE_DIR = 'archive'
+RANDOM_STATE = 42
+
+
+def candidate_models():
+    """
+    النماذج المرشحة ونطاقات البحث لكل منها
+
+    Returns:
+        dict: نوع النموذج (كما في MODEL_TYPES) -> (النموذج, نطاقات المعاملات)
+    """
+    candidates = {
+        'randomforest': (
+            # التوازي على مستوى البحث وليس داخل النموذج حتى لا تتزاحم العمليات على الأنوية
+            RandomForestRegressor(random_state=RANDOM_STATE, n_jobs=1),
+            {
+                'n_estimators': randint(100, 400),
+                'max_depth': [None, 8, 12, 16, 24],
+                'min_samples_leaf': randint(1, 8),
+                'max_features': [1.0, 0.7, 0.5, 'sqrt'],
+            }
+        ),
+        'linearregression': (LinearRegression(), {}),
+    }
+    if xgb is not None:
+        candidates['xgboost'] = (
+            xgb.XGBRegressor(random_state=RANDOM_STATE, n_jobs=1, tree_method='hist'),
+            {
+                'n_estimators': randint(100, 600),
+                'max_depth': randint(2, 8),
+                'learning_rate': loguniform(0.01, 0.3),
+                'subsample': uniform(0.6, 0.4),
+                'colsample_bytree': uniform(0.5, 0.5),
+                'min_child_weight': randint(1, 8),
+            }
+        )
+    return candidates
+
+
+def build_dataset(daily_path=DAILY_SALES_PATH):
+    """الميزات والهدف من ملف المبيعات اليومية بنفس طريقة الدفتر"""
+    daily = pd.read_csv(daily_path, parse_dates=['sale_date'])
+    processed = materialize_processed(prepare_history(daily))
+    feature_columns = [column for column in processed.columns if column not in METRICS]
+    return processed[feature_columns], processed[TARGET], feature_columns
+
+
+def _scores(y_true, y_pred):
+    return {
+        "rmse": float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        "mae": float(mean_absolute_error(y_true, y_pred)),
+        "r2": float(r2_score(y_true, y_pred)),
+    }
+
+
+def search_model(model, space, X_train, y_train, iterations, splits, jobs):
+    """البحث عن أفضل معاملات نموذج بتحقق متقاطع زمني (التطبيع داخل كل طية)"""
+    pipeline = Pipeline([('scaler', StandardScaler()), ('model', model)])
+    if not space:
+        pipeline.fit(X_train, y_train)
+        return pipeline, {}, None
+
+    search = RandomizedSearchCV(
+        pipeline,
+        {f'model__{name}': values for name, values in space.items()},
+        n_iter=iterations,
+        cv=TimeSeriesSplit(n_splits=splits),
+        scoring='neg_root_mean_squared_error',
+        n_jobs=jobs,
+        random_state=RANDOM_STATE,
+        refit=True,
+    )
+    search.fit(X_train, y_train)
+    params = {name.split('__', 1)[1]: value for name, value in search.best_params_.items()}
+    return search.best_estimator_, params, float(-search.best_score_)
+
+
+def train(model_types=None, test_size=0.2, iterations=20, splits=5, jobs=-1, daily_path=DAILY_SALES_PATH):
+    """
+    تدريب جميع النماذج المرشحة واختيار الأفضل
+
+    Returns:
+        tuple: (النموذج النهائي, الـ Scaler, قائمة الميزات, تقرير التدريب)
+    """
+    X, y, feature_columns = build_dataset(daily_path)
+    split_point = int(len(X) * (1 - test_size))
+    X_train, X_test = X.iloc[:split_point], X.iloc[split_point:]
+    y_train, y_test = y.iloc[:split_point], y.iloc[split_point:]
+    print(f"✓ البيانات: {len(X)} صف ({len(X_train)} تدريب، {len(X_test)} اختبار)، {len(feature_columns)} ميزة")
+
+    candidates = candidate_models()
+    model_types = model_types or [t for t in MODEL_TYPES if t in candidates]
+    unknown = [t for t in model_types if t not in candidates]
+    if unknown:
+        raise ValueError(f"نماذج غير متاحة: {unknown} (المتاح: {list(candidates)})")
+
+    results = {}
+    for model_type in model_types:
+        model, space = candidates[model_type]
+        start = time.perf_counter()
+        pipeline, params, cv_rmse = search_model(model, space, X_train, y_train, iterations, splits, jobs)
+        results[model_type] = {
+            "params": params,
+            "cv_rmse": cv_rmse,
+            "test": _scores(y_test, pipeline.predict(X_test)),
+            "seconds": round(time.perf_counter() - start, 2),
+        }
+        test = results[model_type]["test"]
+        print(f"  {model_type:<18} RMSE {test['rmse']:>12.2f}  MAE {test['mae']:>12.2f}  R² {test['r2']:.4f}"
+              f"  ({results[model_type]['seconds']} ث)")
+
+    best = min(results, key=lambda t: results[t]["test"]["rmse"])
+    print(f"✓ النموذج الأفضل: {best}")
+
+    # كما في الدفتر: الـ Scaler من فترة التدريب والنموذج النهائي على كامل البيانات بالمعاملات الأفضل
+    scaler = StandardScaler().fit(X_train)
+    final_model, _ = candidates[best]
+    final_model.set_params(**results[best]["params"])
+    if 'n_jobs' in final_model.get_params():
+        final_model.set_params(n_jobs=jobs)
+    final_model.fit(scaler.transform(X), y)
+
+    report = {
+        "trained_at": datetime.now().isoformat(timespec='seconds'),
+        "best_model": best,
+        "rows": len(X),
+        "train_rows": len(X_train),
+        "test_rows": len(X_test),
+        "data_end": X.index.max().strftime('%Y-%m-%d'),
+        "candidates": results,
+    }
+    return final_model, scaler, feature_columns, report
+
+
+def save_artifacts(model, scaler, feature_columns, report, model_dir=MODEL_DIR):
+    """
+    كتابة ملفات النموذج دفعة واحدة
+
+    تُكتب جميع الملفات مؤقتاً أولاً ثم تُنقل النسخة السابقة إلى archive/ وتُستبدل الملفات متتالية،
+    فلا يقرأ الخادم ملفاً ناقصاً. ملفات النماذج الأخرى تُنقل أيضاً حتى لا يُحمَّل نموذج قديم بأولوية أعلى.
+    """
+    model_file = f"best_model_{report['best_model']}.joblib"
+    suffix = f'.{os.getpid()}.tmp'
+    staged = {}
+
+    def stage(name, write):
+        temp = os.path.join(model_dir, name + suffix)
+        write(temp)
+        staged[name] = temp
+
+    try:
+        stage(model_file, lambda path: joblib.dump(model, path))
+        stage(SCALER_FILE, lambda path: joblib.dump(scaler, path))
+
+        def write_features(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(feature_columns) + '\n')
+        stage(FEATURES_FILE, write_features)
+
+        def write_report(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+        stage(REPORT_FILE, write_report)
+    except Exception:
+        for temp in staged.values():
+            os.remove(temp)
+        raise
+
+    # أرشفة النسخة الحالية
+    previous = [f'best_model_{t}.joblib' for t in MODEL_TYPES] + [SCALER_FILE, FEATURES_FILE, REPORT_FILE]
+    previous = [name for name in previous if os.path.exists(os.path.join(model_dir, name))]
+    archive = None
+    if previous:
+        archive = os.path.join(model_dir, ARCHIVE_DIR, datetime.now().strftime('%Y%m%d-%H%M%S'))
+        os.makedirs(archive, exist_ok=True)
+        for name in previous:
+            source = os.path.join(model_dir, name)
+            shutil.copy2(source, os.path.join(archive, name))
+            if name.startswith('best_model_') and name != model_file:
+                os.remove(source)
+
+    # قائمة الميزات والـ Scaler قبل النموذج: مراقب الخادم ينتظر استقرار جميع الملفات قبل إعادة التحميل
+    for name in [FEATURES_FILE, SCALER_FILE, REPORT_FILE, model_file]:
+        os.replace(staged[name], os.path.join(model_dir, name))
+
+    # تصدير أشجار النموذج الجديد إلى shared/ وحذف تصديرات النماذج السابقة
+    model_path = os.path.join(model_dir, model_file)
+    try:
+        load_shared_forest(model, model_path)
+        prune_exports(model_path)
+    except OSError as e:
+        print(f"تحذير: تعذر تحديث مجلد {SHARED_DIR_NAME}/: {str(e)}")
+
+    return model_path, archive
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="تدريب نموذج التنبؤ بالمبيعات")
+    parser.add_argument('--data', default=DAILY_SALES_PATH, help="ملف المبيعات اليومية")
+    parser.add_argument('--model-dir', default=MODEL_DIR, help="مجلد ملفات النموذج")
+    parser.add_argument('--models', default=None,
+                        help="النماذج المرشحة مفصولة بفواصل (الافتراضي: " + ','.join(MODEL_TYPES) + ")")
+    parser.add_argument('--test-size', type=float, default=0.2, help="نسبة فترة الاختبار من آخر البيانات")
+    parser.add_argument('--iterations', type=int, default=20, help="عدد تركيبات المعاملات لكل نموذج")
+    parser.add_argument('--splits', type=int, default=5, help="عدد طيات التحقق المتقاطع الزمني")
+    parser.add_argument('--jobs', type=int, default=-1, help="عدد العمليات المتوازية (-1 لجميع الأنوية)")
+    parser.add_argument('--dry-run', action='store_true', help="التدريب والتقييم دون كتابة الملفات")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    model_types = [t.strip().lower() for t in args.models.split(',')] if args.models else None
+
+    start = time.perf_counter()
+    model, scaler, feature_columns, report = train(
+        model_types, args.test_size, args.iterations, args.splits, args.jobs, args.data
+    )
+    report["seconds"] = round(time.perf_counter() - start, 2)
+
+    if args.dry_run:
+        print("✓ تشغيل تجريبي: لم تُكتب ملفات النموذج")
+        return 0
+
+    model_path, archive = save_artifacts(model, scaler, feature_columns, report, args.model_dir)
+    print(f"✓ تم حفظ النموذج: {model_path}")
+    if archive:
+        print(f"✓ النسخة السابقة: {archive}")
+    print("💡 لتحميل النموذج في الخادم: POST /api/admin/model/reload أو ML_MODEL_WATCH_INTERVAL")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -29,6 +29,6 @@ echo.
 echo اضغط Ctrl+C لإيقاف الخدمة
 echo.
 
-python api.py
+python serve.py
 
 pause
@@ -5,7 +5,7 @@ echo ========================================
 echo.
 
 echo تشغيل خدمة Python ML...
-start "Python ML Service" cmd /k "cd ServiceML && python api.py"
+start "Python ML Service" cmd /k "cd ServiceML && python serve.py"
 
 echo انتظار 5 ثواني...
 timeout /t 5 /nobreak > nul